@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+"""Benchmarks request transports against a local stand-in server."""
+
+import asyncio
+import ssl
+import subprocess
+from argparse import ArgumentParser
+from shutil import rmtree, which
+from tempfile import mkdtemp
+from time import perf_counter, sleep
+
+from typing import Optional
+
+from ocebuild.sources._lib import (
+  AsyncTransport,
+  PooledTransport,
+  RequestWrapper,
+  UrllibTransport
+)
+from ocebuild.sources._server import StandInServer
+
+from third_party.cpython.pathlib import Path
+
+
+def _server_context(tmp_dir: Path) -> Optional[ssl.SSLContext]:
+  # Generate a self-signed certificate to include TLS handshakes
+  if not which('openssl'): return None
+  certfile, keyfile = tmp_dir.joinpath('cert.pem'), tmp_dir.joinpath('key.pem')
+  subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                  '-subj', '/CN=localhost', '-days', '1',
+                  '-keyout', str(keyfile), '-out', str(certfile)],
+                 check=True, capture_output=True)
+  context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+  context.load_cert_chain(certfile, keyfile)
+  return context
+
+def _benchmark_pooled(server: StandInServer, num_requests: int) -> None:
+  server.routes['/api'] = b'{}' * 512
+  def run(transport):
+    start = perf_counter()
+    for _ in range(num_requests):
+      with RequestWrapper(transport.open(server.url('/api'))) as response:
+        response.read()
+    transport.close()
+    return (perf_counter() - start) / num_requests
+
+  cold_latency = run(UrllibTransport())
+  cold_connections = server.connections
+  pooled_latency = run(PooledTransport())
+  pooled_connections = server.connections - cold_connections
+  print(f'cold:     {cold_latency * 1e3:6.2f} ms/request '
+        f'({cold_connections} connections)')
+  print(f'pooled:   {pooled_latency * 1e3:6.2f} ms/request '
+        f'({pooled_connections} connections)')
+
+def _benchmark_async(server: StandInServer,
+                     num_requests: int,
+                     latency: float
+                     ) -> None:
+  def handler(h):
+    sleep(latency) # Simulate API latency
+    h.respond(b'{}')
+  server.routes['/slow'] = handler
+  url = server.url('/slow')
+
+  transport = PooledTransport()
+  start = perf_counter()
+  for _ in range(num_requests):
+    with RequestWrapper(transport.open(url)) as response:
+      response.read()
+  transport.close()
+  sequential = num_requests / (perf_counter() - start)
+  print(f'sequential: {sequential:6.0f} requests/s')
+
+  async def run(concurrency: int) -> float:
+    transport = AsyncTransport(max_connections=concurrency)
+    start = perf_counter()
+    await asyncio.gather(*[transport.open(url) for _ in range(num_requests)])
+    await transport.close()
+    return num_requests / (perf_counter() - start)
+  for n in (1, 4, 16, 32):
+    print(f'async x{n:<3}  {asyncio.run(run(n)):6.0f} requests/s')
+
+def _main(num_requests: int, latency: float) -> None:
+  tmp_dir = Path(mkdtemp())
+  try:
+    context = _server_context(tmp_dir)
+    with StandInServer(context=context) as server:
+      print(f'server:   {server.url()} ({num_requests} requests)')
+      _benchmark_pooled(server, num_requests)
+      _benchmark_async(server, num_requests, latency)
+  finally:
+    rmtree(tmp_dir)
+
+if __name__ == "__main__":
+  parser = ArgumentParser()
+  parser.add_argument('--requests', type=int, default=50,
+                      help='The number of requests per transport.')
+  parser.add_argument('--latency', type=float, default=0.02,
+                      help='The simulated API latency (in seconds).')
+  args = parser.parse_args()
+
+  _main(num_requests=args.requests, latency=args.latency)
+
+
+__all__ = []
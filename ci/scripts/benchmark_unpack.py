@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+"""Benchmarks concurrent zip extraction on a synthetic kext archive."""
+
+from argparse import ArgumentParser
+from os import urandom
+from shutil import rmtree
+from tempfile import mkdtemp
+from time import perf_counter
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from typing import List
+
+from ocebuild.filesystem.archives import unpack_zip
+
+from third_party.cpython.pathlib import Path
+
+
+def _write_archive(path: Path, size: int, kexts: int) -> None:
+  # Mix random and repeated blocks to approximate the ratio of kext binaries
+  block = urandom(1 << 15) + bytes(1 << 15)
+  count = max(1, size // kexts // len(block))
+  with ZipFile(path, 'w', compression=ZIP_DEFLATED) as zf:
+    for i in range(kexts):
+      kext = f'Kexts/Kext{i}.kext/Contents'
+      zf.writestr(f'{kext}/Info.plist', f'<plist><string>{i}</string></plist>')
+      with zf.open(f'{kext}/MacOS/Kext{i}', 'w') as f:
+        for _ in range(count): f.write(block)
+
+def _main(size: int, kexts: int, workers: List[int], runs: int) -> None:
+  tmp_dir = Path(mkdtemp())
+  try:
+    archive = tmp_dir.joinpath('Kexts.zip')
+    print(f'archive:  {size / 1e6:.0f} MB ({kexts} kexts)')
+    _write_archive(archive, size, kexts)
+
+    baseline = None
+    for n in workers:
+      timings = []
+      for _ in range(runs):
+        extract_dir = tmp_dir.joinpath('out')
+        start = perf_counter()
+        unpack_zip(archive, extract_dir, workers=n)
+        timings.append(perf_counter() - start)
+        rmtree(extract_dir)
+      elapsed = min(timings)
+      if baseline is None: baseline = elapsed
+      print(f'workers:  {n:<2} {elapsed:6.2f}s  '
+            f'{size / elapsed / 1e6:7.1f} MB/s  {baseline / elapsed:4.2f}x')
+  finally:
+    rmtree(tmp_dir)
+
+if __name__ == "__main__":
+  parser = ArgumentParser()
+  parser.add_argument('--size', type=int, default=200,
+                      help='The uncompressed size of the archive (in MB).')
+  parser.add_argument('--kexts', type=int, default=64,
+                      help='The number of kexts in the archive.')
+  parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+                      help='The number of threads to benchmark.')
+  parser.add_argument('--runs', type=int, default=3,
+                      help='The number of runs per thread count.')
+  args = parser.parse_args()
+
+  _main(size=args.size * 10**6,
+        kexts=args.kexts,
+        workers=args.workers,
+        runs=args.runs)
+
+
+__all__ = []
@@ -0,0 +1,101 @@
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+"""Shared pytest fixtures, including local stand-in servers for remote hosts."""
+
+import ssl
+import subprocess
+from email.message import Message
+from io import BytesIO
+from json import dumps
+from shutil import which
+from threading import Lock
+from urllib.error import HTTPError
+from zipfile import ZipFile
+
+from typing import Callable, Dict, Union
+
+import pytest
+
+from ocebuild.filesystem import store
+from ocebuild.sources._lib import BaseTransport, CachedResponse, set_transport
+from ocebuild.sources._server import StandInServer
+
+from third_party.cpython.pathlib import Path
+
+
+class StubTransport(BaseTransport):
+  """A transport returning canned responses for absolute urls in tests.
+
+  Routes map a url (without its query string) to either a response body or a
+  callable receiving the request. Non-bytes bodies are serialized as JSON.
+  """
+
+  def __init__(self):
+    self.routes: Dict[str, Union[bytes, any, Callable]] = {}
+    self.requests = []
+    self.lock = Lock()
+
+  def open(self, req, data=None, timeout=None):
+    with self.lock:
+      self.requests.append(req)
+    url = req.full_url.split('?', 1)[0]
+    if (route := self.routes.get(url)) is None:
+      raise HTTPError(req.full_url, 404, 'Not Found', Message(), None)
+    body = route(req) if callable(route) else route
+    if not isinstance(body, bytes):
+      body = dumps(body).encode('utf-8')
+    return CachedResponse(body, req.full_url, Message())
+
+@pytest.fixture
+def stub_transport():
+  """Yields a stub transport installed as the active transport."""
+  transport = StubTransport()
+  set_transport(transport)
+  yield transport
+  set_transport(None)
+
+@pytest.fixture
+def http_server():
+  """Yields a local HTTP stand-in server."""
+  with StandInServer() as server:
+    yield server
+
+@pytest.fixture(scope='session')
+def _server_certificate(tmp_path_factory):
+  """Generates a self-signed certificate for the HTTPS stand-in server."""
+  if not which('openssl'):
+    pytest.skip('openssl is required to generate a test certificate.')
+  tmpdir = tmp_path_factory.mktemp('certs')
+  certfile, keyfile = tmpdir / 'cert.pem', tmpdir / 'key.pem'
+  subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                  '-subj', '/CN=localhost', '-days', '1',
+                  '-keyout', str(keyfile), '-out', str(certfile)],
+                 check=True, capture_output=True)
+  return certfile, keyfile
+
+@pytest.fixture
+def https_server(_server_certificate):
+  """Yields a local HTTPS stand-in server with a self-signed certificate."""
+  context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+  context.load_cert_chain(*_server_certificate)
+  with StandInServer(context=context) as server:
+    yield server
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+  """Returns a temporary download store installed as the active store."""
+  path = Path(tmp_path, 'store')
+  monkeypatch.setattr(store, 'STORE_DIR', path)
+  return path
+
+@pytest.fixture
+def make_zip():
+  """Returns a factory of zip archives from a mapping of member names to data."""
+  def make(files: Dict[str, Union[str, bytes]]) -> bytes:
+    buffer = BytesIO()
+    with ZipFile(buffer, 'w') as zf:
+      for name, data in files.items(): zf.writestr(name, data)
+    return buffer.getvalue()
+  return make
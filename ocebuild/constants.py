@@ -35,6 +35,15 @@ class __EnvironWrapper: #pylint: disable=invalid-name
     """
     return os_environ.get('GITHUB_TOKEN')
 
+  @property
+  def OCEBUILD_CACHE_TTL(self) -> Union[str, None]:
+    """(Optional) Seconds that cached API responses are used without revalidation.
+
+    By default, cached responses are always revalidated using conditional
+    requests (which do not count against the GitHub API rate limit).
+    """
+    return os_environ.get('OCEBUILD_CACHE_TTL')
+
 ENV = __EnvironWrapper()
 """Initialized wrapper to securely handle environmental variables."""
 
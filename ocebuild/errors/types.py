@@ -14,6 +14,18 @@ class GitHubRateLimit(Exception):
     #TODO: Include rate limit information.
     self.rate_limit = rate_limit
 
+class IntegrityError(Exception):
+  """Indicates that a download does not match its expected checksum."""
+  def __init__(self,
+               message: str,
+               url: str,
+               expected: str,
+               actual: str):
+    super().__init__(message)
+    self.url = url
+    self.expected = expected
+    self.actual = actual
+
 class PathValidationError(Exception):
   """Indicates that a path does not match a given tree schema."""
   def __init__(self,
@@ -28,7 +40,8 @@ class PathValidationError(Exception):
 
 
 __all__ = [
-  # Classes (2)
+  # Classes (3)
   "GitHubRateLimit",
+  "IntegrityError",
   "PathValidationError"
 ]
@@ -6,4 +6,6 @@
 
 from ocebuild.filesystem.archives import *
 from ocebuild.filesystem.cache import *
+from ocebuild.filesystem.clone import *
 from ocebuild.filesystem.posix import *
+from ocebuild.filesystem.store import *
@@ -4,30 +4,616 @@
 ##
 """Methods for handling and extracting archive formats."""
 
-from contextlib import contextmanager
+import logging
+import os
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from fnmatch import fnmatchcase
+from hashlib import sha256
+from http.client import HTTPException, IncompleteRead
+from io import BytesIO
+from os import chmod, cpu_count, makedirs, scandir, symlink, unlink
+from os.path import abspath, commonpath, dirname, join, lexists, splitext
 from shutil import _find_unpack_format, rmtree, unpack_archive
+from stat import S_IMODE, S_ISLNK
 from tempfile import mkdtemp, NamedTemporaryFile
+from time import perf_counter
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
 from urllib.request import Request
+from zipfile import BadZipFile, ZipFile, ZipInfo
 
-from typing import Generator, Union
+from typing import (
+  BinaryIO,
+  Callable,
+  Dict,
+  Generator,
+  List,
+  Optional,
+  Tuple,
+  Union
+)
 
 from .cache import UNPACK_DIR
+from .clone import clone
+from .posix import remove
+from .store import (
+  add_archive,
+  add_extracted,
+  get_archive,
+  get_extracted,
+  get_partial,
+  get_url,
+  lock_partial,
+  set_partial
+)
 
+from ocebuild.errors import IntegrityError
 from ocebuild.parsers.regex import re_match
-from ocebuild.sources import request
+from ocebuild.sources import (
+  DOWNLOAD_CHUNK_SIZE,
+  DownloadProgress,
+  request,
+  stream_response
+)
 
 from third_party.cpython.pathlib import Path
 
 
+DOWNLOAD_RETRIES = 3
+"""The number of times an interrupted download is resumed before failing."""
+
+UNPACK_CHUNK_SIZE = 1 << 20
+"""The size of chunks decompressed from a zip member at a time."""
+
+UNPACK_WORKERS = min(8, cpu_count() or 1)
+"""The number of threads decompressing zip members concurrently."""
+
+_PARALLEL_UNPACK_SIZE = 1 << 22
+"""The minimum uncompressed size of members to decompress on a thread pool.
+@internal
+"""
+
+_RANGE_BLOCK_SIZE = 1 << 16
+"""The minimum number of bytes read from a remote file per range request.
+@internal
+"""
+
+_ZIP_TAIL_SIZE = (1 << 16) + 22
+"""The size of the end of central directory record with the longest comment.
+@internal
+"""
+
+_TAR_FORMATS = ('tar', 'gztar', 'bztar', 'xztar')
+"""The `shutil` archive formats handled by `tarfile`.
+@internal
+"""
+
+logger = logging.getLogger(__name__)
+"""Logger for archive downloads."""
+
+def _archive_filename(url: Union[str, Request], response: any) -> str:
+  """Returns the filename of an archive from its response headers or URL.
+  @internal
+  """
+  # Extract filename from request headers.
+  filename = re_match(pattern=r'^attachment; filename="?(.*)"?;?$',
+                      string=response.headers.get('Content-Disposition', ''),
+                      group=1)
+  if filename:
+    return Path(filename.strip('"')).name
+  return Path(urlsplit(get_url(url)).path).name
+
+def _verify_checksum(url: Union[str, Request],
+                     checksum: str,
+                     expected: Optional[str]=None
+                     ) -> None:
+  """Verifies the SHA-256 checksum of a downloaded archive.
+  @internal
+  """
+  if expected and checksum != expected:
+    raise IntegrityError(f'Checksum mismatch for {get_url(url)} '
+                         f'(expected {expected}, got {checksum}).',
+                         url=get_url(url), expected=expected, actual=checksum)
+
+def _save_archive(url: Union[str, Request],
+                  response: any,
+                  progress: Optional[DownloadProgress]=None,
+                  checksum: Optional[str]=None
+                  ) -> Tuple[Path, str]:
+  """Streams the response of an archive download to a temporary file.
+
+  Returns:
+    A tuple of the path to the temporary file and the archive checksum.
+  @internal
+  """
+  filename = _archive_filename(url, response)
+  f = NamedTemporaryFile(suffix=f'-{filename}', dir=UNPACK_DIR, delete=False)
+  expected = checksum
+  try:
+    with f: checksum = stream_response(response, f, progress)
+    _verify_checksum(url, checksum, expected)
+  except BaseException:
+    Path(f.name).unlink()
+    raise
+  return Path(f.name), checksum
+
+def _download_archive(url: Union[str, Request],
+                      progress: Optional[DownloadProgress]=None,
+                      checksum: Optional[str]=None
+                      ) -> Tuple[Path, str]:
+  """Downloads an archive to a temporary file.
+  @internal
+  """
+  with request(url) as response:
+    return _save_archive(url, response, progress, checksum)
+
+def _range_request(url: Union[str, Request],
+                   byte_range: str,
+                   validator: Optional[str]=None
+                   ) -> Request:
+  """Returns a request for a byte range of a remote file.
+  @internal
+  """
+  if isinstance(url, Request):
+    req = Request(url.full_url, headers=dict(url.header_items()))
+  else:
+    req = Request(url)
+  req.add_header('Range', f'bytes={byte_range}')
+  # Only return the range if the remote file is unchanged
+  if validator: req.add_header('If-Range', validator)
+  return req
+
+def _strong_validator(response: any) -> Union[str, None]:
+  """Returns the strong validator (i.e. ETag or Last-Modified) of a response.
+  @internal
+  """
+  validator = response.headers.get('ETag') or \
+    response.headers.get('Last-Modified')
+  return validator if validator and not validator.startswith('W/') else None
+
+def _store_archive(url: Union[str, Request],
+                   progress: Optional[DownloadProgress]=None,
+                   retries: Optional[int]=None,
+                   checksum: Optional[str]=None
+                   ) -> Tuple[Path, str]:
+  """Downloads an archive into the download store, resuming partial downloads.
+
+  Returns:
+    A tuple of the path to the stored archive and its checksum.
+  @internal
+  """
+  if retries is None: retries = DOWNLOAD_RETRIES
+  with lock_partial(url):
+    # Reuse the archive if it was stored while waiting for the lock
+    if (stored := get_archive(url, checksum)) is not None: return stored
+    expected = checksum
+    path, metadata = get_partial(url)
+    for attempt in range(retries + 1):
+      offset = path.stat().st_size if metadata else 0
+      req = _range_request(url, f'{offset}-', metadata['validator']) \
+        if offset else url
+      try:
+        with request(req) as response:
+          # Servers without range support (or with a changed file) send the
+          # full file, in which case the download is restarted.
+          content_range = response.headers.get('Content-Range', '')
+          if response.status != 206 or \
+              not content_range.startswith(f'bytes {offset}-'):
+            offset = 0
+          filename = metadata['filename'] if offset else \
+            _archive_filename(url, response)
+          # Keep the download resumable if the remote file can be validated
+          if (validator := _strong_validator(response)):
+            metadata = { 'filename': filename, 'validator': validator }
+          else:
+            metadata = None
+          set_partial(url, metadata)
+          # Hash the partial download before appending to it
+          digest = sha256()
+          with open(path, 'ab+' if offset else 'wb') as f:
+            if offset:
+              f.seek(0)
+              while (chunk := f.read(DOWNLOAD_CHUNK_SIZE)): digest.update(chunk)
+            checksum = stream_response(response, f, progress, digest=digest,
+                                       offset=offset)
+        break
+      except HTTPError as e:
+        # Restart downloads if the range is not satisfiable
+        if e.code == 416 and offset and attempt < retries:
+          metadata = None
+          continue
+        raise
+      except (HTTPException, OSError) as e:
+        if attempt == retries: raise
+        logger.debug('Retrying interrupted download (%s): %s', e, get_url(url))
+    set_partial(url, None)
+    try:
+      _verify_checksum(url, checksum, expected)
+    except IntegrityError:
+      path.unlink()
+      raise
+    return add_archive(url, path, filename, checksum), checksum
+
+################################################################################
+#                                 Zip Extraction                               #
+################################################################################
+
+def _zip_member_path(info: ZipInfo, extract_dir: str) -> Union[str, None]:
+  """Returns the extraction path of a zip member (or None if it is unsafe).
+  @internal
+  """
+  # Skip absolute paths and parent references like `shutil.unpack_archive()`
+  name = info.filename
+  if name.startswith('/') or '..' in name.split('/'):
+    return None
+  return join(extract_dir, *filter(None, name.split('/')))
+
+def _zip_member_mode(info: ZipInfo) -> int:
+  """Returns the POSIX mode of a zip member (or 0 if it has none).
+  @internal
+  """
+  # Only archives created on POSIX systems record a file mode
+  return info.external_attr >> 16 if info.create_system == 3 else 0
+
+def _unpack_zip_member(zf: ZipFile, info: ZipInfo, path: str) -> None:
+  """Decompresses a zip member to a file, restoring its permissions.
+  @internal
+  """
+  makedirs(dirname(path), exist_ok=True)
+  with zf.open(info) as src, open(path, 'wb') as dst:
+    # Preallocate the file to avoid fragmentation and repeated resizing
+    if info.file_size and hasattr(os, 'posix_fallocate'):
+      try: os.posix_fallocate(dst.fileno(), 0, info.file_size)
+      except OSError: pass
+    buffer = bytearray(max(1, min(info.file_size, UNPACK_CHUNK_SIZE)))
+    view = memoryview(buffer)
+    while (size := src.readinto(buffer)):
+      dst.write(view[:size])
+  if (mode := S_IMODE(_zip_member_mode(info))):
+    chmod(path, mode)
+
+def unpack_zip(archive: Union[str, Path, ZipFile],
+               extract_dir: Union[str, Path],
+               members: Optional[List[ZipInfo]]=None,
+               workers: Optional[int]=None
+               ) -> None:
+  """Unpacks the members of a zip archive, decompressing them concurrently.
+
+  Members are decompressed on a pool of threads (as zlib releases the GIL while
+  decompressing), into preallocated files written in bounded chunks. File
+  permissions and symbolic links are restored from archives created on POSIX
+  systems, and members with absolute paths or parent references are skipped
+  (as done by `shutil.unpack_archive()`).
+
+  Args:
+    archive: Path to the zip archive (or an open `ZipFile`).
+    extract_dir: The directory to unpack the archive to.
+    members: The members to unpack. Defaults to all members. (Optional)
+    workers: The number of threads to use. Defaults to `UNPACK_WORKERS`.
+      (Optional)
+  """
+  if not isinstance(archive, ZipFile):
+    with ZipFile(archive) as zf:
+      return unpack_zip(zf, extract_dir, members, workers)
+  if members is None: members = archive.infolist()
+  if workers is None: workers = UNPACK_WORKERS
+  extract_dir = abspath(extract_dir)
+  makedirs(extract_dir, exist_ok=True)
+
+  files, links = [], []
+  for info in members:
+    if (path := _zip_member_path(info, extract_dir)) is None: continue
+    if info.is_dir():
+      makedirs(path, exist_ok=True)
+    elif S_ISLNK(_zip_member_mode(info)):
+      links.append((info, path))
+    else:
+      files.append((info, path))
+
+  # Decompress small archives on the current thread
+  size = sum(info.file_size for info, _ in files)
+  if workers > 1 and len(files) > 1 and size >= _PARALLEL_UNPACK_SIZE:
+    # Start with the largest members to balance work across threads
+    files.sort(key=lambda e: e[0].file_size, reverse=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      for task in [executor.submit(_unpack_zip_member, archive, *e)
+                   for e in files]:
+        task.result()
+  else:
+    for info, path in files: _unpack_zip_member(archive, info, path)
+
+  # Restore symbolic links (only if they resolve within the extract directory)
+  for info, path in links:
+    target = archive.read(info).decode('utf-8')
+    resolved = abspath(join(dirname(path), target))
+    if target.startswith('/') or \
+        commonpath([resolved, extract_dir]) != extract_dir:
+      continue
+    makedirs(dirname(path), exist_ok=True)
+    if lexists(path): unlink(path)
+    symlink(target, path)
+
+################################################################################
+#                                 Tar Extraction                               #
+################################################################################
+
+def _unpack_tar(tf: tarfile.TarFile,
+                extract_dir: Union[str, Path],
+                include: Optional[Callable[[str], bool]]=None
+                ) -> List[str]:
+  """Unpacks the members of a tar archive in a single (streamable) pass.
+
+  Returns:
+    The names of the unpacked members.
+  @internal
+  """
+  # Use the safe extraction filter where supported (Python 3.12+ or backports)
+  kwargs = { 'filter': 'data' } if hasattr(tarfile, 'data_filter') else {}
+  members = []
+  for member in tf:
+    if _tar_member_selected(member.name, include):
+      tf.extract(member, extract_dir, **kwargs)
+      members.append(member.name)
+  return members
+
+class _TeeReader():
+  """Reads a response while copying it to a file and hashing its contents.
+  @internal
+  """
+
+  def __init__(self,
+               response: any,
+               file: Optional[BinaryIO]=None,
+               progress: Optional[DownloadProgress]=None):
+    self.response = response
+    self.file = file
+    self.progress = progress
+    self.digest = sha256()
+    self.downloaded = 0
+    total = response.headers.get('Content-Length')
+    self.total = int(total) if total and total.isdigit() else None
+    self._start = perf_counter()
+
+  def read(self, size: int=-1) -> bytes:
+    chunk = self.response.read(size)
+    if self.file is not None: self.file.write(chunk)
+    self.digest.update(chunk)
+    self.downloaded += len(chunk)
+    if self.progress is not None:
+      elapsed = perf_counter() - self._start
+      throughput = self.downloaded / elapsed if elapsed else 0.0
+      self.progress(self.downloaded, self.total, throughput)
+    return chunk
+
+  def finish(self) -> str:
+    """Reads the remainder of the response and returns its SHA-256 digest."""
+    while self.read(DOWNLOAD_CHUNK_SIZE): pass
+    if self.total is not None and self.downloaded < self.total:
+      raise IncompleteRead(bytes(), self.total - self.downloaded)
+    return self.digest.hexdigest()
+
+def _stream_tar_archive(url: Union[str, Request],
+                        extract_dir: Union[str, Path],
+                        include: Optional[Callable[[str], bool]]=None,
+                        progress: Optional[DownloadProgress]=None,
+                        checksum: Optional[str]=None,
+                        cache: bool=False
+                        ) -> Union[Tuple[str, List[str]], None]:
+  """Unpacks a tar archive straight from its response stream.
+
+  If `cache` is set, the response is also written to the download store in the
+  same pass. Interrupted downloads are left resumable in the store.
+
+  Returns:
+    A tuple of the SHA-256 checksum of the archive and the names of the unpacked
+    members, or None if the download failed (or was made concurrently).
+  @internal
+  """
+  with lock_partial(url) if cache else nullcontext():
+    # Defer to downloads stored (or interrupted) while waiting for the lock
+    path, metadata = get_partial(url) if cache else (None, None)
+    if metadata or (cache and get_archive(url, checksum)): return None
+    expected = checksum
+    with request(url) as response:
+      filename = _archive_filename(url, response)
+      validator = _strong_validator(response)
+      with (open(path, 'wb') if cache else nullcontext()) as f:
+        reader = _TeeReader(response, f, progress)
+        try:
+          with tarfile.open(fileobj=reader, mode='r|*',
+                            bufsize=DOWNLOAD_CHUNK_SIZE) as tf:
+            members = _unpack_tar(tf, extract_dir, include)
+          checksum = reader.finish()
+          _verify_checksum(url, checksum, expected)
+        except (HTTPException, OSError, EOFError, tarfile.TarError) as e:
+          for p in Path(extract_dir).iterdir(): remove(p)
+          logger.debug('Retrying interrupted download (%s): %s',
+                       e, get_url(url))
+          # Resume the download in the store (if the file can be validated)
+          if cache and validator:
+            set_partial(url, { 'filename': filename, 'validator': validator })
+          return None
+        except IntegrityError:
+          for p in Path(extract_dir).iterdir(): remove(p)
+          if cache: path.unlink()
+          raise
+    if cache:
+      set_partial(url, None)
+      add_archive(url, path, filename, checksum)
+    return checksum, members
+
+def unpack_members(archive: Union[str, Path],
+                   extract_dir: Union[str, Path],
+                   include: Optional[Callable[[str], bool]]=None
+                   ) -> None:
+  """Unpacks the members of an archive matching an include predicate.
+
+  Only the selected members of zip archives are decompressed (see
+  `unpack_zip()`). If no member of a zip archive matches the predicate (e.g. for
+  an unexpected archive layout), the entire archive is unpacked instead. Tar
+  archives are filtered in a single pass, and other archive formats are always
+  unpacked in full.
+
+  Args:
+    archive: Path to the archive file.
+    extract_dir: The directory to unpack the archive to.
+    include: A predicate selecting members by their POSIX path. (Optional)
+  """
+  archive_format = _find_unpack_format(str(archive))
+  if archive_format in _TAR_FORMATS and include is not None:
+    with tarfile.open(archive, mode='r|*') as tf:
+      _unpack_tar(tf, extract_dir, include)
+      return
+  elif archive_format != 'zip':
+    return unpack_archive(archive, extract_dir, format=archive_format)
+  with ZipFile(archive) as zf:
+    members = None
+    if include is not None:
+      members = [m for m in zf.infolist() if include(m.filename)] or None
+    unpack_zip(zf, extract_dir, members)
+
+def _tar_member_selected(name: str,
+                         include: Optional[Callable[[str], bool]]=None
+                         ) -> bool:
+  """Returns whether a tar member is unpacked (i.e. is safe and selected).
+  @internal
+  """
+  if name.startswith('/') or '..' in name.split('/'): return False
+  return include is None or include(name)
+
+def _selected_members(archive: Union[str, Path],
+                      include: Optional[Callable[[str], bool]]=None
+                      ) -> Union[List[str], None]:
+  """Returns the members `unpack_members()` unpacks from an archive.
+
+  Returns:
+    The names of the unpacked members, or None if the archive is unpacked in
+    full.
+  @internal
+  """
+  if include is None: return None
+  archive_format = _find_unpack_format(str(archive))
+  if archive_format in _TAR_FORMATS:
+    with tarfile.open(archive, mode='r|*') as tf:
+      return [m.name for m in tf if _tar_member_selected(m.name, include)]
+  elif archive_format != 'zip':
+    return None
+  with ZipFile(archive) as zf:
+    names = zf.namelist()
+  members = [name for name in names if include(name)]
+  return members if 0 < len(members) < len(names) else None
+
+def _members_key(members: Union[List[str], None]) -> str:
+  """Returns the extraction cache key of the members unpacked from an archive.
+  @internal
+  """
+  if members is None: return ''
+  return sha256('\n'.join(members).encode('utf-8')).hexdigest()
+
+def unpack_url(url: Union[str, Request],
+               extract_dir: Union[str, Path],
+               progress: Optional[DownloadProgress]=None,
+               cache: bool=False,
+               checksum: Optional[str]=None,
+               include: Optional[Callable[[str], bool]]=None,
+               link: bool=False
+               ) -> str:
+  """Downloads an archive from a URL and unpacks it to a directory.
+
+  The archive is streamed to disk in bounded chunks, and its SHA-256 checksum is
+  computed in the same pass. If `cache` is set, the archive is kept in the
+  download store, and is only downloaded if the store has no verified copy of
+  it. Interrupted downloads are then kept in the store and resumed with range
+  requests (if supported by the server).
+
+  If a `checksum` is given, the archive is verified against it before being
+  unpacked, raising an `IntegrityError` on a mismatch. If an `include` predicate
+  is given, only the matching members of the archive are unpacked (see
+  `unpack_members()`).
+
+  If `cache` is set, unpacked archives are also kept as read-only trees in an
+  extraction cache keyed by the archive checksum and the names of the members
+  unpacked from it. Unchanged archives are then cloned from the extraction cache
+  (see `clone()`) instead of being unpacked again, or are hardlinked from it if
+  `link` is set.
+
+  Tar archives not yet in the download store are unpacked straight from the
+  response stream (while being written to the store in the same pass), so that
+  the archive is never read back from disk and unselected members are never
+  written. Interrupted streams fall back to a resumable download.
+
+  Args:
+    url: URL of the archive file.
+    extract_dir: The directory to unpack the archive to.
+    progress: A callback receiving the download progress. (Optional)
+    cache: Whether to use the content-addressed download store. (Optional)
+    checksum: The expected SHA-256 checksum of the archive. (Optional)
+    include: A predicate selecting archive members to unpack. (Optional)
+    link: Whether to hardlink files from the extraction cache. Hardlinked files
+      are read-only, and must be replaced rather than modified. (Optional)
+
+  Returns:
+    The SHA-256 checksum of the archive.
+  """
+  #TODO: If github file url, test `raw.githubusercontent` redirect,
+  #      otherwise parse and extract from an archive url.
+  if cache and (stored := get_archive(url, checksum)) is not None:
+    archive, checksum = stored
+    # Copy the members already unpacked from the archive from the cache
+    key = _members_key(_selected_members(archive, include))
+    if (extracted := get_extracted(checksum, key)) is not None:
+      clone(extracted, extract_dir, link=link)
+      return checksum
+  else:
+    # Stream tar archives from the response into the directory.
+    archive_format = _find_unpack_format(urlsplit(get_url(url)).path)
+    if archive_format in _TAR_FORMATS and \
+        not (cache and get_partial(url)[1]):
+      streamed = _stream_tar_archive(url, extract_dir, include, progress,
+                                     checksum, cache=cache)
+      if streamed is not None:
+        checksum, members = streamed
+        if cache:
+          key = _members_key(members if include is not None else None)
+          add_extracted(checksum, extract_dir, key)
+        return checksum
+    if not cache:
+      archive, checksum = _download_archive(url, progress, checksum)
+    else:
+      archive, checksum = _store_archive(url, progress, checksum=checksum)
+      key = _members_key(_selected_members(archive, include))
+  # Extract the archive to the directory.
+  try:
+    unpack_members(archive, extract_dir, include)
+  finally:
+    # Cleanup the temporary file
+    if not cache: archive.unlink()
+  if cache: add_extracted(checksum, extract_dir, key)
+  return checksum
+
 @contextmanager
 def extract_archive(url: Union[str, Request],
-                    persist: bool=False
+                    persist: bool=False,
+                    progress: Optional[DownloadProgress]=None,
+                    cache: bool=False,
+                    checksum: Optional[str]=None,
+                    include: Optional[Callable[[str], bool]]=None,
+                    link: bool=False
                     ) -> Generator[Path, str, None]:
   """Extracts a file from a URL and yields a temporary extraction directory.
 
+  The archive is downloaded and unpacked with `unpack_url()`.
+
   Args:
     url: URL of the archive file.
     persist: Flag to disable cleanup of the temporary directory.
+    progress: A callback receiving the download progress. (Optional)
+    cache: Whether to use the content-addressed download store. (Optional)
+    checksum: The expected SHA-256 checksum of the archive. (Optional)
+    include: A predicate selecting archive members to unpack. (Optional)
+    link: Whether to hardlink files from the extraction cache. (Optional)
 
   Yields:
     tmp_dir (str): Path to the temporary directory.
@@ -39,40 +625,428 @@ def extract_archive(url: Union[str, Request],
   """
   tmp_dir = mkdtemp(dir=UNPACK_DIR)
   try:
-    #TODO: If github file url, test `raw.githubusercontent` redirect,
-    #      otherwise parse and extract from an archive url.
-    with request(url) as response:
-      # Extract filename from request headers.
-      filename = re_match(pattern=r'^attachment; filename="?(.*)"?;?$',
-                          string=response.headers.get('Content-Disposition'),
-                          group=1)
-      if filename:
-        extension = "".join(Path(filename).suffixes)
-      elif '.' in url:
-        extension = f'.{url.split(".")[-1]}'
-      else:
-        extension = url.rsplit("/", maxsplit=1)[-1]
-
-      # Write archive to a temporary file.
-      suffix = f'-{filename or extension}'
-      with NamedTemporaryFile(suffix=suffix, dir=UNPACK_DIR, delete=False) as f:
-        f.write(response.read())
-        f.seek(0)
-
-      # Extract the zip file to the temporary directory.
-      archive_format = _find_unpack_format(f.name)
-      unpack_archive(f.name, tmp_dir, format=archive_format)
-      # Cleanup the temporary file
-      Path(f.name).unlink()
-
+    unpack_url(url, tmp_dir, progress=progress, cache=cache, checksum=checksum,
+               include=include, link=link)
     # Yield the temporary directory.
     yield Path(tmp_dir)
   finally:
     # Cleanup after context exits
     if not persist: rmtree(tmp_dir)
 
+################################################################################
+#                               Nested Archive Views                           #
+################################################################################
+
+def _match_parts(parts: List[str], pattern: List[str]) -> bool:
+  """Matches the parts of a POSIX path against the parts of a glob pattern.
+  @internal
+  """
+  if not pattern:
+    return not parts
+  elif pattern[0] == '**':
+    return any(_match_parts(parts[i:], pattern[1:])
+               for i in range(len(parts) + 1))
+  return bool(parts) and fnmatchcase(parts[0], pattern[0]) and \
+    _match_parts(parts[1:], pattern[1:])
+
+class ArchiveView():
+  """A lazy, read-only view of a directory and the zip archives nested in it.
+
+  Nested zip archives appear as directories of the view (e.g. the members of
+  `Lilu-RELEASE.zip` appear under `Lilu-RELEASE.zip/Lilu.kext`), so that they
+  can be globbed without unpacking them. Only the central directory of each
+  archive is read (archives nested in other archives are held in memory), and
+  members are only written to disk once selected with `extract()`.
+
+  The directory is walked once, and the path, kind and size of each entry are
+  kept in an in-memory index that can be queried by suffix (e.g. all `.kext`
+  bundles) or by bundle (i.e. all paths contained in a directory). Views of
+  subdirectories share this index (see `view()`), and nested archives are only
+  opened if the view is created with `archives=True`.
+
+  Example:
+    >>> with ArchiveView(tmp_dir) as view:
+    ...   for path in view.glob('**/*.kext/**/Info.plist'):
+    ...     print(view.extract(path))
+    # -> "/tmp/xxxxxx/Lilu-RELEASE/Lilu.kext/Contents/Info.plist"
+  """
+
+  def __init__(self, root: Union[str, Path], archives: bool=True):
+    self.root = Path(root)
+    self.archives = archives
+    self._paths: Dict[str, Tuple[Union[str, None], str, bool, int]] = None
+    self._children: Dict[str, List[str]] = {}
+    self._suffixes: Dict[str, List[str]] = {}
+    self._archives: Dict[str, ZipFile] = {}
+    self._parent: Union[Tuple['ArchiveView', str], None] = None
+
+  def __enter__(self) -> 'ArchiveView':
+    return self
+
+  def __exit__(self, *args) -> None:
+    self.close()
+
+  def close(self) -> None:
+    """Closes all opened archives."""
+    for zf in self._archives.values(): zf.close()
+    self._archives.clear()
+    self._paths = None
+    self._children.clear()
+    self._suffixes.clear()
+
+  def _add(self,
+           path: str,
+           archive: Union[str, None],
+           member: str,
+           is_dir: bool,
+           size: int=0
+           ) -> None:
+    """Adds a path to the index.
+    @internal
+    """
+    if path in self._paths: return
+    self._paths[path] = (archive, member, is_dir, size)
+    self._children.setdefault(path.rpartition('/')[0], []).append(path)
+    if (suffix := splitext(path)[1]):
+      self._suffixes.setdefault(suffix, []).append(path)
+
+  def _index_archive(self, path: str, zf: ZipFile) -> None:
+    """Indexes the members of a (nested) archive.
+    @internal
+    """
+    self._archives[path] = zf
+    for info in zf.infolist():
+      parts = info.filename.rstrip('/').split('/')
+      # Add the implicit parent directories of the member
+      for i in range(1, len(parts)):
+        parent = '/'.join(parts[:i])
+        self._add(f'{path}/{parent}', path, f'{parent}/', True)
+      member = f"{path}/{'/'.join(parts)}"
+      self._add(member, path, info.filename, info.is_dir(), info.file_size)
+      if not info.is_dir() and member.lower().endswith('.zip'):
+        try:
+          self._index_archive(member, ZipFile(BytesIO(zf.read(info))))
+        except BadZipFile: pass
+
+  def _index_directory(self, prefix: str='') -> None:
+    """Indexes the entries of a directory (and its subdirectories).
+    @internal
+    """
+    subdirs = []
+    with scandir(self.root.joinpath(prefix)) as it:
+      for entry in it:
+        path = prefix + entry.name
+        # Don't follow symlinks to directories (as with `os.walk()`)
+        if entry.is_dir():
+          self._add(path, None, path, True)
+          if not entry.is_symlink(): subdirs.append(f'{path}/')
+          continue
+        self._add(path, None, path, False, entry.stat().st_size)
+    for subdir in subdirs:
+      self._index_directory(subdir)
+
+  def _index_archives(self) -> None:
+    """Indexes the members of the zip archives found in the directory.
+    @internal
+    """
+    archives = [p for suffix, paths in self._suffixes.items()
+                if suffix.lower() == '.zip'
+                  for p in paths if not self._paths[p][2]]
+    for path in archives:
+      try:
+        self._index_archive(path, ZipFile(self.root.joinpath(path)))
+      except BadZipFile: pass
+
+  def _index(self) -> Dict[str, Tuple[Union[str, None], str, bool, int]]:
+    """Returns the index of all paths in the view.
+    @internal
+    """
+    if self._paths is None:
+      self._paths = {}
+      if self.root.is_dir():
+        self._index_directory()
+        if self.archives: self._index_archives()
+    return self._paths
+
+  def exists(self, path: str) -> bool:
+    """Returns whether a path exists in the view."""
+    return path in self._index()
+
+  def is_dir(self, path: str) -> bool:
+    """Returns whether a path in the view is a directory."""
+    return self._index()[path][2]
+
+  def size(self, path: str) -> int:
+    """Returns the (uncompressed) size of a file in the view."""
+    return self._index()[path][3]
+
+  def find(self, suffix: str) -> List[str]:
+    """Returns the paths in the view with a suffix.
+
+    Args:
+      suffix: A case-sensitive suffix (e.g. `.kext`).
+
+    Returns:
+      A list of matching POSIX paths (relative to the root of the view).
+    """
+    self._index()
+    return list(self._suffixes.get(suffix, ()))
+
+  def bundle(self, path: str) -> List[str]:
+    """Returns all paths contained in a directory (or bundle) of the view.
+
+    Args:
+      path: A POSIX path relative to the root of the view.
+
+    Returns:
+      A list of POSIX paths (relative to the root of the view).
+    """
+    self._index()
+    paths, stack = [], [path]
+    while stack:
+      children = self._children.get(stack.pop(), ())
+      paths.extend(children)
+      stack.extend(reversed(children))
+    return paths
+
+  def view(self, path: str) -> 'ArchiveView':
+    """Returns a view of a directory of the view, sharing its index.
+
+    Args:
+      path: A POSIX path relative to the root of the view.
+
+    Returns:
+      A view rooted at the directory (empty if the directory doesn't exist).
+      Paths are resolved and extracted by this view, which must stay open.
+    """
+    index = self._index()
+    view = ArchiveView(self.root.joinpath(path), archives=self.archives)
+    view._parent, view._paths = (self, path), {}
+    start = len(path) + 1
+    for p in self.bundle(path):
+      archive, member, is_dir, size = index[p]
+      view._add(p[start:], archive and archive[start:], member, is_dir, size)
+    return view
+
+  def glob(self, pattern: str) -> List[str]:
+    """Returns the paths in the view matching a glob pattern.
+
+    Args:
+      pattern: A glob pattern relative to the root of the view.
+
+    Returns:
+      A list of matching POSIX paths (relative to the root of the view).
+    """
+    pattern = pattern.split('/')
+    return [p for p in self._index() if _match_parts(p.split('/'), pattern)]
+
+  def resolve(self, path: str) -> Path:
+    """Returns the location of a path in the view once extracted.
+
+    Paths within nested archives are extracted to a directory named after the
+    archive (without its `.zip` extension) next to the archive.
+
+    Args:
+      path: A POSIX path relative to the root of the view.
+
+    Returns:
+      The location of the path on disk.
+    """
+    if self._parent is not None:
+      parent, prefix = self._parent
+      return parent.resolve(f'{prefix}/{path}')
+    self._index()
+    parts = path.split('/')
+    resolved = [p[:-len('.zip')] if '/'.join(parts[:i + 1]) in self._archives
+                                 else p for i,p in enumerate(parts[:-1])]
+    return self.root.joinpath(*resolved, parts[-1])
+
+  def extract(self, path: str) -> Path:
+    """Extracts a file or directory of the view to disk.
+
+    Args:
+      path: A POSIX path relative to the root of the view.
+
+    Returns:
+      The location of the extracted path on disk.
+    """
+    if self._parent is not None:
+      parent, prefix = self._parent
+      return parent.extract(f'{prefix}/{path}')
+    archive, member, *_ = self._index()[path]
+    if archive is not None:
+      member = member.rstrip('/')
+      members = [m for m in self._archives[archive].infolist()
+                 if m.filename.rstrip('/') == member
+                   or m.filename.startswith(f'{member}/')]
+      unpack_zip(self._archives[archive], self.resolve(f'{archive}/_').parent,
+                 members)
+    return self.resolve(path)
+
+################################################################################
+#                               Remote Zip Access                              #
+################################################################################
+
+class _RangeFile():
+  """A seekable, read-only file reading a remote file with range requests.
+
+  Reads are served from a buffer of the last requested range, which is extended
+  to at least `_RANGE_BLOCK_SIZE` bytes to avoid a request per small read.
+  @internal
+  """
+
+  def __init__(self,
+               url: Union[str, Request],
+               size: int,
+               validator: Optional[str]=None
+               ):
+    self.url = url
+    self.size = size
+    self.validator = validator
+    self._pos = 0
+    self._start = 0
+    self._buffer = b''
+
+  def seekable(self) -> bool:
+    return True
+
+  def tell(self) -> int:
+    return self._pos
+
+  def seek(self, offset: int, whence: int=os.SEEK_SET) -> int:
+    if whence == os.SEEK_CUR: offset += self._pos
+    elif whence == os.SEEK_END: offset += self.size
+    self._pos = max(0, offset)
+    return self._pos
+
+  def fetch(self, start: int, end: int) -> None:
+    """Buffers a byte range (from `start` up to `end`) of the remote file."""
+    end = min(end, self.size)
+    req = _range_request(self.url, f'{start}-{end - 1}', self.validator)
+    with request(req) as response:
+      # The remote file has changed if the full file is sent instead
+      content_range = response.headers.get('Content-Range', '')
+      if response.status != 206 or \
+          not content_range.startswith(f'bytes {start}-'):
+        raise HTTPException(f'Range request failed: {get_url(self.url)}')
+      self._buffer = response.read()
+    self._start = start
+
+  def read(self, size: int=-1) -> bytes:
+    if size is None or size < 0: size = self.size - self._pos
+    end = min(self._pos + size, self.size)
+    if self._pos >= end: return b''
+    if not self._start <= self._pos or \
+        end > self._start + len(self._buffer):
+      self.fetch(self._pos, max(end, self._pos + _RANGE_BLOCK_SIZE))
+    offset = self._pos - self._start
+    data = self._buffer[offset:offset + end - self._pos]
+    self._pos += len(data)
+    return data
+
+  def close(self) -> None:
+    self._buffer = b''
+
+def _open_range_file(url: Union[str, Request]
+                     ) -> Union[_RangeFile, Path, None]:
+  """Opens a remote file for random access (if range requests are supported).
+
+  The end of the file is requested up front, as it holds the central directory
+  of zip archives. If the server ignores the range and sends the full file
+  instead, it is downloaded to a temporary file from the same response.
+  @internal
+  """
+  with request(_range_request(url, f'-{_ZIP_TAIL_SIZE}')) as response:
+    if response.status == 200:
+      return _save_archive(url, response)[0]
+    content_range = response.headers.get('Content-Range', '')
+    if response.status != 206 or \
+        not (match := re_match(r'bytes (\d+)-\d+/(\d+)$', content_range,
+                               group=None)):
+      return None
+    start, size = map(int, match.groups())
+    remote = _RangeFile(url, size, _strong_validator(response))
+    remote._buffer, remote._start = response.read(), start
+  return remote
+
+def _zip_member_span(info: ZipInfo) -> Tuple[int, int]:
+  """Returns the estimated byte range of a zip member's header and data.
+  @internal
+  """
+  # The local header may hold different extra fields than the central directory
+  header = 30 + len(info.orig_filename.encode('utf-8')) + len(info.extra)
+  end = info.header_offset + header + info.compress_size + _RANGE_BLOCK_SIZE
+  return info.header_offset, end
+
+@contextmanager
+def extract_member(url: Union[str, Request],
+                   pattern: str,
+                   persist: bool=False
+                   ) -> Generator[Path, None, None]:
+  """Extracts the members of a remote zip archive matching a glob pattern.
+
+  Only the central directory and the matching members of the archive are read
+  from the server using range requests (i.e. one request per member), so that
+  single files can be read from large archives without downloading them. If the
+  server does not support range requests, the archive is downloaded in full
+  (from the response to the first range request).
+
+  Args:
+    url: URL of the zip archive.
+    pattern: A glob pattern matching the POSIX paths of archive members (e.g.
+      `**/patches.plist`). Members of matching directories are also extracted.
+    persist: Flag to disable cleanup of the temporary directory.
+
+  Raises:
+    FileNotFoundError: If no archive members match the pattern.
+
+  Yields:
+    tmp_dir (str): Path to the temporary directory.
+
+  Example:
+    >>> with extract_member('https://example.com/foo.zip', '**/*.plist') as d:
+    print(list(d.glob('**/*.plist')))
+    # -> ["/tmp/xxxxxx/foo/bar.plist"]
+  """
+  pattern_parts = pattern.strip('/').split('/')
+  def include(member: str) -> bool:
+    parts = member.split('/')
+    return any(_match_parts(parts[:i], pattern_parts)
+               for i in range(1, len(parts) + 1))
+  tmp_dir = mkdtemp(dir=UNPACK_DIR)
+  archive = None
+  try:
+    if (remote := _open_range_file(url)) is None:
+      remote, _ = _download_archive(url)
+    if isinstance(remote, Path): archive = remote
+    with ZipFile(remote) as zf:
+      members = [info for info in zf.infolist()
+                 if not info.is_dir() and include(info.filename)]
+      if not members:
+        raise FileNotFoundError(f'No archive members match {pattern}: '
+                                f'{get_url(url)}')
+      for info in sorted(members, key=lambda info: info.header_offset):
+        # Request each member with a single range request
+        if archive is None: remote.fetch(*_zip_member_span(info))
+        unpack_zip(zf, tmp_dir, [info], workers=1)
+
+    yield Path(tmp_dir)
+  finally:
+    if archive is not None: archive.unlink()
+    if not persist: rmtree(tmp_dir)
+
 
 __all__ = [
-  # Functions (1)
-  "extract_archive"
+  # Constants (3)
+  "DOWNLOAD_RETRIES",
+  "UNPACK_CHUNK_SIZE",
+  "UNPACK_WORKERS",
+  # Functions (5)
+  "unpack_zip",
+  "unpack_members",
+  "unpack_url",
+  "extract_archive",
+  "extract_member",
+  # Classes (1)
+  "ArchiveView"
 ]
@@ -3,9 +3,377 @@
 # SPDX-License-Identifier: BSD-3-Clause
 ##
 
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from hashlib import sha256
+from io import BytesIO
+from os import urandom
+from shutil import rmtree
+from tempfile import mkdtemp
+from zipfile import ZIP_DEFLATED, ZipFile
+
 import pytest
 
+from . import archives as archives_module
+from . import store as store_module
 from .archives import *
 
+from third_party.cpython.pathlib import Path
+
+
+@contextmanager
+def _unpack_url(url: str, **kwargs):
+  """Unpacks an archive, yielding the extraction directory and its checksum."""
+  tmp_dir = Path(mkdtemp())
+  try:
+    yield tmp_dir, unpack_url(url, tmp_dir, **kwargs)
+  finally:
+    rmtree(tmp_dir)
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_unpack_zip(tmp_path, monkeypatch, workers):
+  from zipfile import ZipInfo
+  monkeypatch.setattr(archives_module, '_PARALLEL_UNPACK_SIZE', 0)
+  def member(name: str, mode: int) -> ZipInfo:
+    info = ZipInfo(name)
+    info.create_system, info.external_attr = 3, mode << 16
+    return info
+  archive = Path(tmp_path, 'Utilities.zip')
+  with ZipFile(archive, 'w') as zf:
+    for i in range(8):
+      zf.writestr(f'Utilities/Tool{i}/data', bytes([i]) * (1 << 16))
+    tool = 'Utilities/ocvalidate'
+    zf.writestr(member(f'{tool}/ocvalidate', 0o100755), 'ocvalidate')
+    zf.writestr(member(f'{tool}/latest', 0o120777), 'ocvalidate')
+    zf.writestr(member(f'{tool}/passwd', 0o120777), '/etc/passwd')
+    zf.writestr('../escape', 'escape')
+  extract_dir = Path(tmp_path, 'out')
+  unpack_zip(archive, extract_dir, workers=workers)
+  for i in range(8):
+    assert extract_dir.joinpath(f'Utilities/Tool{i}/data').read_bytes() == \
+      bytes([i]) * (1 << 16)
+  # Permissions and symbolic links are restored
+  ocvalidate = extract_dir.joinpath('Utilities/ocvalidate')
+  assert ocvalidate.joinpath('ocvalidate').stat().st_mode & 0o777 == 0o755
+  assert ocvalidate.joinpath('latest').is_symlink()
+  assert ocvalidate.joinpath('latest').read_text() == 'ocvalidate'
+  # Unsafe members are skipped
+  assert not ocvalidate.joinpath('passwd').exists()
+  assert not Path(tmp_path, 'escape').exists()
+
+def test_unpack_members(tmp_path):
+  archive = Path(tmp_path, 'OpenCore.zip')
+  with ZipFile(archive, 'w') as zf:
+    zf.writestr('X64/EFI/OC/OpenCore.efi', 'X64')
+    zf.writestr('IA32/EFI/OC/OpenCore.efi', 'IA32')
+  unpack_members(archive, tmp_path / 'X64', lambda m: m.startswith('X64/'))
+  assert [p.relative_to(tmp_path / 'X64').as_posix()
+          for p in (tmp_path / 'X64').glob('**/*.efi')] == \
+    ['X64/EFI/OC/OpenCore.efi']
+  # Archives without matching members are unpacked in full
+  unpack_members(archive, tmp_path / 'all', lambda m: False)
+  assert len(list((tmp_path / 'all').glob('**/*.efi'))) == 2
+
+def test_archive_view(tmp_path, make_zip):
+  root = Path(tmp_path)
+  root.joinpath('Lilu.kext/Contents').mkdir(parents=True)
+  root.joinpath('Lilu.kext/Contents/Info.plist').write_text('Lilu')
+  root.joinpath('Artifacts.zip').write_bytes(make_zip({
+    'VirtualSMC-RELEASE.zip': make_zip({
+      'VirtualSMC.kext/Contents/Info.plist': 'RELEASE',
+      'VirtualSMC.kext/Contents/MacOS/VirtualSMC': 'RELEASE'
+    }),
+    'VirtualSMC-DEBUG.zip': make_zip({
+      'VirtualSMC.kext/Contents/Info.plist': 'DEBUG'
+    })
+  }))
+  with ArchiveView(root) as view:
+    # Nested archives are globbed without being unpacked
+    assert sorted(view.glob('**/*.kext/**/Info.plist')) == [
+      'Artifacts.zip/VirtualSMC-DEBUG.zip/VirtualSMC.kext/Contents/Info.plist',
+      'Artifacts.zip/VirtualSMC-RELEASE.zip/VirtualSMC.kext/Contents/Info.plist',
+      'Lilu.kext/Contents/Info.plist'
+    ]
+    assert not root.joinpath('Artifacts').exists()
+    # Paths are indexed by (case-sensitive) suffix and by bundle
+    assert sorted(view.find('.kext')) == [
+      'Artifacts.zip/VirtualSMC-DEBUG.zip/VirtualSMC.kext',
+      'Artifacts.zip/VirtualSMC-RELEASE.zip/VirtualSMC.kext',
+      'Lilu.kext'
+    ]
+    assert view.find('.KEXT') == []
+    assert view.bundle('Lilu.kext') == \
+      ['Lilu.kext/Contents', 'Lilu.kext/Contents/Info.plist']
+    assert view.is_dir('Lilu.kext') and not view.is_dir('Artifacts.zip')
+    assert view.size('Lilu.kext/Contents/Info.plist') == len('Lilu')
+    assert view.size('Artifacts.zip/VirtualSMC-RELEASE.zip/'
+                     'VirtualSMC.kext/Contents/Info.plist') == len('RELEASE')
+    assert view.exists('Artifacts.zip/VirtualSMC-DEBUG.zip')
+    # Only selected paths are extracted
+    kext = view.extract('Artifacts.zip/VirtualSMC-RELEASE.zip/VirtualSMC.kext')
+    assert kext == root.joinpath('Artifacts/VirtualSMC-RELEASE/VirtualSMC.kext')
+    assert kext.joinpath('Contents/MacOS/VirtualSMC').read_text() == 'RELEASE'
+    assert not root.joinpath('Artifacts/VirtualSMC-DEBUG').exists()
+    # Paths outside of archives are already on disk
+    assert view.extract('Lilu.kext') == root.joinpath('Lilu.kext')
+    # Views of subdirectories share the index of the view
+    artifacts = view.view('Artifacts.zip')
+    assert artifacts.root == root.joinpath('Artifacts.zip')
+    assert artifacts.find('.kext') == ['VirtualSMC-RELEASE.zip/VirtualSMC.kext',
+                                       'VirtualSMC-DEBUG.zip/VirtualSMC.kext']
+    assert artifacts.resolve('VirtualSMC-DEBUG.zip/VirtualSMC.kext') == \
+      root.joinpath('Artifacts/VirtualSMC-DEBUG/VirtualSMC.kext')
+  # Nested archives are only opened if requested
+  with ArchiveView(root, archives=False) as view:
+    assert sorted(view.find('.kext')) == \
+      ['Artifacts/VirtualSMC-RELEASE/VirtualSMC.kext', 'Lilu.kext']
+    assert view.bundle('Artifacts.zip') == []
+
+def test_extract_archive(http_server):
+  buffer = BytesIO()
+  with ZipFile(buffer, 'w') as zf:
+    zf.writestr('Foo.kext/Contents/Info.plist', '<plist/>')
+  http_server.routes['/Foo-1.0.0-RELEASE.zip'] = buffer.getvalue()
+  updates = []
+  with extract_archive(http_server.url('/Foo-1.0.0-RELEASE.zip'),
+                       progress=lambda *args: updates.append(args)) as tmp_dir:
+    assert tmp_dir.joinpath('Foo.kext/Contents/Info.plist').read_text() == \
+      '<plist/>'
+  assert not tmp_dir.exists()
+  assert updates[-1][:2] == (len(buffer.getvalue()),) * 2
+
+def test_extract_archive_cache(http_server, store_dir):
+  buffer = BytesIO()
+  with ZipFile(buffer, 'w') as zf:
+    zf.writestr('Lilu.kext/Contents/Info.plist', '<plist/>')
+  http_server.routes['/Lilu.zip'] = buffer.getvalue()
+  # Repeated builds only download the archive once
+  for _ in range(3):
+    with _unpack_url(http_server.url('/Lilu.zip'), cache=True) \
+        as (tmp_dir, digest):
+      assert tmp_dir.joinpath('Lilu.kext/Contents/Info.plist').exists()
+      assert digest == sha256(buffer.getvalue()).hexdigest()
+  assert len(http_server.requests) == 1
+
+def test_extract_archive_extraction_cache(http_server, monkeypatch, store_dir):
+  buffer = BytesIO()
+  with ZipFile(buffer, 'w') as zf:
+    zf.writestr('Lilu.kext/Contents/Info.plist', '<plist/>')
+    zf.writestr('Lilu.kext.dSYM/Contents/Info.plist', '<plist/>')
+  http_server.routes['/Lilu.zip'] = buffer.getvalue()
+  url = http_server.url('/Lilu.zip')
+  include = lambda m: '.dSYM' not in m
+  with extract_archive(url, cache=True, include=include): pass
+  # Unchanged archives are copied from the extraction cache
+  def unpack_members(*args):
+    raise AssertionError('The archive should not be unpacked again.')
+  monkeypatch.setattr(archives_module, 'unpack_members', unpack_members)
+  for _ in range(2):
+    with _unpack_url(url, cache=True, include=include) as (tmp_dir, digest):
+      assert digest == sha256(buffer.getvalue()).hexdigest()
+      assert not tmp_dir.joinpath('Lilu.kext.dSYM').exists()
+      # Copies are writable while the cached tree is read-only
+      plist = tmp_dir.joinpath('Lilu.kext/Contents/Info.plist')
+      plist.write_text('<plist></plist>')
+  cached, = store_dir.joinpath('extracted').iterdir()
+  plist = cached.joinpath('Lilu.kext/Contents/Info.plist')
+  assert plist.read_text() == '<plist/>'
+  assert not plist.stat().st_mode & 0o222
+  # Trees are keyed by the members selected rather than by the filter
+  with extract_archive(url, cache=True,
+                       include=lambda m: m.startswith('Lilu.kext/')): pass
+  with pytest.raises(AssertionError):
+    with extract_archive(url, cache=True, include=lambda m: True): pass
+  assert len(http_server.requests) == 1
+
+def test_extract_archive_checksum(http_server, store_dir):
+  from ocebuild.errors import IntegrityError
+  buffer = BytesIO()
+  with ZipFile(buffer, 'w') as zf:
+    zf.writestr('Lilu.kext/Contents/Info.plist', '<plist/>')
+  http_server.routes['/Lilu.zip'] = buffer.getvalue()
+  url, checksum = http_server.url('/Lilu.zip'), sha256(b'foo').hexdigest()
+  for cache in (False, True):
+    with pytest.raises(IntegrityError, match='Checksum mismatch'):
+      with extract_archive(url, cache=cache, checksum=checksum): pass
+  # Mismatched downloads are not kept in the store
+  assert store_module.get_archive(url) is None
+  assert not list(store_dir.joinpath('partial').glob('*.part'))
+  checksum = sha256(buffer.getvalue()).hexdigest()
+  with _unpack_url(url, cache=True, checksum=checksum) as (tmp_dir, digest):
+    assert digest == checksum
+
+def _range_handler(body: bytes, drops: int, ranges: bool=True):
+  """Serves a file with range support, dropping the first connections."""
+  requests = []
+  def handler(h):
+    requests.append(h.headers.get('Range'))
+    start = 0
+    if ranges and (range_ := h.headers.get('Range')) and \
+        h.headers.get('If-Range') == '"v1"':
+      start = int(range_[len('bytes='):].rstrip('-'))
+    h.send_response(206 if start else 200)
+    h.send_header('ETag', '"v1"')
+    h.send_header('Content-Length', str(len(body) - start))
+    if start:
+      h.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+    h.end_headers()
+    if len(requests) <= drops:
+      # Drop the connection halfway through the remaining body
+      h.wfile.write(body[start:start + (len(body) - start) // 2])
+      h.close_connection = True
+    else:
+      h.wfile.write(body[start:])
+  return handler, requests
+
+@pytest.fixture
+def range_archive(http_server, store_dir):
+  buffer = BytesIO()
+  with ZipFile(buffer, 'w') as zf:
+    zf.writestr('OpenCore/EFI/OC/OpenCore.efi', bytes(range(256)) * 4096)
+  return http_server.url('/OpenCore.zip'), buffer.getvalue()
+
+def test_extract_archive_resumes_downloads(http_server, range_archive):
+  url, body = range_archive
+  handler, requests = _range_handler(body, drops=2)
+  http_server.routes['/OpenCore.zip'] = handler
+  with _unpack_url(url, cache=True) as (tmp_dir, digest):
+    assert digest == sha256(body).hexdigest()
+    assert tmp_dir.joinpath('OpenCore/EFI/OC/OpenCore.efi').exists()
+  offset = len(body) // 2 + (len(body) - len(body) // 2) // 2
+  assert requests == [None, f'bytes={len(body) // 2}-', f'bytes={offset}-']
+
+def test_extract_archive_resumes_across_runs(http_server, range_archive,
+                                             monkeypatch):
+  url, body = range_archive
+  handler, requests = _range_handler(body, drops=1)
+  http_server.routes['/OpenCore.zip'] = handler
+  monkeypatch.setattr(archives_module, 'DOWNLOAD_RETRIES', 0)
+  with pytest.raises(Exception):
+    with extract_archive(url, cache=True): pass
+  # The partial download is kept in the store and resumed by the next build
+  with _unpack_url(url, cache=True) as (tmp_dir, digest):
+    assert digest == sha256(body).hexdigest()
+  assert requests == [None, f'bytes={len(body) // 2}-']
+
+def test_extract_archive_restarts_without_range_support(http_server,
+                                                        range_archive):
+  url, body = range_archive
+  handler, requests = _range_handler(body, drops=1, ranges=False)
+  http_server.routes['/OpenCore.zip'] = handler
+  with _unpack_url(url, cache=True) as (tmp_dir, digest):
+    assert digest == sha256(body).hexdigest()
+  assert len(requests) == 2
+
+def _tarball(files: dict) -> bytes:
+  buffer = BytesIO()
+  with tarfile.open(fileobj=buffer, mode='w:gz') as tf:
+    for name, data in files.items():
+      info = tarfile.TarInfo(name)
+      info.size = len(data)
+      tf.addfile(info, BytesIO(data))
+  return buffer.getvalue()
+
+@pytest.fixture
+def tarball(http_server, store_dir):
+  body = _tarball({
+    'OcBinaryData-master/Drivers/HfsPlus.efi': bytes(range(256)) * 4096,
+    'OcBinaryData-master/Resources/Audio/AXEFIAudio_Click.mp3': b'Click',
+    'OcBinaryData-master/README.md': b'README'
+  })
+  return http_server.url('/OcBinaryData-master.tar.gz'), body
+
+def test_extract_archive_streams_tarballs(http_server, tarball):
+  url, body = tarball
+  http_server.routes['/OcBinaryData-master.tar.gz'] = body
+  include = lambda m: '/README' not in m
+  for _ in range(2):
+    with _unpack_url(url, cache=True, include=include) as (tmp_dir, digest):
+      assert digest == sha256(body).hexdigest()
+      assert sorted(p.relative_to(tmp_dir).as_posix()
+                    for p in tmp_dir.glob('**/*') if p.is_file()) == [
+        'OcBinaryData-master/Drivers/HfsPlus.efi',
+        'OcBinaryData-master/Resources/Audio/AXEFIAudio_Click.mp3'
+      ]
+  # Streamed archives are written to the download store in the same pass
+  assert len(http_server.requests) == 1
+  assert store_module.get_archive(url)[1] == sha256(body).hexdigest()
+
+@pytest.mark.parametrize('tarball_route', [True, False])
+def test_extract_archive_serializes_downloads(http_server, tarball,
+                                              tarball_route, make_zip):
+  url, body = tarball
+  if not tarball_route:
+    url = url.replace('.tar.gz', '.zip')
+    body = make_zip({ 'README.md': 'README' })
+  http_server.routes[f"/{url.rpartition('/')[2]}"] = body
+  def extract():
+    with _unpack_url(url, cache=True) as (tmp_dir, digest):
+      return digest
+  with ThreadPoolExecutor(max_workers=4) as executor:
+    checksums = list(executor.map(lambda _: extract(), range(4)))
+  # Concurrent extractions of the same archive only download it once
+  assert checksums == [sha256(body).hexdigest()] * 4
+  assert len(http_server.requests) == 1
+
+def test_extract_archive_resumes_interrupted_streams(http_server, tarball):
+  url, body = tarball
+  handler, requests = _range_handler(body, drops=1)
+  http_server.routes['/OcBinaryData-master.tar.gz'] = handler
+  with _unpack_url(url, cache=True) as (tmp_dir, digest):
+    assert digest == sha256(body).hexdigest()
+    assert tmp_dir.joinpath('OcBinaryData-master/README.md').read_bytes() == \
+      b'README'
+  assert requests == [None, f'bytes={len(body) // 2}-']
+
+def _range_file_handler(body: bytes, ranges: bool=True):
+  """Serves a file with support for arbitrary byte ranges."""
+  requests = []
+  def handler(h):
+    requests.append(h.headers.get('Range'))
+    if not ranges or not (range_ := h.headers.get('Range')):
+      return h.respond(body)
+    start, end = range_[len('bytes='):].split('-')
+    if not start: start, end = max(0, len(body) - int(end)), len(body) - 1
+    start, end = int(start), min(int(end or len(body) - 1), len(body) - 1)
+    h.respond(body[start:end + 1], status=206, headers={
+      'ETag': '"v1"',
+      'Content-Range': f'bytes {start}-{end}/{len(body)}'
+    })
+  return handler, requests
+
+@pytest.fixture
+def remote_zip():
+  buffer = BytesIO()
+  with ZipFile(buffer, 'w', compression=ZIP_DEFLATED) as zf:
+    # Pad the archive so that members can't be read with the central directory
+    for i in range(4):
+      zf.writestr(f'AMD_Vanilla-master/{i}.bin', urandom(1 << 17))
+    zf.writestr('AMD_Vanilla-master/patches.plist', b'<plist></plist>')
+    zf.writestr('AMD_Vanilla-master/Docs/README.md', b'README')
+  return buffer.getvalue()
 
-def test_extract_archive(): pass # Not implemented
+@pytest.mark.parametrize('ranges', [True, False])
+def test_extract_member(http_server, remote_zip, ranges):
+  handler, requests = _range_file_handler(remote_zip, ranges=ranges)
+  http_server.routes['/master.zip'] = handler
+  url = http_server.url('/master.zip')
+  with extract_member(url, '**/patches.plist') as tmp_dir:
+    assert [p.relative_to(tmp_dir).as_posix()
+            for p in tmp_dir.glob('**/*') if p.is_file()] == \
+      ['AMD_Vanilla-master/patches.plist']
+    assert next(tmp_dir.glob('**/patches.plist')).read_bytes() == \
+      b'<plist></plist>'
+  # Only the central directory and the member are requested
+  if ranges:
+    assert len(requests) == 2
+    assert requests[0] == f'bytes=-{(1 << 16) + 22}'
+  else:
+    # The full file sent instead of the range is not downloaded again
+    assert len(requests) == 1
+  # Directories are extracted with their members
+  with extract_member(url, 'AMD_Vanilla-master/Docs') as tmp_dir:
+    assert tmp_dir.joinpath('AMD_Vanilla-master/Docs/README.md').is_file()
+  with pytest.raises(FileNotFoundError):
+    with extract_member(url, '**/config.plist'): pass
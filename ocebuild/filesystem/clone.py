@@ -0,0 +1,191 @@
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+"""Methods for cloning files and directories with copy-on-write support."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from os import (
+  PathLike,
+  chmod,
+  link as os_link,
+  listdir,
+  makedirs,
+  readlink,
+  scandir,
+  symlink,
+  unlink
+)
+from os.path import dirname, isdir, islink, join, lexists, samestat
+from shutil import copyfile, copystat
+from stat import S_IMODE, S_IWUSR
+
+from typing import Callable, Iterable, List, Optional, Set, Tuple, Union
+
+from .posix import remove
+
+
+COPY_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+"""The number of threads copying files concurrently."""
+
+_FICLONE = 0x40049409
+"""The Linux `ioctl()` request cloning the extents of a file (i.e. a reflink).
+@internal
+"""
+
+_NO_REFLINK: Set[Tuple[int, int]] = set()
+"""The pairs of devices known not to support reflinks.
+@internal
+"""
+
+def _unlink(path: str) -> None:
+  """Removes an existing file, symbolic link or directory.
+  @internal
+  """
+  if islink(path) or not isdir(path): unlink(path)
+  else: remove(path)
+
+def _reflink(src: str, dst: str, src_stat: os.stat_result) -> bool:
+  """Clones a file by sharing its extents (on e.g. btrfs or xfs).
+
+  Returns:
+    Whether the file was cloned.
+  @internal
+  """
+  try:
+    import fcntl #pylint: disable=import-outside-toplevel
+  except ImportError:
+    return False
+  devices = (src_stat.st_dev, os.stat(dirname(dst) or '.').st_dev)
+  if devices in _NO_REFLINK: return False
+  with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+    try:
+      fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+      return True
+    except OSError:
+      # Reflinks are only supported within a copy-on-write filesystem
+      _NO_REFLINK.add(devices)
+      return False
+
+def _is_identical(src: str, src_stat: os.stat_result, dst: str) -> bool:
+  """Checks whether a file matches a copy by size, mtime and digest.
+  @internal
+  """
+  try:
+    dst_stat = os.stat(dst)
+  except OSError:
+    return False
+  if samestat(src_stat, dst_stat): return True
+  if (src_stat.st_size, src_stat.st_mtime_ns) != \
+      (dst_stat.st_size, dst_stat.st_mtime_ns):
+    return False
+  #pylint: disable=import-outside-toplevel
+  from ocebuild.sources.binary import get_digest
+  # Sources are usually short-lived (e.g. unpacked to a temporary directory)
+  return get_digest(src, cache=False) == get_digest(dst)
+
+def _clone_file(src: str, dst: str, link: bool=False) -> None:
+  """Clones a file, skipping files matching an existing copy.
+  @internal
+  """
+  if islink(src):
+    if lexists(dst): _unlink(dst)
+    symlink(readlink(src), dst)
+    return
+  src_stat = os.stat(src)
+  if not islink(dst) and _is_identical(src, src_stat, dst): return
+  # Replace (rather than overwrite) existing files, which may share an inode
+  if lexists(dst): _unlink(dst)
+  if link:
+    try:
+      os_link(src, dst)
+      return
+    except OSError: pass
+  if not _reflink(src, dst, src_stat):
+    copyfile(src, dst)
+  copystat(src, dst)
+  # Copies are always writable, even if cloned from a read-only tree
+  chmod(dst, S_IMODE(src_stat.st_mode) | S_IWUSR)
+
+def _collect_files(src: str,
+                   dst: str,
+                   ignore: Optional[Callable[[str, List[str]], Iterable[str]]],
+                   prune: bool,
+                   files: List[Tuple[str, str]]
+                   ) -> None:
+  """Creates the directory tree of a copy and collects the files to clone.
+  @internal
+  """
+  with scandir(src) as it:
+    entries = list(it)
+  names = [e.name for e in entries]
+  ignored = set(ignore(src, names)) if ignore else set()
+  if lexists(dst) and (islink(dst) or not isdir(dst)): unlink(dst)
+  makedirs(dst, exist_ok=True)
+  for entry in entries:
+    if entry.name in ignored: continue
+    target = join(dst, entry.name)
+    if entry.is_dir(follow_symlinks=False):
+      _collect_files(entry.path, target, ignore, prune, files)
+    else:
+      files.append((entry.path, target))
+  # Remove stale files from a previous copy
+  if prune:
+    for name in set(listdir(dst)) - (set(names) - ignored):
+      _unlink(join(dst, name))
+
+def clone(src: Union[str, "PathLike[str]"],
+          dest: Union[str, "PathLike[str]"],
+          link: bool=False,
+          prune: bool=False,
+          ignore: Optional[Callable[[str, List[str]], Iterable[str]]]=None,
+          workers: Optional[int]=None
+          ) -> None:
+  """Clones a file or directory.
+
+  Files are cloned with a reflink where supported by the filesystem (e.g. btrfs
+  or xfs), and are otherwise copied on a pool of threads. Files matching an
+  existing copy (by size, mtime and digest) are skipped, and existing files are
+  replaced rather than overwritten.
+
+  Args:
+    src: Source path.
+    dest: Destination path.
+    link: Whether to hardlink files instead of copying them. Hardlinks share
+      the mode of the source, so this should only be used with immutable
+      sources (e.g. the extraction cache). (Optional)
+    prune: Whether to remove files in the destination that are not in the
+      source directory. (Optional)
+    ignore: A callable returning the names to ignore in a directory, as with
+      `shutil.copytree()`. (Optional)
+    workers: The number of threads to use. Defaults to `COPY_WORKERS`.
+      (Optional)
+
+  Raises:
+    ValueError: If the path is not a file or directory.
+  """
+  src, dest = os.fspath(src), os.fspath(dest)
+  if workers is None: workers = COPY_WORKERS
+  if not isdir(src) or islink(src):
+    if not lexists(src):
+      raise ValueError(f'Path is not a file or directory: {src}')
+    makedirs(dirname(dest) or '.', exist_ok=True)
+    return _clone_file(src, dest, link)
+
+  files: List[Tuple[str, str]] = []
+  _collect_files(src, dest, ignore, prune, files)
+  if workers > 1 and len(files) > 1:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      for task in [executor.submit(_clone_file, s, d, link) for s, d in files]:
+        task.result()
+  else:
+    for s, d in files: _clone_file(s, d, link)
+
+
+__all__ = [
+  # Constants (1)
+  "COPY_WORKERS",
+  # Functions (1)
+  "clone"
+]
@@ -0,0 +1,69 @@
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+
+from os import chmod, symlink
+
+import pytest
+
+from .clone import *
+
+from third_party.cpython.pathlib import Path
+
+
+@pytest.fixture
+def tree(tmp_path):
+  src = Path(tmp_path, 'Lilu.kext')
+  src.joinpath('Contents', 'MacOS').mkdir(parents=True)
+  src.joinpath('Contents', 'Info.plist').write_text('<plist/>')
+  src.joinpath('Contents', 'MacOS', 'Lilu').write_bytes(b'\xca\xfe' * 1024)
+  symlink('MacOS/Lilu', src.joinpath('Contents', 'Lilu'))
+  # Mirror the read-only trees of the extraction cache
+  for file in (src.joinpath('Contents', 'Info.plist'),
+               src.joinpath('Contents', 'MacOS', 'Lilu')):
+    chmod(file, 0o444)
+  return src
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_clone(tree, tmp_path, workers):
+  dest = Path(tmp_path, 'EFI', 'OC', 'Kexts', 'Lilu.kext')
+  clone(tree, dest, workers=workers)
+  plist = dest.joinpath('Contents', 'Info.plist')
+  assert plist.read_text() == '<plist/>'
+  assert dest.joinpath('Contents', 'Lilu').is_symlink()
+  # Copies are writable and keep the mtime of the source
+  assert plist.stat().st_mode & 0o200
+  assert plist.stat().st_mtime_ns == \
+    tree.joinpath('Contents', 'Info.plist').stat().st_mtime_ns
+
+  # Unchanged files are skipped, while stale files are pruned
+  inode = plist.stat().st_ino
+  dest.joinpath('Contents', 'Stale.plist').write_text('<plist/>')
+  clone(tree, dest, prune=True, workers=workers)
+  assert plist.stat().st_ino == inode
+  assert not dest.joinpath('Contents', 'Stale.plist').exists()
+
+  # Changed files are replaced
+  plist.write_text('<plist></plist>')
+  clone(tree, dest, workers=workers)
+  assert plist.read_text() == '<plist/>'
+
+def test_clone_link(tree, tmp_path):
+  dest = Path(tmp_path, 'EFI', 'OC', 'Kexts', 'Lilu.kext')
+  clone(tree, dest, link=True)
+  src_binary = tree.joinpath('Contents', 'MacOS', 'Lilu')
+  binary = dest.joinpath('Contents', 'MacOS', 'Lilu')
+  assert binary.stat().st_ino == src_binary.stat().st_ino
+  # Hardlinked files are replaced without modifying the source
+  clone(tree.joinpath('Contents', 'Info.plist'), binary)
+  assert src_binary.read_bytes() == b'\xca\xfe' * 1024
+  assert binary.read_text() == '<plist/>'
+
+def test_clone_file(tree, tmp_path):
+  dest = Path(tmp_path, 'config.plist')
+  clone(tree.joinpath('Contents', 'Info.plist'), dest)
+  dest.write_text('<plist></plist>')
+  assert tree.joinpath('Contents', 'Info.plist').read_text() == '<plist/>'
+  with pytest.raises(ValueError):
+    clone(tmp_path.joinpath('Missing.plist'), dest)
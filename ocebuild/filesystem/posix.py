@@ -4,14 +4,30 @@
 ##
 """Methods for handling cross-platform file system operations."""
 
-from os import PathLike, rename as os_rename
+import os
+import re
+from collections import deque
+from fnmatch import translate
+from os import PathLike, rename as os_rename, scandir
 from shutil import copy as _copy, copytree, move as shutil_move, rmtree
 
-from typing import Generator, List, Optional, Union
+from typing import (
+  Generator,
+  Iterable,
+  List,
+  Optional,
+  Pattern,
+  Set,
+  Tuple,
+  Union
+)
 
 from third_party.cpython.pathlib import Path
 
 
+GLOB_PRUNE = ('.git', '.hg', '.svn', '__pycache__')
+"""Names of directories skipped by `glob()` by default."""
+
 def copy(src: Union[str, "PathLike[str]"],
          dest: Union[str, "PathLike[str]"],
          **kwargs
@@ -92,13 +108,96 @@ def move(src: Union[str, "PathLike[str]"],
   shutil_move(str(src), parent_dir if not name else dest, kwargs)
   return dest
 
+def _compile_pattern(pattern: str) -> Tuple[Tuple[Union[Pattern, None], ...],
+                                             bool]:
+  """Compiles a glob pattern into a regular expression per path segment.
+
+  Recursive (`**`) segments are compiled to None. Patterns ending with a path
+  separator (or a recursive segment) only match directories.
+  @internal
+  """
+  flags = re.IGNORECASE if os.name == 'nt' else 0
+  segments = tuple(None if s == '**' else re.compile(translate(s), flags)
+                   for s in pattern.split('/') if s not in ('', '.'))
+  dir_only = pattern.endswith('/') or (bool(segments) and segments[-1] is None)
+  return segments, dir_only
+
+def _match_segments(parts: Tuple[str, ...],
+                    segments: Tuple[Union[Pattern, None], ...],
+                    partial: bool=False,
+                    i: int=0,
+                    j: int=0
+                    ) -> bool:
+  """Matches the parts of a relative path against compiled glob segments.
+
+  If `partial` is set, this instead returns whether a path below the given path
+  may match (i.e. whether its directory should be walked).
+  @internal
+  """
+  if j == len(segments):
+    return i == len(parts) and not partial
+  elif i == len(parts):
+    return partial or all(s is None for s in segments[j:])
+  elif segments[j] is None:
+    return _match_segments(parts, segments, partial, i, j + 1) or \
+      _match_segments(parts, segments, partial, i + 1, j)
+  return bool(segments[j].match(parts[i])) and \
+    _match_segments(parts, segments, partial, i + 1, j + 1)
+
+def _iter_glob(directory: Path,
+               patterns: List[Tuple[Tuple[Union[Pattern, None], ...], bool]],
+               excludes: List[Tuple[Tuple[Union[Pattern, None], ...], bool]],
+               prune: Set[Union[str, Tuple[str, ...]]]
+               ) -> Generator[Path, None, None]:
+  """Walks a directory once, yielding the paths matching any pattern.
+
+  The directory is walked breadth-first, so that shallower matches are yielded
+  before deeper ones, and only subdirectories that may contain a match are
+  walked. Subdirectories are pruned by name or by their relative path parts.
+  @internal
+  """
+  def matches(parts, is_dir, compiled):
+    return any(_match_segments(parts, segments) and (is_dir or not dir_only)
+               for segments, dir_only in compiled)
+  queue = deque([()])
+  while queue:
+    parts = queue.popleft()
+    try:
+      with scandir(os.path.join(directory, *parts)) as it:
+        entries = list(it)
+    # Skip unreadable directories (or those removed while walking)
+    except OSError:
+      continue
+    for entry in entries:
+      entry_parts = (*parts, entry.name)
+      try:
+        is_dir = entry.is_dir()
+      except OSError:
+        is_dir = False
+      if matches(entry_parts, is_dir, patterns) and \
+          not matches(entry_parts, is_dir, excludes):
+        yield directory.joinpath(*entry_parts)
+      # Don't follow symlinks to directories (as with `Path.glob()`)
+      if is_dir and not entry.is_symlink() and \
+          entry.name not in prune and entry_parts not in prune and \
+          any(_match_segments(entry_parts, segments, partial=True)
+              for segments, _ in patterns):
+        queue.append(entry_parts)
+
 def glob(directory: Union[str, "PathLike[str]"],
          pattern: str,
          include: Optional[Union[str, List[str]]]=None,
          exclude: Optional[Union[str, List[str]]]=None,
-         first: Optional[bool] = False
+         first: Optional[bool] = False,
+         prune: Optional[Iterable[Union[str, "PathLike[str]"]]]=GLOB_PRUNE
          ) -> Union[Generator[Path, None, None], Path, None]:
-  """Returns a list of paths matching the given pattern.
+  """Returns the paths matching the given patterns.
+
+  The directory is walked once (breadth-first) for all patterns, skipping
+  subdirectories that cannot contain a match or that are pruned (e.g. version
+  control directories or a build output directory). Matches are yielded lazily
+  and shallowest first, so that the walk stops once the first match is found if
+  `first` is `True`.
 
   Args:
     directory: Directory to search.
@@ -106,30 +205,35 @@ def glob(directory: Union[str, "PathLike[str]"],
     include: A glob pattern or list of glob patterns to include.
     exclude: A glob pattern or list of glob patterns to exclude.
     first (Optional): Whether to return only the first match.
+    prune (Optional): Names of directories to skip anywhere in the directory,
+      or paths of directories to skip (e.g. `Path('dist')`). Defaults to
+      `GLOB_PRUNE`.
 
   Returns:
-    A list of matching paths.
+    A generator of matching paths.
     Instead returns the first matching path if `first` is `True`.
   """
-  matches = list(Path(directory).glob(pattern))
-  if include is not None:
-    if isinstance(include, str): include = [include]
-    include_matches = set()
-    for s in include:
-      include_matches |= set(Path(directory).glob(s))
-    matches = list((*set(matches), *include_matches))
-  if exclude is not None:
-    if isinstance(exclude, str): exclude = [exclude]
-    exclude_matches = set()
-    for s in exclude:
-      exclude_matches |= set(Path(directory).glob(s))
-    matches = list(set(matches) - exclude_matches)
+  if isinstance(include, str): include = [include]
+  if isinstance(exclude, str): exclude = [exclude]
+  patterns = [_compile_pattern(p) for p in (pattern, *(include or ()))]
+  excludes = [_compile_pattern(p) for p in (exclude or ())]
+  pruned = set()
+  for p in prune or ():
+    if isinstance(p, str) and '/' not in p and os.sep not in p:
+      pruned.add(p)
+    else:
+      # Prune paths relative to the directory (ignoring paths outside of it)
+      parts = Path(os.path.relpath(os.path.abspath(Path(directory, p)),
+                                   os.path.abspath(directory))).parts
+      if parts and parts[0] != '..': pruned.add(parts)
+  matches = _iter_glob(Path(directory), patterns, excludes, pruned)
   if first:
-    return matches[0] if matches else None
+    return next(matches, None)
   return matches
 
-
 __all__ = [
+  # Constants (1)
+  "GLOB_PRUNE",
   # Functions (5)
   "copy",
   "remove",
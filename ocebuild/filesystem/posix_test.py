@@ -7,9 +7,69 @@ import pytest
 
 from .posix import *
 
+from third_party.cpython.pathlib import Path
+
 
 def test_rename(): pass # Not implemented
 
 def test_move(): pass # Not implemented
 
-def test_glob(): pass # Not implemented
+@pytest.fixture
+def project(tmp_path):
+  for path in ('build.yml',
+               'config.yml',
+               'patches/patch.plist',
+               'patches/patch.yaml',
+               'dist/EFI/OC/config.plist',
+               'dist/EFI/OC/Kexts/Lilu.kext/Contents/Info.plist',
+               'dist/EFI/OC/Kexts/Lilu.kext/Contents/PlugIns/A.kext/Info.plist',
+               '.git/build.yml'):
+    tmp_path.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path.joinpath(path).touch()
+  return Path(tmp_path)
+
+def test_glob(project):
+  def relative(paths):
+    return sorted(p.relative_to(project).as_posix() for p in paths)
+  # Matches are lazy, and version control directories are pruned
+  matches = glob(project, '**/build.yml', include='**/build.yaml')
+  assert not isinstance(matches, list)
+  assert relative(matches) == ['build.yml']
+  assert relative(glob(project, '**/build.yml', prune=())) == \
+    ['.git/build.yml', 'build.yml']
+  # Multiple patterns are matched in a single walk
+  assert relative(glob(project, '**/config*.yml',
+                       include=['**/patch*.yaml', '**/patch*.plist'],
+                       exclude='patches/patch.plist')) == \
+    ['config.yml', 'patches/patch.yaml']
+  # Patterns ending with a separator only match directories
+  assert relative(glob(project, '**/OC/*/')) == ['dist/EFI/OC/Kexts']
+  assert relative(glob(project, 'dist/*')) == ['dist/EFI']
+  # Shallower matches are returned first
+  assert glob(project.joinpath('dist/EFI/OC/Kexts/Lilu.kext'),
+              '**/Info.plist', first=True) == \
+    project.joinpath('dist/EFI/OC/Kexts/Lilu.kext/Contents/Info.plist')
+  assert glob(project, '**/OpenCore.efi', first=True) is None
+
+def test_glob_breadth_first(project, monkeypatch):
+  from . import posix as posix_module
+  project.joinpath('build.yml').unlink()
+  project.joinpath('src').mkdir()
+  project.joinpath('src/build.yml').touch()
+  walked, scandir = [], posix_module.scandir
+  def _scandir(path):
+    walked.append(Path(path).relative_to(project).as_posix())
+    return scandir(path)
+  monkeypatch.setattr(posix_module, 'scandir', _scandir)
+  # Shallower matches are found before deeper directories are walked
+  assert glob(project, '**/build.yml', first=True) == \
+    project.joinpath('src/build.yml')
+  assert 'dist/EFI' not in walked
+  # Build output directories are pruned by path
+  walked.clear()
+  assert list(glob(project, '**/*.plist',
+                   prune=(*GLOB_PRUNE, project.joinpath('dist')))) == \
+    [project.joinpath('patches/patch.plist')]
+  assert not any(p.startswith('dist') for p in walked)
+  assert len(list(glob(project, '**/Info.plist',
+                       prune=['dist/EFI/OC/Kexts/Lilu.kext/Contents']))) == 0
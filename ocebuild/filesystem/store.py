@@ -0,0 +1,389 @@
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+"""Methods for storing and retrieving downloaded archives by content."""
+
+import os
+from contextlib import contextmanager
+from hashlib import sha256
+from json import dump, load
+from os import chmod, getpid, lstat, rename, replace, scandir, utime, walk
+from os.path import islink, join
+from shutil import copytree, rmtree
+from stat import S_IMODE, S_ISREG, S_IWRITE
+from sys import version_info
+from threading import get_ident, Lock
+from urllib.request import Request
+
+from typing import BinaryIO, Dict, Generator, List, Optional, Tuple, Union
+
+from .cache import CACHE_DIR
+from .posix import remove
+
+from third_party.cpython.pathlib import Path
+
+
+STORE_DIR = CACHE_DIR.joinpath('store')
+"""Directory of the content-addressed download store.
+
+Archives are stored once per SHA-256 digest under `objects/<digest>/<filename>`
+and are indexed by their resolved URL under `urls/<url hash>.json`, so that the
+same archive is shared between builds and projects. Interrupted downloads are
+kept under `partial/<url hash>.part` so they can be resumed, and are guarded by
+a `partial/<url hash>.lock` lockfile shared between processes.
+
+Unpacked archives are kept as read-only trees under `extracted/<hash>`, hashed
+from the archive digest and the key of the members unpacked from it.
+"""
+
+EXTRACTED_CACHE_SIZE = 2 << 30
+"""The maximum size of the extraction cache (in bytes)."""
+
+def get_url(url: Union[str, Request]) -> str:
+  """Returns the URL string of a URL or request.
+
+  Args:
+    url: The URL string or request object.
+
+  Returns:
+    The full URL string, used to key entries in the store.
+  """
+  return url.full_url if isinstance(url, Request) else url
+
+def _url_hash(url: Union[str, Request]) -> str:
+  """Returns the SHA-256 hash of a URL.
+  @internal
+  """
+  return sha256(get_url(url).encode('utf-8')).hexdigest()
+
+def _entry_path(url: Union[str, Request]) -> Path:
+  """Returns the path of the store index entry for a URL.
+  @internal
+  """
+  return STORE_DIR.joinpath('urls', f'{_url_hash(url)}.json')
+
+def _read_entry(url: Union[str, Request]) -> Union[dict, None]:
+  """Reads the store index entry for a URL.
+  @internal
+  """
+  try:
+    with open(_entry_path(url), 'r', encoding='UTF-8') as f:
+      entry = load(f)
+    return entry if entry.get('url') == get_url(url) else None
+  except (OSError, ValueError, AttributeError):
+    return None
+
+def _write_entry(url: Union[str, Request],
+                 entry: dict,
+                 entry_path: Optional[Path]=None
+                 ) -> None:
+  """Atomically writes the store index entry for a URL.
+  @internal
+  """
+  if entry_path is None: entry_path = _entry_path(url)
+  entry_path.parent.mkdir(parents=True, exist_ok=True)
+  tmp_path = entry_path.with_name(f'{entry_path.name}.{getpid()}-{get_ident()}')
+  with open(tmp_path, 'w', encoding='UTF-8') as f:
+    dump({ 'url': get_url(url), **entry }, f)
+  replace(tmp_path, entry_path)
+
+def _fingerprint(path: Path) -> List[int]:
+  """Returns the stat fingerprint (i.e. size, mtime, ctime and inode) of a file.
+  @internal
+  """
+  stat = path.stat()
+  return [stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino]
+
+def _verify_archive(path: Path, checksum: str) -> bool:
+  """Verifies the SHA-256 digest of a stored archive.
+  @internal
+  """
+  #pylint: disable=import-outside-toplevel
+  from ocebuild.sources.binary import get_digest
+  # Verified archives are memoized by the fingerprint of their store entry
+  return path.is_file() and get_digest(path, cache=False) == checksum
+
+def get_archive(url: Union[str, Request],
+                checksum: Optional[str]=None
+                ) -> Union[Tuple[Path, str], None]:
+  """Returns the stored archive for a URL (if available).
+
+  Stored archives are only re-hashed if their stat fingerprint has changed since
+  they were last verified, and are evicted from the store if they have been
+  modified or corrupted.
+
+  Args:
+    url: The resolved URL of the archive.
+    checksum: The expected SHA-256 digest of the archive. (Optional)
+
+  Returns:
+    A tuple of the path to the stored archive and its SHA-256 digest, or None.
+  """
+  if (entry := _read_entry(url)) is None: return None
+  if checksum and entry['checksum'] != checksum: return None
+  path = STORE_DIR.joinpath('objects', entry['checksum'], entry['filename'])
+  try:
+    verified = entry.get('fingerprint') == _fingerprint(path)
+  except OSError:
+    verified = False
+  if not verified:
+    if not _verify_archive(path, entry['checksum']):
+      remove(path)
+      _entry_path(url).unlink(missing_ok=True)
+      return None
+    _write_entry(url, { **entry, 'fingerprint': _fingerprint(path) })
+  return path, entry['checksum']
+
+def get_partial(url: Union[str, Request]) -> Tuple[Path, Union[dict, None]]:
+  """Returns the partial download of an archive and its resume metadata.
+
+  Args:
+    url: The resolved URL of the archive.
+
+  Returns:
+    A tuple containing:
+      - The path to download the archive into (which may not exist yet).
+      - The resume metadata (i.e. the `filename` and `validator` of the partial
+        download), or None if the download cannot be resumed.
+  """
+  partial_dir = STORE_DIR.joinpath('partial')
+  partial_dir.mkdir(parents=True, exist_ok=True)
+  path = partial_dir.joinpath(f'{_url_hash(url)}.part')
+  try:
+    with open(path.with_suffix('.json'), 'r', encoding='UTF-8') as f:
+      metadata = load(f)
+    if metadata.get('url') != get_url(url) or not path.is_file():
+      metadata = None
+  except (OSError, ValueError, AttributeError):
+    metadata = None
+  return path, metadata
+
+_PARTIAL_LOCKS: Dict[str, Lock] = {}
+"""In-process locks of partial downloads by URL hash."""
+
+_PARTIAL_LOCKS_LOCK = Lock()
+
+def _lock_file(f: BinaryIO, locked: bool=True) -> None:
+  """Acquires (or releases) an exclusive advisory lock on a file.
+  @internal
+  """
+  #pylint: disable=import-outside-toplevel
+  if os.name == 'nt':
+    import msvcrt
+    f.seek(0)
+    while True:
+      try:
+        return msvcrt.locking(f.fileno(),
+                              msvcrt.LK_LOCK if locked else msvcrt.LK_UNLCK,
+                              1)
+      except OSError:
+        # `LK_LOCK` gives up after 10 seconds
+        if not locked: raise
+  else:
+    import fcntl
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX if locked else fcntl.LOCK_UN)
+
+@contextmanager
+def lock_partial(url: Union[str, Request]) -> Generator[None, None, None]:
+  """Serializes downloads of an archive into the store.
+
+  The partial download of an archive (and its commit to the store) is guarded
+  by a lock shared between threads, and by a lockfile under
+  `partial/<url hash>.lock` shared between processes (e.g. concurrent builds
+  using the same store).
+
+  Args:
+    url: The resolved URL of the archive.
+
+  Example:
+    >>> with lock_partial(url):
+    ...   path, metadata = get_partial(url)
+  """
+  key = _url_hash(url)
+  with _PARTIAL_LOCKS_LOCK:
+    lock = _PARTIAL_LOCKS.setdefault(key, Lock())
+  with lock:
+    partial_dir = STORE_DIR.joinpath('partial')
+    partial_dir.mkdir(parents=True, exist_ok=True)
+    with open(partial_dir.joinpath(f'{key}.lock'), 'ab') as f:
+      _lock_file(f)
+      try:
+        yield
+      finally:
+        _lock_file(f, locked=False)
+
+def set_partial(url: Union[str, Request],
+                metadata: Optional[dict]=None
+                ) -> None:
+  """Sets (or clears) the resume metadata of a partial download.
+
+  Args:
+    url: The resolved URL of the archive.
+    metadata: The `filename` and `validator` (i.e. the ETag or Last-Modified
+      header) of the partial download, or None to clear it.
+  """
+  path, _ = get_partial(url)
+  if metadata is not None:
+    _write_entry(url, metadata, entry_path=path.with_suffix('.json'))
+  else:
+    path.with_suffix('.json').unlink(missing_ok=True)
+
+def add_archive(url: Union[str, Request],
+                tmp_path: Union[str, Path],
+                filename: str,
+                checksum: str
+                ) -> Path:
+  """Moves a downloaded archive into the store and indexes it by URL.
+
+  Args:
+    url: The resolved URL of the archive.
+    tmp_path: The path of the downloaded archive (e.g. from `get_partial()`).
+    filename: The filename of the archive.
+    checksum: The SHA-256 digest of the archive.
+
+  Returns:
+    The path to the stored archive.
+  """
+  path = STORE_DIR.joinpath('objects', checksum, filename)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  # Archives with the same content are only stored once
+  if path.is_file(): Path(tmp_path).unlink()
+  else: replace(tmp_path, path)
+  _write_entry(url, { 'checksum': checksum,
+                      'filename': filename,
+                      'fingerprint': _fingerprint(path) })
+  return path
+
+_EXTRACTED_EVICTED = False
+"""Whether the extraction cache was evicted by this process."""
+
+def _extracted_path(checksum: str, key: str) -> Path:
+  """Returns the path of an unpacked archive in the extraction cache.
+  @internal
+  """
+  digest = sha256(f'{checksum}:{key}'.encode('utf-8')).hexdigest()
+  return STORE_DIR.joinpath('extracted', digest)
+
+def get_extracted(checksum: str, key: str='') -> Union[Path, None]:
+  """Returns the cached unpacked tree of an archive (if available).
+
+  Args:
+    checksum: The SHA-256 digest of the archive.
+    key: The key of the members unpacked from the archive, or an empty string
+      if the archive was unpacked in full. (Optional)
+
+  Returns:
+    The path to the read-only unpacked tree, or None.
+  """
+  path = _extracted_path(checksum, key)
+  try:
+    # Mark the tree as recently used
+    utime(path)
+  except OSError:
+    return None
+  return path
+
+def _remove_readonly(func, path: str, _) -> None:
+  """Restores write permission to a path and retries removing it.
+
+  Read-only files can't be removed on Windows.
+  @internal
+  """
+  if not islink(path): chmod(path, S_IMODE(lstat(path).st_mode) | S_IWRITE)
+  func(path)
+
+def _remove_tree(path: Union[str, Path]) -> None:
+  """Removes a read-only tree of the extraction cache.
+  @internal
+  """
+  if version_info >= (3, 12): rmtree(path, onexc=_remove_readonly)
+  else: rmtree(path, onerror=_remove_readonly)
+
+def _tree_size(path: str) -> int:
+  """Returns the total size of the files in a directory tree.
+  @internal
+  """
+  return sum(lstat(join(dirpath, name)).st_size
+             for dirpath, _, filenames in walk(path) for name in filenames)
+
+def evict_extracted(max_size: int=EXTRACTED_CACHE_SIZE) -> None:
+  """Evicts the least recently used trees exceeding the extraction cache size.
+
+  Args:
+    max_size: The maximum size of the extraction cache (in bytes). (Optional)
+  """
+  trees = []
+  try:
+    with scandir(STORE_DIR.joinpath('extracted')) as it:
+      for e in it:
+        # Skip trees that are still being added
+        if '.' in e.name or not e.is_dir(): continue
+        trees.append((e.stat().st_mtime, _tree_size(e.path), e.path))
+  except OSError:
+    return
+  size = sum(s for _, s, _ in trees)
+  for _, tree_size, path in sorted(trees):
+    if size <= max_size: break
+    try:
+      _remove_tree(path)
+    except OSError: pass
+    size -= tree_size
+
+def add_extracted(checksum: str,
+                  extract_dir: Union[str, Path],
+                  key: str=''
+                  ) -> Path:
+  """Copies an unpacked archive into the extraction cache as a read-only tree.
+
+  The least recently used trees are evicted once the extraction cache exceeds
+  `EXTRACTED_CACHE_SIZE` (see `evict_extracted()`).
+
+  Args:
+    checksum: The SHA-256 digest of the archive.
+    extract_dir: The directory the archive was unpacked to.
+    key: The key of the members unpacked from the archive, or an empty string
+      if the archive was unpacked in full. (Optional)
+
+  Returns:
+    The path to the read-only unpacked tree.
+  """
+  global _EXTRACTED_EVICTED #pylint: disable=global-statement
+  path = _extracted_path(checksum, key)
+  if path.is_dir(): return path
+  tmp_path = path.with_name(f'{path.name}.{getpid()}-{get_ident()}')
+  copytree(extract_dir, tmp_path, symlinks=True)
+  for dirpath, _, filenames in walk(tmp_path):
+    for name in filenames:
+      file = join(dirpath, name)
+      if S_ISREG(mode := lstat(file).st_mode):
+        chmod(file, S_IMODE(mode) & ~0o222)
+  try:
+    rename(tmp_path, path)
+  except OSError:
+    # The same tree was cached concurrently
+    try:
+      _remove_tree(tmp_path)
+    except OSError: pass
+  # Bound the size of the cache once per process
+  if not _EXTRACTED_EVICTED:
+    _EXTRACTED_EVICTED = True
+    evict_extracted()
+  return path
+
+
+__all__ = [
+  # Constants (2)
+  "STORE_DIR",
+  "EXTRACTED_CACHE_SIZE",
+  # Functions (9)
+  "get_url",
+  "get_archive",
+  "get_partial",
+  "lock_partial",
+  "set_partial",
+  "add_archive",
+  "get_extracted",
+  "evict_extracted",
+  "add_extracted"
+]
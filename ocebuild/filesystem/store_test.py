@@ -0,0 +1,125 @@
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+
+import os
+from hashlib import sha256
+from os import utime
+from stat import S_IWRITE
+from threading import Thread
+from time import sleep
+
+from . import store as store_module
+from .store import *
+
+
+def _add(url: str, body: bytes, filename: str='Lilu-1.6.7-RELEASE.zip'):
+  path, _ = get_partial(url)
+  path.write_bytes(body)
+  return add_archive(url, path, filename, sha256(body).hexdigest())
+
+def test_add_archive(store_dir):
+  url = 'https://github.com/acidanthera/Lilu/releases/download/1.6.7/Lilu.zip'
+  assert get_archive(url) is None
+  path = _add(url, b'foo')
+  assert path.read_bytes() == b'foo'
+  assert path.name == 'Lilu-1.6.7-RELEASE.zip'
+  assert get_archive(url) == (path, sha256(b'foo').hexdigest())
+  # Archives with the same content are only stored once
+  assert _add('https://example.com/Lilu.zip', b'foo') == path
+  assert len(list(store_dir.joinpath('objects').iterdir())) == 1
+  assert not list(store_dir.joinpath('partial').iterdir())
+
+def test_get_archive_evicts_corrupted_archives(store_dir):
+  url = 'https://example.com/Lilu.zip'
+  path = _add(url, b'foo')
+  path.write_bytes(b'bar')
+  assert get_archive(url) is None
+  assert not path.exists()
+
+def test_get_archive_reuses_stat_fingerprint(store_dir, monkeypatch):
+  url = 'https://example.com/Lilu.zip'
+  path = _add(url, b'foo')
+  verified = []
+  def _verify_archive(*args):
+    verified.append(args)
+    return True
+  monkeypatch.setattr(store_module, '_verify_archive', _verify_archive)
+  # Unchanged archives are not re-hashed
+  for _ in range(3): assert get_archive(url)[0] == path
+  assert not verified
+  # Only archives with a matching checksum are returned
+  assert get_archive(url, sha256(b'foo').hexdigest())[0] == path
+  assert get_archive(url, sha256(b'bar').hexdigest()) is None
+  # Touched archives are re-hashed once and their fingerprint is updated
+  path.touch()
+  for _ in range(3): assert get_archive(url)[0] == path
+  assert len(verified) == 1
+
+def test_set_partial(store_dir):
+  url = 'https://example.com/OpenCore-1.0.0-RELEASE.zip'
+  path, metadata = get_partial(url)
+  assert metadata is None
+  set_partial(url, { 'filename': 'OpenCore.zip', 'validator': '"v1"' })
+  # Metadata is only returned once a partial download exists
+  assert get_partial(url)[1] is None
+  path.write_bytes(b'foo')
+  assert get_partial(url)[1]['validator'] == '"v1"'
+  set_partial(url, None)
+  assert get_partial(url) == (path, None)
+
+def test_lock_partial(store_dir):
+  url = 'https://example.com/OpenCore-1.0.0-RELEASE.zip'
+  active, overlaps = [], []
+  def download():
+    with lock_partial(url):
+      overlaps.append(len(active))
+      active.append(1)
+      sleep(0.01)
+      active.pop()
+  threads = [Thread(target=download) for _ in range(4)]
+  for thread in threads: thread.start()
+  for thread in threads: thread.join()
+  # Downloads of the same archive never overlap
+  assert overlaps == [0] * 4
+  path, _ = get_partial(url)
+  assert path.with_suffix('.lock').is_file()
+
+def test_extracted_cache_evicts_least_recently_used(store_dir, tmp_path):
+  trees = []
+  for i in range(3):
+    extract_dir = tmp_path.joinpath(f'tree{i}')
+    extract_dir.mkdir()
+    extract_dir.joinpath('data').write_bytes(bytes(1024))
+    trees.append(add_extracted(sha256(bytes([i])).hexdigest(), extract_dir))
+  # Trees read from the cache are marked as recently used
+  utime(trees[0], (0, 0))
+  utime(trees[1], (1, 1))
+  utime(trees[2], (2, 2))
+  assert get_extracted(sha256(bytes([0])).hexdigest()) == trees[0]
+  evict_extracted(max_size=2048)
+  assert [tree.is_dir() for tree in trees] == [True, False, True]
+
+def test_extracted_cache_removes_read_only_trees(store_dir, tmp_path,
+                                                 monkeypatch):
+  extract_dir = tmp_path.joinpath('tree')
+  extract_dir.joinpath('Lilu.kext').mkdir(parents=True)
+  extract_dir.joinpath('Lilu.kext', 'Info.plist').write_text('<plist/>')
+  tree = add_extracted(sha256(b'tree').hexdigest(), extract_dir)
+  # Read-only files can't be removed on Windows
+  unlink = os.unlink
+  def unlink_writable(path, *, dir_fd=None):
+    if not os.lstat(path, dir_fd=dir_fd).st_mode & S_IWRITE:
+      raise PermissionError(path)
+    unlink(path, dir_fd=dir_fd)
+  monkeypatch.setattr(os, 'unlink', unlink_writable)
+  evict_extracted(max_size=0)
+  assert not tree.exists()
+  # Trees that can't be removed are left in the cache
+  tree = add_extracted(sha256(b'tree').hexdigest(), extract_dir)
+  def unlink_denied(path, *, dir_fd=None):
+    raise PermissionError(path)
+  monkeypatch.setattr(os, 'unlink', unlink_denied)
+  evict_extracted(max_size=0)
+  assert tree.exists()
@@ -4,17 +4,27 @@
 ##
 """Methods for handling and manipulating the build configuration."""
 
-from shutil import unpack_archive
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 from tempfile import mkdtemp
+from threading import Lock
+from time import perf_counter
 
-from typing import Dict, Iterator, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 
-from ocebuild.filesystem import copy, glob
-from ocebuild.filesystem.archives import extract_archive
+from ocebuild.filesystem import ArchiveView, copy, remove
+from ocebuild.filesystem.archives import unpack_url
 from ocebuild.filesystem.cache import UNPACK_DIR
 from ocebuild.parsers.dict import nested_get, nested_set
 from ocebuild.parsers.yaml import parse_yaml
+from ocebuild.pipeline.kexts import kext_archive_filter
 from ocebuild.pipeline.lock import _category_extension
+from ocebuild.pipeline.opencore import (
+  ocbinary_archive_filter,
+  opencore_archive_filter
+)
+from ocebuild.sources import DownloadProgress
 
 from third_party.cpython.pathlib import Path
 
@@ -87,56 +97,229 @@ def read_build_file(filepath: str,
 
   return build_config, build_vars, flags
 
+def _aggregate_progress(progress: DownloadProgress
+                        ) -> Callable[[int], DownloadProgress]:
+  """Returns a factory of download progress callbacks reporting in aggregate.
+  @internal
+  """
+  lock, downloads, start = Lock(), {}, perf_counter()
+  def track(key: int) -> DownloadProgress:
+    def update(downloaded: int, total: Union[int, None], _: float) -> None:
+      with lock:
+        downloads[key] = (downloaded, total)
+        done = sum(d for d,_ in downloads.values())
+        size = sum(t or d for d,t in downloads.values())
+        elapsed = perf_counter() - start
+        progress(done, size, done / elapsed if elapsed else 0.0)
+    return update
+  return track
+
+def _entry_filter(entry: dict,
+                  build_vars: dict,
+                  build_config: dict
+                  ) -> Union[Callable[[str], bool], None]:
+  """Returns a predicate selecting the archive members to unpack for an entry.
+  @internal
+  """
+  category, name = entry['__category'], entry['name']
+  if category == 'OpenCorePkg' and name == 'OpenCore':
+    return opencore_archive_filter(nested_get(build_vars,
+                                              ['variables', 'target'],
+                                              default='X64'))
+  elif category == 'OpenCorePkg' and name == 'OcBinaryData':
+    resources = nested_get(build_vars, ['variables', 'resources'])
+    if isinstance(resources, str):
+      resources = [r.strip() for r in resources.split(',') if r.strip()]
+    return ocbinary_archive_filter(resources)
+  elif category == 'Kexts':
+    names = set()
+    for k, e in build_config.get('Kexts', {}).items():
+      names |= { k, *nested_get(e, ['bundled'], default=[]) }
+    build = entry.get('build') or \
+      nested_get(build_vars, ['variables', 'build'], default='RELEASE')
+    return kext_archive_filter(names, build)
+  return None
+
+def _union_filter(filters: List[Union[Callable[[str], bool], None]]
+                  ) -> Union[Callable[[str], bool], None]:
+  """Returns a predicate selecting the members selected by any predicate.
+  @internal
+  """
+  if None in filters: return None
+  if len(filters) == 1: return filters[0]
+  def include(member: str) -> bool:
+    return any(f(member) for f in filters)
+  return include
+
+def _unpack_entry(entry: dict,
+                  project_dir: Path,
+                  progress: Optional[DownloadProgress]=None,
+                  include: Optional[Callable[[str], bool]]=None,
+                  link: bool=False
+                  ) -> Union[Tuple[Path, Union[str, None]], None]:
+  """Unpacks a single build entry to a temporary directory.
+
+  Returns:
+    A tuple of the temporary directory and the archive checksum of remote
+    entries, or None if the entry has nothing to unpack.
+  @internal
+  """
+  # Handle extracting remote entries
+  if (url := entry.get('url')):
+    tmpdir = Path(mkdtemp(dir=UNPACK_DIR))
+    try:
+      # Nested archives are only extracted once selected (see `ArchiveView`)
+      checksum = unpack_url(url, tmpdir, progress=progress, cache=True,
+                            checksum=entry.get('checksum'),
+                            include=include,
+                            link=link)
+    except BaseException:
+      remove(tmpdir)
+      raise
+    return tmpdir, checksum
+  # Handle extracting local entries
+  elif (path := entry.get('path')):
+    tmpdir = Path(mkdtemp(dir=UNPACK_DIR))
+    src = project_dir.joinpath(path)
+    copy(src, tmpdir.joinpath(tmpdir, src.name))
+    return tmpdir, None
+  # Skip wildcard specifiers
+  return None
+
 def unpack_build_entries(resolvers: List[dict],
                          project_dir: Path,
                          *args,
+                         jobs: int=1,
+                         progress: Optional[DownloadProgress]=None,
+                         build_vars: Optional[dict]=None,
+                         build_config: Optional[dict]=None,
+                         link: bool=False,
                          __wrapper: Optional[Iterator]=None,
                          **kwargs) -> dict:
-  """Unpacks the build entries from the build configuration."""
+  """Unpacks the build entries from the build configuration.
+
+  Remote entries are extracted from the download store when it holds a verified
+  copy of their archive, and are otherwise downloaded into the store. Archives
+  already unpacked with the same member filter are copied from the extraction
+  cache instead of being unpacked again. Entries are unpacked on a pool of
+  `jobs` worker threads (overlapping downloads with the extraction of already
+  downloaded archives), but are always returned in build configuration order.
+  Entries with the same archive share a single extracted directory, and each
+  extracted directory is indexed once by an `ArchiveView` shared through the
+  entry's `__view` key by all later stages (see `extract_build_packages()`).
+
+  Remote entries with a lockfile `checksum` are verified against it, while the
+  checksum of all other remote entries is recorded on the entry for
+  `write_lockfile()`.
+
+  If the build variables and configuration are given, only the archive members
+  used by the build are unpacked (e.g. the target architecture of the OpenCore
+  package, the configured kexts of the configured build type, or the resource
+  packs selected by the `resources` variable for OcBinaryData). Archives
+  nested in an entry's archive are not unpacked, but are instead browsed with
+  the entry's `ArchiveView` when extracting packages.
+
+  Args:
+    resolvers: The resolved build entries to unpack.
+    project_dir: The project directory of local entries.
+    *args: Additional arguments to pass to the optional iterator wrapper.
+    jobs: The number of entries to unpack concurrently. (Optional)
+    progress: A callback receiving the aggregate download progress. (Optional)
+    build_vars: The build variables used to select archive members. (Optional)
+    build_config: The build configuration used to select archive members.
+      (Optional)
+    link: Whether to hardlink files from the extraction cache. (Optional)
+    __wrapper: A wrapper function to apply to the iterator. (Optional)
+    **kwargs: Additional keyword arguments to pass to the optional iterator wrapper.
+
+  Returns:
+    A dictionary of extracted entry paths by category and name.
+  """
+  track = _aggregate_progress(progress) if progress is not None else None
+
+  # Schedule the unpacking of each entry
+  def entry_filter(entry: dict) -> Union[Callable[[str], bool], None]:
+    if build_vars is None or build_config is None: return None
+    return _entry_filter(entry, build_vars, build_config)
+  def archive_key(entry: dict) -> Union[Tuple[str, str], None]:
+    if 'url' not in entry: return None
+    return entry['url'], entry.get('checksum')
+  # Entries sharing an archive (e.g. kexts from the same release) are unpacked
+  # once, selecting the members used by any of them
+  filters = {}
+  for entry in resolvers:
+    if (key := archive_key(entry)) is not None:
+      filters.setdefault(key, []).append(entry_filter(entry))
+  executor = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+  tasks, shared = [], {}
+  for i, entry in enumerate(resolvers):
+    if (key := archive_key(entry)) in shared:
+      tasks.append(shared[key])
+      continue
+    task = partial(_unpack_entry, entry, project_dir,
+                   track(i) if track is not None else None,
+                   _union_filter(filters[key]) if key is not None else None,
+                   link)
+    if executor is not None: task = executor.submit(task)
+    if key is not None: shared[key] = task
+    tasks.append(task)
 
   # Handle interactive mode for iterator
-  iterator = resolvers
-  if __wrapper is not None: iterator = __wrapper(iterator, *args, **kwargs)
-
-  extracted = {}
-  for entry in iterator:
-    tmpdir: Path
-    # Handle extracting remote entries
-    if (url := entry.get('url')):
-      with extract_archive(url, persist=True) as tmpdir:
-        for archive in tmpdir.glob('**/*.zip'):
-          unpack_archive(archive, tmpdir.joinpath(archive.name))
-    # Handle extracting local entries
-    elif (path := entry.get('path')):
-      tmpdir = Path(mkdtemp(dir=UNPACK_DIR))
-      src = project_dir.joinpath(path)
-      copy(src, tmpdir.joinpath(tmpdir, src.name))
-    # Skip wildcard specifiers
-    elif entry.get('specifier') == '*': continue
-    # Update extracted paths
-    entry['__extracted'] = tmpdir
-    nested_set(extracted, [entry['__category'], entry['name']], tmpdir)
+  iterator = zip(resolvers, tasks)
+  if __wrapper is not None:
+    iterator = zip(resolvers, __wrapper(tasks, *args, **kwargs))
+
+  extracted, unpacked = {}, {}
+  try:
+    # Update extracted paths in order of the build configuration
+    for entry, task in iterator:
+      if task not in unpacked:
+        result = task.result() if isinstance(task, Future) else task()
+        # Index each extracted directory once for all entries sharing it
+        if result is not None:
+          result = (*result, ArchiveView(result[0]))
+        unpacked[task] = result
+      if unpacked[task] is None: continue
+      tmpdir, checksum, view = unpacked[task]
+      if 'url' in entry: entry['checksum'] = checksum
+      entry['__extracted'] = tmpdir
+      entry['__view'] = view
+      nested_set(extracted, [entry['__category'], entry['name']], tmpdir)
+  finally:
+    if executor is not None:
+      # Cancel pending entries if unpacking failed
+      for task in tasks: task.cancel()
+      executor.shutdown(wait=True)
 
   return extracted
 
 def validate_build_directory(build_config: dict,
-                             out_dir: Union[str, Path]
+                             out_dir: Union[str, Path],
+                             view: Optional[ArchiveView]=None
                              ) -> Dict[str, List[str]]:
-  """Verifies that all build entries are present in the build directory."""
+  """Verifies that all build entries are present in the build directory.
+
+  Entries are looked up in the index of an existing view of the build
+  directory if given.
+  """
 
   missing_entries = {}
-  oc_dir = glob(out_dir, '**/OC/OpenCore.efi', first=True).parent
-  for category, entries in build_config.items():
-    path = oc_dir.joinpath(category)
-    if not path.exists(): continue
-    ext, _ = _category_extension(category)
-    matched_entries = set(f.stem for f in glob(path, f'**/*{ext}'))
-    for name, entry in entries.items():
-      if name not in matched_entries:
-        missing_entries.setdefault(category, []).append(name)
-      for bundled in entry.get('bundled', []):
-        if bundled not in matched_entries:
-          missing_entries.setdefault(category, []).append(bundled)
+  with (nullcontext(view) if view else
+        ArchiveView(out_dir, archives=False)) as view:
+    oc_dir = next(p.rpartition('/')[0] for p in view.find('.efi')
+                  if p == 'OC/OpenCore.efi' or p.endswith('/OC/OpenCore.efi'))
+    for category, entries in build_config.items():
+      path = f'{oc_dir}/{category}'
+      if not view.exists(path): continue
+      ext, _ = _category_extension(category)
+      matched_entries = set(Path(p).stem for p in view.find(ext)
+                            if p.startswith(f'{path}/'))
+      for name, entry in entries.items():
+        if name not in matched_entries:
+          missing_entries.setdefault(category, []).append(name)
+        for bundled in entry.get('bundled', []):
+          if bundled not in matched_entries:
+            missing_entries.setdefault(category, []).append(bundled)
 
   return missing_entries
 
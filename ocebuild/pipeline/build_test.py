@@ -7,3 +7,141 @@ import pytest
 
 from .build import *
 
+from third_party.cpython.pathlib import Path
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_unpack_build_entries(http_server, tmp_path, jobs, make_zip,
+                              store_dir):
+  resolvers = []
+  for name in ('Lilu', 'VirtualSMC', 'WhateverGreen'):
+    http_server.routes[f'/{name}.zip'] = make_zip({
+      f'{name}.kext/Contents/Info.plist': name,
+      'Utilities/Tools.zip': make_zip({ 'tool': name })
+    })
+    resolvers.append({ '__category': 'Kexts', 'name': name,
+                       'url': http_server.url(f'/{name}.zip') })
+  resolvers.append({ '__category': 'Kexts', 'name': 'SMCProcessor',
+                     'specifier': '*' })
+  updates = []
+  extracted = unpack_build_entries(resolvers, project_dir=Path(tmp_path),
+                                   jobs=jobs,
+                                   progress=lambda *a: updates.append(a))
+  assert list(extracted['Kexts']) == ['Lilu', 'VirtualSMC', 'WhateverGreen']
+  for entry in resolvers[:3]:
+    tmpdir = extracted['Kexts'][entry['name']]
+    assert entry['__extracted'] == tmpdir
+    assert tmpdir.joinpath(f"{entry['name']}.kext/Contents/Info.plist") \
+      .read_text() == entry['name']
+    # Nested archives are not unpacked
+    assert tmpdir.joinpath('Utilities', 'Tools.zip').is_file()
+    assert not tmpdir.joinpath('Tools.zip').exists()
+  assert '__extracted' not in resolvers[3]
+  # Download progress is reported in aggregate across all entries
+  total = sum(len(http_server.routes[f'/{e["name"]}.zip'])
+              for e in resolvers[:3])
+  assert updates[-1][:2] == (total, total)
+
+def test_unpack_build_entries_filters_members(http_server, tmp_path, make_zip,
+                                              store_dir):
+  http_server.routes['/OpenCore.zip'] = make_zip({
+    'X64/EFI/OC/OpenCore.efi': 'X64',
+    'IA32/EFI/OC/OpenCore.efi': 'IA32',
+    'Docs/Sample.plist': '<plist/>',
+    'Docs/Kernel.pdf': 'Kernel',
+    'Utilities/ocvalidate/ocvalidate': 'ocvalidate'
+  })
+  http_server.routes['/VirtualSMC.zip'] = make_zip({
+    'Kexts/VirtualSMC.kext/Contents/Info.plist': 'VirtualSMC',
+    'Kexts/SMCProcessor.kext/Contents/Info.plist': 'SMCProcessor',
+    'Kexts/SMCSuperIO.kext/Contents/Info.plist': 'SMCSuperIO',
+    'Kexts/VirtualSMC.kext.dSYM/Contents/Info.plist': 'dSYM',
+    'Artifacts/VirtualSMC-1.0.0-RELEASE.zip':
+      make_zip({ 'VirtualSMC.kext/a': '' }),
+    'Artifacts/VirtualSMC-1.0.0-DEBUG.zip':
+      make_zip({ 'VirtualSMC.kext/a': '' })
+  })
+  resolvers = [
+    { '__category': 'OpenCorePkg', 'name': 'OpenCore',
+      'url': http_server.url('/OpenCore.zip') },
+    { '__category': 'Kexts', 'name': 'VirtualSMC',
+      'url': http_server.url('/VirtualSMC.zip') }
+  ]
+  build_vars = { 'variables': { 'build': 'RELEASE', 'target': 'X64' } }
+  build_config = { 'Kexts': { 'VirtualSMC': { 'specifier': 'latest' },
+                              'SMCProcessor': { 'specifier': '*' } } }
+  extracted = unpack_build_entries(resolvers, project_dir=Path(tmp_path),
+                                   build_vars=build_vars,
+                                   build_config=build_config)
+  def files(tmpdir: Path):
+    return sorted(p.relative_to(tmpdir).as_posix()
+                  for p in tmpdir.glob('**/*') if p.is_file())
+  # Only the target architecture and used docs are unpacked
+  assert files(extracted['OpenCorePkg']['OpenCore']) == [
+    'Docs/Sample.plist',
+    'Utilities/ocvalidate/ocvalidate',
+    'X64/EFI/OC/OpenCore.efi'
+  ]
+  # Only configured kexts of the configured build type are unpacked
+  assert files(extracted['Kexts']['VirtualSMC']) == [
+    'Artifacts/VirtualSMC-1.0.0-RELEASE.zip',
+    'Kexts/SMCProcessor.kext/Contents/Info.plist',
+    'Kexts/VirtualSMC.kext/Contents/Info.plist'
+  ]
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_unpack_build_entries_shares_archives(http_server, tmp_path, jobs,
+                                              make_zip, store_dir):
+  http_server.routes['/VirtualSMC.zip'] = make_zip({
+    'Kexts/VirtualSMC.kext/Contents/Info.plist': 'VirtualSMC',
+    'Kexts/SMCProcessor.kext/Contents/Info.plist': 'SMCProcessor',
+    'Kexts/SMCSuperIO.kext/Contents/Info.plist': 'SMCSuperIO'
+  })
+  resolvers = [
+    { '__category': 'Kexts', 'name': name, 'build': build,
+      'url': http_server.url('/VirtualSMC.zip') }
+    for name, build in (('VirtualSMC', 'RELEASE'), ('SMCProcessor', 'DEBUG'))
+  ]
+  build_vars = { 'variables': { 'build': 'RELEASE', 'target': 'X64' } }
+  build_config = { 'Kexts': { 'VirtualSMC': { 'specifier': 'latest' },
+                              'SMCProcessor': { 'specifier': 'latest' } } }
+  extracted = unpack_build_entries(resolvers, project_dir=Path(tmp_path),
+                                   jobs=jobs,
+                                   build_vars=build_vars,
+                                   build_config=build_config)
+  # The archive is downloaded and unpacked once for both entries
+  assert http_server.requests == [('GET', '/VirtualSMC.zip')]
+  tmpdir = extracted['Kexts']['VirtualSMC']
+  assert extracted['Kexts']['SMCProcessor'] == tmpdir
+  assert sorted(p.name for p in tmpdir.joinpath('Kexts').iterdir()) == \
+    ['SMCProcessor.kext', 'VirtualSMC.kext']
+  assert resolvers[0]['checksum'] == resolvers[1]['checksum']
+  # Both entries look up their kexts in the same index of the directory
+  assert resolvers[0]['__view'] is resolvers[1]['__view']
+  assert resolvers[0]['__view'].root == tmpdir
+
+def test_unpack_build_entries_reuses_unpacked_kexts(http_server, tmp_path,
+                                                    monkeypatch, make_zip,
+                                                    store_dir):
+  from ocebuild.filesystem import archives
+  http_server.routes['/VirtualSMC.zip'] = make_zip({
+    'Kexts/VirtualSMC.kext/Contents/Info.plist': 'VirtualSMC',
+    'Kexts/SMCSuperIO.kext/Contents/Info.plist': 'SMCSuperIO'
+  })
+  resolvers = [{ '__category': 'Kexts', 'name': 'VirtualSMC',
+                 'url': http_server.url('/VirtualSMC.zip') }]
+  build_vars = { 'variables': { 'build': 'RELEASE', 'target': 'X64' } }
+  build_config = { 'Kexts': { 'VirtualSMC': { 'specifier': 'latest' } } }
+  unpack_build_entries(resolvers, project_dir=Path(tmp_path),
+                       build_vars=build_vars, build_config=build_config)
+  # Configuring kexts from other archives keeps the unpacked tree cached
+  def unpack_members(*args):
+    raise AssertionError('The archive should not be unpacked again.')
+  monkeypatch.setattr(archives, 'unpack_members', unpack_members)
+  build_config['Kexts']['Lilu'] = { 'specifier': 'latest' }
+  extracted = unpack_build_entries(resolvers, project_dir=Path(tmp_path),
+                                   build_vars=build_vars,
+                                   build_config=build_config)
+  tmpdir = extracted['Kexts']['VirtualSMC']
+  assert [p.name for p in tmpdir.joinpath('Kexts').iterdir()] == \
+    ['VirtualSMC.kext']
@@ -4,11 +4,12 @@
 ##
 """Methods for retrieving and handling config.plist files and patches."""
 
+from contextlib import nullcontext
 from functools import partial
 
 from typing import Dict, List, Optional, Tuple, Union
 
-from ocebuild.filesystem import glob
+from ocebuild.filesystem import ArchiveView
 from ocebuild.parsers.dict import *
 from ocebuild.parsers.plist import parse_plist
 from ocebuild.parsers.schema import parse_schema
@@ -260,9 +261,21 @@ def apply_schema_defaults(config: dict, schema: dict, sample: dict=None) -> dict
 #   - Missing CFBundleIdentifiers (i.e. unresolved dependencies)
 #   - Missing CFBundleIdentifiers/CFBundleExecutable fields in Info.plist
 
-def acpi_entries(acpi_dir: Union[str, Path]) -> List[dict]:
+def _directory_view(directory: Union[str, Path],
+                    view: Optional[ArchiveView]=None
+                    ) -> Union[ArchiveView, nullcontext]:
+  """Returns a context for an existing view or a new view of a directory.
+  @internal
+  """
+  if view is not None: return nullcontext(view)
+  return ArchiveView(directory, archives=False)
+
+def acpi_entries(acpi_dir: Union[str, Path],
+                 view: Optional[ArchiveView]=None
+                 ) -> List[dict]:
   """Returns a list of ACPI entries for the given ACPI directory."""
-  ssdts = extract_ssdts(acpi_dir, persist=True)
+  with _directory_view(acpi_dir, view) as view:
+    ssdts = extract_ssdts(acpi_dir, persist=True, view=view)
   sources = list(map(lambda e: e['source'], ssdts.values()))
   sorted_ssdts = sort_ssdt_symbols(sources)
 
@@ -277,62 +290,70 @@ def acpi_entries(acpi_dir: Union[str, Path]) -> List[dict]:
 
   return entries
 
-def drivers_entries(drivers_dir: Union[str, Path]) -> List[dict]:
+def drivers_entries(drivers_dir: Union[str, Path],
+                    view: Optional[ArchiveView]=None
+                    ) -> List[dict]:
   """Returns a list of driver entries for the given drivers directory."""
-  drivers = glob(drivers_dir, pattern='**/*.efi')
+  with _directory_view(drivers_dir, view) as view:
+    drivers = view.find('.efi')
 
   entries = []
   for driver in drivers:
     entry = {
       'Enabled': True,
-      'Path': driver.as_posix().replace(Path(drivers_dir).as_posix() + '/', '')
+      'Path': driver
     }
     entries.append(entry)
 
   return entries
 
-def kexts_entries(kext_dir: Union[str, Path]) -> List[dict]:
+def kexts_entries(kext_dir: Union[str, Path],
+                  view: Optional[ArchiveView]=None
+                  ) -> List[dict]:
   """Returns a list of kext entries for the given kext directory."""
-  kexts = extract_kexts(kext_dir)
-  sources = list(map(lambda e: e['__extracted'], kexts.values()))
-  sorted_kexts = sort_kext_cfbundle(sources)
-
-  def fmt_relative(p: Path):
-    path = Path(p).as_posix()
-    parent = Path(kext_dir).as_posix()
-    return path.replace(parent + '/', '')
-
-  entries = []
-  for kext in sorted_kexts:
-    path = Path(kext_dir, kext['__path'])
-
-    bundle_path = fmt_relative(path)
-    plist_path = fmt_relative(glob(path, '**/Info.plist', first=True))
-    entry = {
-      'BundlePath': bundle_path,
-      'Enabled': True,
-      'PlistPath': plist_path.replace(bundle_path + '/', ''),
-    }
-
-    if executable_path := glob(path, f"**/{kext['executable']}", first=True):
-      executable_path = fmt_relative(executable_path)
-      entry['ExecutablePath'] = executable_path.replace(bundle_path + '/', '')
-
-    entries.append(entry)
+  with _directory_view(kext_dir, view) as view:
+    kexts = extract_kexts(kext_dir, view=view)
+    sources = list(map(lambda e: e['__extracted'], kexts.values()))
+    sorted_kexts = sort_kext_cfbundle(sources)
+
+    entries = []
+    for kext in sorted_kexts:
+      bundle_path = Path(kext['__path']).as_posix()
+      # Look up the bundle's plist and executable in the directory index
+      plist_path = 'Contents/Info.plist'
+      if not view.exists(f'{bundle_path}/{plist_path}'):
+        plist_path = 'Info.plist'
+      entry = {
+        'BundlePath': bundle_path,
+        'Enabled': True,
+        'PlistPath': plist_path,
+      }
+
+      executables = [p for p in view.bundle(bundle_path)
+                     if p.rpartition('/')[2] == kext['executable']
+                       and not view.is_dir(p)]
+      if executables:
+        executable_path = min(executables, key=lambda p: p.count('/'))
+        entry['ExecutablePath'] = executable_path[len(bundle_path) + 1:]
+
+      entries.append(entry)
 
   return entries
 
-def tools_entries(tools_dir: Union[str, Path]) -> List[dict]:
+def tools_entries(tools_dir: Union[str, Path],
+                  view: Optional[ArchiveView]=None
+                  ) -> List[dict]:
   """Returns a list of tool entries for the given tools directory."""
-  tools = glob(tools_dir, pattern='**/*.efi')
+  with _directory_view(tools_dir, view) as view:
+    tools = view.find('.efi')
 
   entries = []
   for tool in tools:
     entry = {
       'Auxiliary': True,
       'Enabled': True,
-      'Name': tool.stem,
-      'Path': tool.as_posix().replace(Path(tools_dir).as_posix() + '/', '')
+      'Name': Path(tool).stem,
+      'Path': tool
     }
     entries.append(entry)
 
@@ -340,16 +361,21 @@ def tools_entries(tools_dir: Union[str, Path]) -> List[dict]:
 
 def update_entries(config_path: Union[str, Path],
                    build_config: Optional[dict]=None,
-                   clean: bool=False
+                   clean: bool=False,
+                   view: Optional[ArchiveView]=None
                    ) -> dict:
   """Updates the build entries of an OpenCore configuration file.
 
   This function scans the `ACPI`, `Drivers`, `Kexts`, and `Tools` folders
   relative to the configuration file and updates their corresponding entries.
+  If a view of the build directory is given, each folder is looked up in its
+  index instead of being scanned again.
 
   Args:
     config_path: The path to the OpenCore configuration file.
+    build_config: The build configuration of the entries. (Optional)
     clean: Whether to override existing entries from the configuration file.
+    view: A view of a directory containing the configuration file. (Optional)
 
   Returns:
     A dictionary containing the updated configuration entries.
@@ -357,6 +383,9 @@ def update_entries(config_path: Union[str, Path],
 
   def oc_dir(name: str) -> Path:
     return Path(config_path, f'../{name}').resolve()
+  def oc_view(name: str) -> Union[ArchiveView, None]:
+    if view is None: return None
+    return view.view(oc_dir(name).relative_to(view.root.resolve()).as_posix())
 
   # Generate new entries for each present build entry
   config = parse_plist(open(config_path, 'r', encoding="UTF-8"))
@@ -367,14 +396,14 @@ def update_entries(config_path: Union[str, Path],
     'Tools':    (tools_entries,   'Path')
   }
   for category, (method, primary_key) in entry_methods.items():
-    entries: List[dict] = method(oc_dir(category))
+    entries: List[dict] = method(oc_dir(category), view=oc_view(category))
     build_entries = build_config.get(category, {})
 
     keys = ENTRIES_MAP[category]
     if clean: nested_set(config, keys, [])
     base_entries = nested_get(config, keys)
 
-    for idx, entry in enumerate(method(oc_dir(category))):
+    for idx, entry in enumerate([dict(e) for e in entries]):
       # Merge new entries with build config properties
       name = Path(entry[primary_key]).stem
       if props := nested_get(build_entries, [name, 'properties']):
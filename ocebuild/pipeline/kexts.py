@@ -5,10 +5,12 @@
 """Methods for retrieving and handling Kext packages and binaries."""
 
 from collections import OrderedDict
+from contextlib import nullcontext
 from itertools import chain
 
-from typing import List, Literal, Union
+from typing import Callable, Iterable, List, Literal, Optional, Union
 
+from ocebuild.filesystem import ArchiveView
 from ocebuild.parsers.dict import nested_get
 from ocebuild.parsers.plist import parse_plist
 from ocebuild.versioning.semver import get_version, sort_dependencies
@@ -259,32 +261,77 @@ def sort_kext_cfbundle(filepaths: List[Union[str, Path]]) -> OrderedDict:
 
   return sorted_dependencies
 
+def kext_archive_filter(names: Iterable[str],
+                        build: Literal['RELEASE', 'DEBUG']='RELEASE'
+                        ) -> Callable[[str], bool]:
+  """Returns a predicate selecting the kexts to unpack from an archive.
+
+  Members are selected if they belong to a kext with one of the given names, or
+  if they are nested archives. Members of the other build type (i.e. under a
+  `Debug/` directory or in a `*-DEBUG.zip` archive for RELEASE builds) and debug
+  symbols (e.g. `*.kext.dSYM`) are skipped.
+
+  Args:
+    names: The names of kexts in the build configuration.
+    build: The build type of the kexts to select.
+
+  Returns:
+    A predicate receiving the POSIX path of an archive member.
+  """
+  names = set(names)
+  excluded = tuple({'RELEASE', 'DEBUG'} - {build.upper()})
+  excluded_archives = tuple(f'-{e}.ZIP' for e in excluded)
+  def include(member: str) -> bool:
+    parts = member.rstrip('/').split('/')
+    for part in map(str.upper, parts):
+      if part in excluded or part.endswith(excluded_archives): return False
+    if member.lower().endswith('.zip'): return True
+    kext = next((p for p in parts if p.endswith('.kext')), None)
+    return kext is not None and kext[:-len('.kext')] in names
+  return include
+
 def extract_kexts(directory: Union[str, Path],
                   build: Literal['RELEASE', 'DEBUG']='RELEASE',
+                  view: Optional[ArchiveView]=None
                   ) -> dict:
-  """Extracts the metadata of all Kexts in a directory."""
-  kexts = {}
-  for plist_path in directory.glob('**/*.kext/**/Info.plist'):
-    parent = str(plist_path).rsplit('.kext', maxsplit=1)[0]
-    kext_path = Path(f'{parent}.kext')
-    extract_path = f'.{kext_path.as_posix().split(directory.as_posix())[1]}'
-    # Update kext dictionary
-    kexts[kext_path.stem] = {
-      "__path": extract_path,
-      "__extracted": kext_path,
-    }
-
-  # Filter build targets if provided in extract path
-  if any(build.lower() in e['__path'].lower() for e in kexts.values()):
-    kexts = { k:v for k,v in kexts.items()
-              if build.lower() in v['__path'].lower() }
+  """Extracts the metadata of all Kexts in a directory.
+
+  Kexts in nested zip archives are found without unpacking the archives, and
+  only the Kexts selected for the build type are extracted from them. Kexts are
+  looked up in the index of an existing view of the directory if given.
+  """
+  directory = Path(directory)
+  with nullcontext(view) if view else ArchiveView(directory) as view:
+    paths = [p for p in view.find('.kext')
+             if view.exists(f'{p}/Contents/Info.plist')
+               or view.exists(f'{p}/Info.plist')]
+
+    # Filter build targets if provided in extract path
+    if any(build.lower() in p.lower() for p in paths):
+      paths = [p for p in paths if build.lower() in p.lower()]
+    kexts = { Path(p).stem: p for p in paths }
+
+    # Extract the selected kexts (including their bundled plugins)
+    extracted = set()
+    for name, path in sorted(kexts.items(), key=lambda e: len(e[1])):
+      if any(path.startswith(f'{p}/') for p in extracted):
+        kext_path = view.resolve(path)
+      else:
+        kext_path = view.extract(path)
+        extracted.add(path)
+      # Update kext dictionary
+      kexts[name] = {
+        "__path": f'./{kext_path.relative_to(directory).as_posix()}',
+        "__extracted": kext_path,
+      }
 
   return kexts
 
 
 __all__ = [
-  # Functions (3)
+  # Functions (4)
   "parse_kext_plist",
   "sort_kext_cfbundle",
+  "kext_archive_filter",
   "extract_kexts"
 ]
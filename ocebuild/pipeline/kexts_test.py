@@ -7,6 +7,8 @@ import pytest
 
 from .kexts import *
 
+from third_party.cpython.pathlib import Path
+
 
 @pytest.fixture
 def __virtualsmc_archive():
@@ -49,3 +51,21 @@ def __virtualsmc_archive():
 #       './WhateverGreen-1.6.6-DEBUG.zip/WhateverGreen.kext'
 #     assert kexts['WhateverGreen']['__url'] == url
 #     assert kexts['WhateverGreen']['version'] == '1.6.6'
+
+def test_extract_kexts_nested_archives(tmp_path, make_zip):
+  directory = Path(tmp_path)
+  for build in ('RELEASE', 'DEBUG'):
+    archive = directory.joinpath(f'WhateverGreen-1.6.6-{build}.zip')
+    archive.write_bytes(make_zip({
+      'WhateverGreen.kext/Contents/Info.plist': build,
+      'WhateverGreen.kext/Contents/PlugIns/Foo.kext/Contents/Info.plist': build
+    }))
+  kexts = extract_kexts(directory, build='DEBUG')
+  assert sorted(kexts) == ['Foo', 'WhateverGreen']
+  assert kexts['WhateverGreen']['__path'] == \
+    './WhateverGreen-1.6.6-DEBUG/WhateverGreen.kext'
+  assert kexts['WhateverGreen']['__extracted'] \
+    .joinpath('Contents/Info.plist').read_text() == 'DEBUG'
+  assert kexts['Foo']['__extracted'].is_dir()
+  # Kexts of other build types are not extracted
+  assert not directory.joinpath('WhateverGreen-1.6.6-RELEASE').exists()
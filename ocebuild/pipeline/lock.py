@@ -4,7 +4,10 @@
 ##
 """Methods for handling and resolving lock files."""
 
+import asyncio
 from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from itertools import chain
 from os import getcwd
 
@@ -13,6 +16,14 @@ from typing import Dict, Generator, Iterator, List, Optional, Tuple, Union
 from ocebuild.parsers.dict import merge_dict, nested_del, nested_get, nested_set
 from ocebuild.parsers.regex import re_match, re_search
 from ocebuild.parsers.yaml import parse_yaml, write_yaml
+from ocebuild.sources._lib import RequestGenerator, run_async, run_sync
+from ocebuild.sources.dortania import _has_build
+from ocebuild.sources.github import (
+  check_rate_limit,
+  check_rate_limit_async,
+  github_prefetch,
+  github_prefetch_async
+)
 from ocebuild.sources.resolver import *
 
 from third_party.cpython.pathlib import Path
@@ -26,6 +37,9 @@ LOCKFILE_METADATA = {
 }
 """The current metadata for the lockfile system."""
 
+GITHUB_REQUESTS_PER_REPOSITORY = 3
+"""The estimated number of GitHub API requests to resolve a repository."""
+
 LOCKFILE_WARNING_COMMENT = '''
 # This file is generated by running "ocebuild" inside your project.
 # Manual changes might be lost - proceed with caution!
@@ -114,6 +128,7 @@ def _format_dependency_entry(entry: Dict[str, any]) -> dict:
     'version',
     'url',
     'path',
+    'checksum',
     # Revalidation metadata
     'resolution',
     'specifier',
@@ -180,19 +195,29 @@ def parse_semver_params(entry: Union[str, dict],
       if k in entry: parameters[k] = entry[k]
   return parameters
 
-def parse_specifier(name: str,
-                    entry: Union[str, Dict[str, any]],
-                    base_path: Optional[str]=getcwd()
-                    ) -> Union[ResolverType, None]:
-  """Parses a specifier string for a resolver class.
-
-  Args:
-    name: The name of the entry to parse.
-    entry: The entry to parse.
-    base_path: The base path to use for relative paths. (Optional)
-
-  Returns:
-    The resolver class for the specifier.
+def _split_github_specifier(entry: Union[str, Dict[str, any]],
+                            specifier: str
+                            ) -> Tuple[Union[str, None], str]:
+  """Splits a specifier into a GitHub repository and semver specifier.
+  @internal
+  """
+  if isinstance(entry, dict) and 'repository' in entry:
+    # Add repository name to specifier if provided as an object parameter
+    delimiter = '=' if not specifier.startswith('#') else ''
+    if specifier:
+      specifier = delimiter.join([entry['repository'], specifier])
+    else:
+      specifier = entry['repository']
+  if (repository := re_match(r'[a-zA-Z0-9\-]+\/[a-zA-Z0-9\-]+', specifier)):
+    return repository, specifier[len(repository):]
+  return None, specifier
+
+def _parse_specifier(name: str,
+                     entry: Union[str, Dict[str, any]],
+                     base_path: Optional[str]=getcwd()
+                     ) -> RequestGenerator:
+  """Yields requests for `parse_specifier()`.
+  @internal
   """
   specifier = nested_get(entry, ['specifier'], default=entry)
   if not isinstance(specifier, str): specifier = ''
@@ -209,29 +234,38 @@ def parse_specifier(name: str,
     return PathResolver(**parameters, **resolver_props)
 
   # Specifier points to a github repository
-  if isinstance(entry, dict) and 'repository' in entry:
-    # Add repository name to specifier if provided as an object parameter
-    delimiter = '=' if not specifier.startswith('#') else ''
-    if specifier:
-      specifier = delimiter.join([entry['repository'], specifier])
-    else:
-      specifier = entry['repository']
-  if (repository := re_match(r'[a-zA-Z0-9\-]+\/[a-zA-Z0-9\-]+', specifier)):
+  repository, semver_specifier = _split_github_specifier(entry, specifier)
+  if repository:
     parameters['repository'] = repository
-    semver_specifier = specifier[len(repository):]
     parameters = parse_semver_params(entry, semver_specifier, parameters)
     # Handle optional flags
     if 'tarball' in entry: parameters['tarball'] = entry['tarball']
     return GitHubResolver(**parameters, **resolver_props)
 
   # Specifier points to a Dortania build (or latest)
-  if DortaniaResolver.has_build(name):
+  if (yield from _has_build(name)):
     parameters = parse_semver_params(entry, specifier, parameters)
     return DortaniaResolver(**parameters, **resolver_props)
 
   # No resolver matched
   return None
 
+def parse_specifier(name: str,
+                    entry: Union[str, Dict[str, any]],
+                    base_path: Optional[str]=getcwd()
+                    ) -> Union[ResolverType, None]:
+  """Parses a specifier string for a resolver class.
+
+  Args:
+    name: The name of the entry to parse.
+    entry: The entry to parse.
+    base_path: The base path to use for relative paths. (Optional)
+
+  Returns:
+    The resolver class for the specifier.
+  """
+  return run_sync(_parse_specifier(name, entry, base_path=base_path))
+
 def read_lockfile(lockfile_path: str,
                   metadata: bool=False
                   ) -> Union[dict, Tuple[dict, dict]]:
@@ -283,6 +317,29 @@ def write_lockfile(lockfile_path: str,
 
   return lockfile
 
+def find_unrecorded_checksums(lockfile: dict,
+                              resolvers: List[dict]
+                              ) -> List[dict]:
+  """Finds remote entries whose archive checksum is missing from the lockfile.
+
+  Checksums are recorded on remote entries while their archives are downloaded
+  (see `unpack_build_entries()`), and can be written to the lockfile with
+  `write_lockfile()`.
+
+  Args:
+    lockfile: The lockfile to check against.
+    resolvers: The unpacked build entries.
+
+  Returns:
+    A list of entries with an unrecorded checksum.
+  """
+  def lockfile_checksum(e: dict) -> Union[str, None]:
+    entry_path = ['dependencies', e['__category'], e['name'], 'checksum']
+    return nested_get(lockfile, entry_path)
+  return [e for e in resolvers
+            if 'url' in e and e.get('checksum')
+              and e['checksum'] != lockfile_checksum(e)]
+
 def prune_lockfile(build_config: dict, lockfile: dict) -> List[dict]:
   """Prunes the lockfile of entries that are not in the build configuration.
 
@@ -320,17 +377,168 @@ def _iterate_build_entries(build_config: dict) -> List[Tuple[str, str, dict]]:
     return [(category, name, entry) for name, entry in entries.items()]
   return list(chain(*[group_entries(c,d) for c,d in build_config.items()]))
 
+def _resolve_entry(category: str,
+                   name: str,
+                   entry: dict,
+                   lockfile_entry: Union[dict, None],
+                   base_path: str,
+                   default_build: Union[str, None],
+                   update: bool,
+                   force: bool,
+                   memo: Optional[ResolutionMemo]=None
+                   ) -> RequestGenerator:
+  """Resolves the specifier for a single build configuration entry.
+
+  This function does not mutate the build configuration or lockfile, and is
+  safe to run concurrently for different entries. Shared lookups are memoized
+  in the resolution memo of the run (if provided).
+
+  Returns:
+    A request generator returning a tuple containing:
+      - The resolver class for the entry (or None).
+      - The resolver properties for the entry.
+  """
+  # Handle any necessary resolver preprocessing
+  resolver = yield from _parse_specifier(name, entry, base_path=base_path)
+  if resolver is None:
+    specifier = '*'
+  else:
+    specifier = _format_resolver(resolver, base_path, as_specifier=True)
+
+  # Extract additional properties from the entry
+  ext, kind_ = _category_extension(category)
+  filepath = nested_get(entry, ['__filepath'],
+                        default=f'EFI/OC/{category}/{name}{ext}')
+  kind = nested_get(entry, ['__kind'], default=kind_)
+
+  # Assign default resolver properties
+  resolver_props = {
+    "__category": category,
+    '__filepath': filepath,
+    "__resolver": resolver,
+    "name": name,
+    "specifier": specifier,
+    "kind": kind
+  }
+
+  # Skip resolving entries that are not updated
+  if (lockfile_entry and not (force or update)) or specifier == '*':
+    return resolver, resolver_props
+
+  if isinstance(resolver, PathResolver):
+    # Resolve the path for the specifier
+    path = resolver.resolve(strict=True) #pylint: disable=E1123
+    resolver_props['path'] = f'./{path.relative_to(base_path).as_posix()}'
+  elif isinstance(resolver, (GitHubResolver, DortaniaResolver)):
+    # Extract the build type (default to OpenCore build type)
+    build = nested_get(entry, ['build'], default=default_build)
+    resolver_props['build'] = build
+
+    # Resolve the URL for the specifier
+    #pylint: disable=W0212
+    url = yield from resolver._resolve(build=build, memo=memo)
+    resolver_props['url'] = url
+
+    # Extract the version or commit from the resolver
+    if 'version' in (props := dict(resolver)):
+      resolver_props['version'] = props['version']
+  else:
+    raise ValueError(f'Invalid resolver: {resolver}')
+
+  # Format the resolution
+  resolver_props['resolution'] = _format_resolver(resolver, base_path)
+
+  return resolver, resolver_props
+
+def _github_repositories(build_config: dict,
+                         lockfile: dict,
+                         base_path: str,
+                         update: bool,
+                         force: bool
+                         ) -> Dict[str, set]:
+  """Collects GitHub repositories (and branches) of entries to be resolved.
+  @internal
+  """
+  repositories: Dict[str, set] = {}
+  for category, name, entry in _iterate_build_entries(build_config):
+    lockfile_entry = nested_get(lockfile, ['dependencies', category, name])
+    if lockfile_entry and not (force or update): continue
+    specifier = nested_get(entry, ['specifier'], default=entry)
+    if not isinstance(specifier, str): specifier = ''
+    if Path(base_path, specifier.replace('file://', '')
+                                .replace('file:', '')).exists():
+      continue
+    repository, semver_specifier = _split_github_specifier(entry, specifier)
+    if repository:
+      branch = parse_semver_params(entry, semver_specifier).get('branch')
+      repositories.setdefault(repository, set()).add(branch or 'main')
+  return repositories
+
+def _merge_resolved_entry(build_config: dict,
+                          lockfile: dict,
+                          resolvers: List[dict],
+                          resolver: Union[ResolverType, None],
+                          resolver_props: dict,
+                          update: bool,
+                          force: bool
+                          ) -> None:
+  """Merges a resolved entry into the lockfile and list of resolvers.
+  @internal
+  """
+  category, name = resolver_props['__category'], resolver_props['name']
+  entry_path = ['dependencies', category, name]
+  lockfile_entry = nested_get(lockfile, entry_path)
+  if resolver is None:
+    nested_set(build_config, [category, name, 'specifier'], '*')
+
+  # Skip updating entries if not specified
+  if lockfile_entry and not (force or update):
+    # Reserve the `__resolver` key for revalidated entries
+    resolver_props['__resolver'] = None
+    resolvers.append({ **resolver_props, **lockfile_entry })
+    return
+  # Otherwise, prune matching resolvers and outdated entries from lockfile
+  elif resolver_props['specifier'] == '*':
+    # Wildcard parent - track its children in lockfile
+    resolver_props['_wildcard_parent'] = name
+    resolvers.append(resolver_props)
+    return
+
+  # Check if the resolution is already in the lockfile
+  if force and lockfile_entry:
+    nested_del(lockfile, entry_path)
+  elif update and lockfile_entry:
+    if resolution := nested_get(resolver_props, ['resolution']):
+      if resolution == lockfile_entry['resolution']: return
+      else: nested_del(lockfile, entry_path)
+
+  # Extract revision key
+  if resolver_props['__resolver'] is not None:
+    props_ = dict(resolver_props['__resolver'])
+    def format_revision(key, algorithm='SHA256'):
+      if key in props_:
+        return " ".join(["{", f"{algorithm}: {props_.get(key)}", "}"])
+    resolver_props['revision'] = \
+      format_revision('commit', 'SHA1') or format_revision('checksum')
+
+  # Add the resolver to the list of resolvers
+  resolvers.append(resolver_props)
+
 def resolve_specifiers(build_config: dict,
                        lockfile: dict,
                        base_path: str=getcwd(),
                        update: bool=False,
                        force: bool=False,
                        *args,
+                       jobs: int=1,
                        __wrapper: Optional[Iterator]=None,
                        **kwargs
                        ) -> List[dict]:
   """Resolves the specifiers for each entry in the build configuration.
 
+  Entries are resolved on a pool of `jobs` worker threads, but are always
+  returned (and merged into the lockfile) in build configuration order.
+
   Args:
     build_config: The build configuration to resolve specifiers for.
     lockfile: The lockfile to resolve specifiers against.
@@ -338,6 +546,7 @@ def resolve_specifiers(build_config: dict,
     update: Whether to update outdated entries in the lockfile. (Optional)
     force: Whether to force resolve all entries in the build configuration. (Optional)
     *args: Additional arguments to pass to the optional iterator wrapper.
+    jobs: The number of entries to resolve concurrently. (Optional)
     __wrapper: A wrapper function to apply to the iterator. (Optional)
     **kwargs: Additional keyword arguments to pass to the optional iterator wrapper.
 
@@ -350,97 +559,90 @@ def resolve_specifiers(build_config: dict,
   resolvers = []
   default_build = nested_get(build_config, ['OpenCorePkg', 'OpenCore', 'build'])
 
+  # Prefetch GitHub repository metadata in batched queries (requires a token)
+  repositories = _github_repositories(build_config, lockfile, base_path,
+                                      update, force)
+  prefetched = github_prefetch(repositories)
+  # Warn early if the resolution is unlikely to fit in the rate limit
+  planned = GITHUB_REQUESTS_PER_REPOSITORY * (len(repositories) - prefetched)
+  check_rate_limit(planned)
+
+  # Memoize shared repository lookups for the duration of the run
+  memo = ResolutionMemo()
+  # Schedule the specifier resolution for each entry
+  tasks = []
+  for category, name, entry in _iterate_build_entries(build_config):
+    lockfile_entry = nested_get(lockfile, ['dependencies', category, name])
+    requests = _resolve_entry(category, name, entry, lockfile_entry,
+                              base_path, default_build, update, force, memo)
+    tasks.append(partial(run_sync, requests))
+  executor = ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else None
+  if executor is not None:
+    tasks = [executor.submit(task) for task in tasks]
+
   # Handle interactive mode for iterator
-  iterator = _iterate_build_entries(build_config)
+  iterator = tasks
   if __wrapper is not None: iterator = __wrapper(iterator, *args, **kwargs)
 
-  # Resolve the specifiers for each entry in the build configuration
-  for category, name, entry in iterator:
-    entry_path = ['dependencies', category, name]
-    lockfile_entry = nested_get(lockfile, entry_path)
+  try:
+    # Merge resolved entries in order of the build configuration
+    for task in iterator:
+      resolver, resolver_props = \
+        task.result() if isinstance(task, Future) else task()
+      _merge_resolved_entry(build_config, lockfile, resolvers,
+                            resolver, resolver_props, update, force)
+  finally:
+    if executor is not None:
+      # Cancel pending entries if resolution failed
+      for task in tasks: task.cancel()
+      executor.shutdown(wait=True)
 
-    # Handle any necessary resolver preprocessing
-    resolver = parse_specifier(name, entry, base_path=base_path)
-    if resolver is None:
-      specifier = '*'
-      nested_set(build_config, [category, name, 'specifier'], specifier)
-    else:
-      specifier = _format_resolver(resolver, base_path, as_specifier=True)
-
-    # Extract additional properties from the entry
-    ext, kind_ = _category_extension(category)
-    filepath = nested_get(entry, ['__filepath'],
-                          default=f'EFI/OC/{category}/{name}{ext}')
-    kind = nested_get(entry, ['__kind'], default=kind_)
-
-    # Assign default resolver properties
-    resolver_props = {
-      "__category": category,
-      '__filepath': filepath,
-      "__resolver": resolver,
-      "name": name,
-      "specifier": specifier,
-      "kind": kind
-    }
-
-    # Skip updating entries if not specified
-    if lockfile_entry and not (force or update):
-      # Reserve the `__resolver` key for revalidated entries
-      resolver_props['__resolver'] = None
-      resolvers.append({ **resolver_props, **lockfile_entry })
-    # Otherwise, prune matching resolvers and outdated entries from lockfile
-    elif specifier == '*':
-      # Wildcard parent - track its children in lockfile
-      resolver_props['_wildcard_parent'] = name
-      resolvers.append(resolver_props)
-    elif resolver is not None:
-      try:
-        if isinstance(resolver, PathResolver):
-          # Resolve the path for the specifier
-          path = resolver.resolve(strict=True) #pylint: disable=E1123
-          resolver_props['path'] = f'./{path.relative_to(base_path).as_posix()}'
-        elif isinstance(resolver, (GitHubResolver, DortaniaResolver)):
-          # Extract the build type (default to OpenCore build type)
-          build = nested_get(entry, ['build'], default=default_build)
-          resolver_props['build'] = build
-
-          # Resolve the URL for the specifier
-          url = resolver.resolve(build=build)
-          resolver_props['url'] = url
-
-          # Extract the version or commit from the resolver
-          if 'version' in (props := dict(resolver)):
-            resolver_props['version'] = props['version']
-        else:
-          raise ValueError(f'Invalid resolver: {resolver}')
-
-        # Format the resolution
-        resolver_props['resolution'] = _format_resolver(resolver, base_path)
-      except ValueError:
-        raise
-      except FileNotFoundError:
-        raise
-      else:
-        # Check if the resolution is already in the lockfile
-        if force and lockfile_entry:
-          nested_del(lockfile, entry_path)
-        elif update and lockfile_entry:
-          if resolution := nested_get(resolver_props, ['resolution']):
-            if resolution == lockfile_entry['resolution']: continue
-            else: nested_del(lockfile, entry_path)
-
-        # Extract revision key
-        if resolver_props['__resolver'] is not None:
-          #pylint: disable=cell-var-from-loop
-          props_ = dict(resolver_props['__resolver'])
-          def format_revision(key, algorithm='SHA256'):
-            if key in props_:
-              return " ".join(["{", f"{algorithm}: {props_.get(key)}", "}"])
-          resolver_props['revision'] = \
-            format_revision('commit', 'SHA1') or format_revision('checksum')
-
-        # Add the resolver to the list of resolvers
-        resolvers.append(resolver_props)
+  return resolvers
+
+async def resolve_specifiers_async(build_config: dict,
+                                   lockfile: dict,
+                                   base_path: str=getcwd(),
+                                   update: bool=False,
+                                   force: bool=False
+                                   ) -> List[dict]:
+  """Resolves the specifiers for each entry in the build configuration (async).
+
+  All entries are resolved concurrently on the running event loop, but are
+  merged into the lockfile in build configuration order.
+
+  See `resolve_specifiers()` for details.
+  """
+  resolvers = []
+  default_build = nested_get(build_config, ['OpenCorePkg', 'OpenCore', 'build'])
+
+  # Prefetch GitHub repository metadata in batched queries (requires a token)
+  repositories = _github_repositories(build_config, lockfile, base_path,
+                                      update, force)
+  prefetched = await github_prefetch_async(repositories)
+  # Warn early if the resolution is unlikely to fit in the rate limit
+  planned = GITHUB_REQUESTS_PER_REPOSITORY * (len(repositories) - prefetched)
+  await check_rate_limit_async(planned)
+
+  # Memoize shared repository lookups for the duration of the run
+  memo = ResolutionMemo()
+  # Schedule the specifier resolution for each entry
+  tasks = []
+  for category, name, entry in _iterate_build_entries(build_config):
+    lockfile_entry = nested_get(lockfile, ['dependencies', category, name])
+    requests = _resolve_entry(category, name, entry, lockfile_entry,
+                              base_path, default_build, update, force, memo)
+    tasks.append(asyncio.ensure_future(run_async(requests)))
+
+  try:
+    # Merge resolved entries in order of the build configuration
+    for task in tasks:
+      resolver, resolver_props = await task
+      _merge_resolved_entry(build_config, lockfile, resolvers,
+                            resolver, resolver_props, update, force)
+  finally:
+    # Cancel pending entries if resolution failed
+    for task in tasks: task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
 
   return resolvers
 
@@ -508,16 +710,19 @@ def validate_dependencies(lockfile: dict, build_config: dict) -> None:
 
 
 __all__ = [
-  # Constants (2)
+  # Constants (3)
   "LOCKFILE_METADATA",
+  "GITHUB_REQUESTS_PER_REPOSITORY",
   "LOCKFILE_WARNING_COMMENT",
-  # Functions (8)
+  # Functions (10)
   "parse_semver_params",
   "parse_specifier",
   "read_lockfile",
   "write_lockfile",
+  "find_unrecorded_checksums",
   "prune_lockfile",
   "prune_resolver_entry",
   "resolve_specifiers",
+  "resolve_specifiers_async",
   "validate_dependencies"
 ]
@@ -3,10 +3,18 @@
 # SPDX-License-Identifier: BSD-3-Clause
 ##
 
+import asyncio
+from random import random
+from time import sleep
+from unittest.mock import patch
+
 import pytest
 
+from . import lock as lock_module
 from .lock import *
 
+from ocebuild.sources.resolver import GitHubResolver
+
 
 def test_parse_semver_params():
   # Test resolution for tags
@@ -199,3 +207,84 @@ def test_validate_dependencies_wildcard_extra_children():
   # This should raise AssertionError for outdated entries
   with pytest.raises(AssertionError, match='outdated build configuration entries'):
     validate_dependencies(lockfile, build_config)
+
+
+def test_write_lockfile_checksums(tmp_path):
+  url = 'https://github.com/acidanthera/Lilu/releases/download/1.6.7/Lilu.zip'
+  lockfile = { 'dependencies': { 'Kexts': { 'Lilu': { 'url': url } } } }
+  resolvers = [
+    { '__category': 'Kexts', 'name': 'Lilu', 'url': url, 'checksum': 'abc' },
+    { '__category': 'Kexts', 'name': 'Local', 'path': 'Local.kext' }
+  ]
+  recorded = find_unrecorded_checksums(lockfile, resolvers)
+  assert recorded == resolvers[:1]
+  lockfile_path = tmp_path.joinpath('build.lock')
+  lockfile = write_lockfile(lockfile_path, lockfile, recorded,
+                            metadata={ 'version': 1 })
+  assert read_lockfile(lockfile_path)['dependencies']['Kexts']['Lilu'] == \
+    { 'url': url, 'checksum': 'abc' }
+  assert not find_unrecorded_checksums(lockfile, resolvers)
+
+@pytest.fixture
+def github_offline(monkeypatch):
+  """Stubs the batched prefetch and rate limit check of GitHub repositories."""
+  async def prefetch_async(*args): return 0
+  async def check_async(*args): pass
+  monkeypatch.setattr(lock_module, 'github_prefetch', lambda *args: 0)
+  monkeypatch.setattr(lock_module, 'github_prefetch_async', prefetch_async)
+  monkeypatch.setattr(lock_module, 'check_rate_limit', lambda *args: None)
+  monkeypatch.setattr(lock_module, 'check_rate_limit_async', check_async)
+
+def test_resolve_specifiers_concurrent_order(github_offline, stub_transport):
+  """Test that concurrent resolution preserves build configuration order."""
+  memos = []
+  def _resolve(self, build=None, memo=None):
+    memos.append(memo)
+    sleep(random() * 0.01)
+    self.commit = f'{self.repository}-sha'
+    return f'https://github.com/{self.repository}/releases/download/{build}.zip'
+    yield #pylint: disable=unreachable
+
+  build_config = {
+    'Kexts': { f'Kext{i}': { 'specifier': 'latest',
+                             'repository': f'acidanthera/Kext{i}' }
+               for i in range(16) },
+    'Drivers': { f'Driver{i}': { 'specifier': 'latest',
+                                 'repository': f'acidanthera/Driver{i}' }
+                 for i in range(8) }
+  }
+  with patch.object(GitHubResolver, '_resolve', _resolve):
+    def wrapper(iterator):
+      wrapper.calls += 1
+      return iterator
+    wrapper.calls = 0
+    sequential = resolve_specifiers(build_config, {}, jobs=1)
+    concurrent = resolve_specifiers(build_config, {}, jobs=8,
+                                    __wrapper=wrapper)
+  assert wrapper.calls == 1
+  assert not stub_transport.requests
+  # Each run memoizes lookups in its own resolution memo
+  assert len(set(map(id, memos))) == 2 and None not in memos
+  strip = lambda e: { k:v for k,v in e.items() if k != '__resolver' }
+  assert list(map(strip, sequential)) == list(map(strip, concurrent))
+  assert [e['name'] for e in concurrent] == \
+    [*build_config['Kexts'].keys(), *build_config['Drivers'].keys()]
+
+def test_resolve_specifiers_async_order(github_offline):
+  """Test that async resolution preserves build configuration order."""
+  def _resolve(self, build=None, memo=None):
+    self.commit = f'{self.repository}-sha'
+    return f'https://github.com/{self.repository}/releases/download/{build}.zip'
+    yield #pylint: disable=unreachable
+
+  build_config = {
+    'Kexts': { f'Kext{i}': { 'specifier': 'latest',
+                             'repository': f'acidanthera/Kext{i}' }
+               for i in range(16) }
+  }
+  with patch.object(GitHubResolver, '_resolve', _resolve):
+    sequential = resolve_specifiers(build_config, {})
+    concurrent = asyncio.run(resolve_specifiers_async(build_config, {}))
+  strip = lambda e: { k:v for k,v in e.items() if k != '__resolver' }
+  assert list(map(strip, sequential)) == list(map(strip, concurrent))
+  assert [e['name'] for e in concurrent] == list(build_config['Kexts'].keys())
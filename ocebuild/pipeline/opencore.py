@@ -4,16 +4,27 @@
 ##
 """Methods for retrieving and handling OpenCore packages."""
 
+from fnmatch import fnmatchcase
 from hashlib import sha256
 from mmap import mmap, ACCESS_READ
-from shutil import copyfile, copytree
+from shutil import copyfile
 from tempfile import mkdtemp, NamedTemporaryFile
 
-from typing import Generator, Iterator, List, Literal, Optional, Tuple, Union
+from typing import (
+  Callable,
+  Generator,
+  Iterator,
+  List,
+  Literal,
+  Optional,
+  Tuple,
+  Union
+)
 
 from .lock import prune_resolver_entry
 
 from ocebuild.filesystem.cache import UNPACK_DIR
+from ocebuild.filesystem.clone import clone
 from ocebuild.filesystem.posix import glob, move, remove
 from ocebuild.parsers.dict import nested_get, nested_set
 from ocebuild.sources.binary import get_stream_digest
@@ -21,6 +32,31 @@ from ocebuild.sources.binary import get_stream_digest
 from third_party.cpython.pathlib import Path
 
 
+def opencore_archive_filter(target: Literal['IA32', 'X64']='X64'
+                            ) -> Callable[[str], bool]:
+  """Returns a predicate selecting the members of an OpenCore archive to unpack.
+
+  This selects only the files used by `extract_opencore_archive()`, i.e. the EFI
+  tree of the target architecture, documentation files, ACPI samples and
+  bundled utilities.
+
+  Args:
+    target: The desired target architecture of the OpenCore EFI.
+
+  Returns:
+    A predicate receiving the POSIX path of an archive member.
+  """
+  patterns = (
+    f'*/{target}/EFI/*',
+    '*/Docs/Changelog.md',
+    '*/Docs/Configuration.pdf',
+    '*/Docs/Differences.pdf',
+    '*/Docs/Sample.plist',
+    '*/Docs/AcpiSamples/Binaries/*.aml',
+    '*/Utilities/*/*'
+  )
+  return lambda member: any(fnmatchcase(f'/{member}', p) for p in patterns)
+
 def extract_opencore_archive(pkg: Path,
                              target: Literal['IA32', 'X64']='X64') -> None:
   """Extracts the contents of an OpenCore archive to a temporary directory.
@@ -62,6 +98,35 @@ def extract_opencore_archive(pkg: Path,
   for dir_ in Path(tmp_dir).iterdir():
     move(dir_, pkg)
 
+def ocbinary_archive_filter(resources: Optional[List[str]]=None
+                            ) -> Callable[[str], bool]:
+  """Returns a predicate selecting the members of an OcBinaryData archive.
+
+  This selects only the files used by `extract_ocbinary_archive()`, i.e. the
+  `Drivers` and `Resources` directories, optionally limited to the given
+  resource packs.
+
+  Args:
+    resources: The resource packs to include, given as paths relative to the
+      `Resources` directory (e.g. `Font` or `Image/Acidanthera/GoldenGate`).
+      Defaults to all resource packs. (Optional)
+
+  Returns:
+    A predicate receiving the POSIX path of an archive member.
+  """
+  packs = None if resources is None else [r.strip('/') for r in resources]
+  def include(member: str) -> bool:
+    parts = member.split('/')
+    for i, part in enumerate(parts):
+      if part == 'Drivers':
+        return True
+      elif part == 'Resources':
+        if packs is None: return True
+        subpath = '/'.join(parts[i+1:])
+        return any(subpath == p or subpath.startswith(f'{p}/') for p in packs)
+    return False
+  return include
+
 def extract_ocbinary_archive(pkg: Path, oc_pkg: Path) -> None:
   """Extracts OcBinaryData resources to an existing OpenCore archive.
 
@@ -72,7 +137,7 @@ def extract_ocbinary_archive(pkg: Path, oc_pkg: Path) -> None:
   for dir_ in oc_pkg.joinpath('EFI', 'OC').iterdir():
     extract = glob(pkg, pattern=f'**/{dir_.name}/', first=True)
     if extract and extract.exists():
-      copytree(extract, dir_, dirs_exist_ok=True)
+      clone(extract, dir_)
   # Cleanup
   remove(pkg)
 
@@ -192,8 +257,10 @@ def get_opencore_checksum(file_path: Union[str, Path],
 
 
 __all__ = [
-  # Functions (4)
+  # Functions (6)
+  "opencore_archive_filter",
   "extract_opencore_archive",
+  "ocbinary_archive_filter",
   "extract_ocbinary_archive",
   "extract_build_entries",
   "get_opencore_checksum"
@@ -15,3 +15,18 @@ from ocebuild.versioning.semver import get_version
 def test_extract_opencore_archive(): pass # Not implemented
 
 def test_extract_opencore_directory(): pass # Not implemented
+
+def test_ocbinary_archive_filter():
+  members = [
+    'OcBinaryData-master/Drivers/HfsPlus.efi',
+    'OcBinaryData-master/Resources/Font/Font_1x.png',
+    'OcBinaryData-master/Resources/Audio/AXEFIAudio_Click.mp3',
+    'OcBinaryData-master/Resources/Image/Acidanthera/GoldenGate/Apple.icns',
+    'OcBinaryData-master/Resources/Image/Acidanthera/Syrah/Apple.icns',
+    'OcBinaryData-master/Resources/Fonts/Font.png',
+    'OcBinaryData-master/README.md'
+  ]
+  include = ocbinary_archive_filter()
+  assert list(filter(include, members)) == members[:-1]
+  include = ocbinary_archive_filter(['Font', 'Image/Acidanthera/GoldenGate/'])
+  assert list(filter(include, members)) == [members[0], members[1], members[3]]
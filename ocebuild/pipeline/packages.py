@@ -6,12 +6,13 @@
 ##
 """Methods for retrieving and handling packages."""
 
+from contextlib import nullcontext
 from functools import reduce
 from itertools import chain
 
 from typing import Iterator, List, Optional, Union
 
-from ocebuild.filesystem import glob, remove
+from ocebuild.filesystem import ArchiveView, remove
 from ocebuild.parsers.dict import merge_dict, nested_del, nested_get, nested_set
 from ocebuild.pipeline import config, kexts, opencore, ssdts
 from ocebuild.pipeline.lock import _category_extension, prune_resolver_entry
@@ -68,6 +69,9 @@ def extract_build_packages(build_vars: dict,
                            ) -> dict:
   """Extracts build entries from unpacked packages.
 
+  Packages are looked up in the `ArchiveView` shared by their resolver entry
+  (see `unpack_build_entries()`), and all views are closed once extracted.
+
   Args:
     build_vars: The configured build variables.
     build_config: The configured build specification.
@@ -99,14 +103,15 @@ def extract_build_packages(build_vars: dict,
   for (category, name, tmpdir) in iterator:
     ext, _ = _category_extension(category)
     resolver_entry = _get_resolver_entry(category, name)
+    view = resolver_entry.get('__view') if resolver_entry else None
     # Extract SSDTs from the archive
     if   category == 'ACPI':
-      extract = ssdts.extract_ssdts(tmpdir)
+      extract = ssdts.extract_ssdts(tmpdir, view=view)
     # Extract kexts from the archive
     elif category == 'Kexts':
       entry_cfg = nested_get(build_config, ['Kexts', resolver_entry['name']], {})
       entry_build = resolver_entry.get('build') or default_build
-      extract = kexts.extract_kexts(tmpdir, build=entry_build)
+      extract = kexts.extract_kexts(tmpdir, build=entry_build, view=view)
       # Filter out plugins that are not bundled
       for k_name, kext in extract.copy().items():
         # Exclude plugins that are already bundled
@@ -122,12 +127,13 @@ def extract_build_packages(build_vars: dict,
     # Extract drivers or tools from the archive
     elif category in ('Drivers', 'Tools'):
       extract = {}
-      for binary_path in glob(tmpdir, f'**/*{ext}'):
-        path = f'.{binary_path.as_posix().split(tmpdir.as_posix())[1]}'
-        extract[binary_path.name] = {
-          '__extracted': binary_path,
-          '__path': path
-        }
+      with nullcontext(view) if view else ArchiveView(tmpdir) as view:
+        for binary_path in map(view.extract, view.find(ext)):
+          path = f'.{binary_path.as_posix().split(tmpdir.as_posix())[1]}'
+          extract[binary_path.name] = {
+            '__extracted': binary_path,
+            '__path': path
+          }
     # Extract resources from the archive
     elif category == 'Resources':
       pass
@@ -140,6 +146,10 @@ def extract_build_packages(build_vars: dict,
         e['__dest'] = build_dir.joinpath('EFI', 'OC', category, f'{e_name}{ext}')
         nested_set(extracted_entries, [category, e_name], e)
 
+  # Close the views shared by the resolver entries
+  for view in {e.pop('__view') for e in resolvers if '__view' in e}:
+    view.close()
+
   return extracted_entries
 
 def _iterate_prune_packages(extracted_entries: dict):
@@ -5,7 +5,7 @@
 """Methods for retrieving and handling SSDT binaries and source code."""
 
 from collections import OrderedDict
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from functools import partial
 from graphlib import CycleError, TopologicalSorter
 from os import makedirs, SEEK_END
@@ -14,10 +14,10 @@ from tempfile import mkdtemp, NamedTemporaryFile
 
 from typing import Callable, Generator, List, Optional, Union
 
-from ocebuild.filesystem import glob, remove
+from ocebuild.filesystem import ArchiveView, remove
 from ocebuild.filesystem.cache import CACHE_DIR, UNPACK_DIR
 from ocebuild.parsers.asl import parse_ssdt_namespace
-from ocebuild.sources import request
+from ocebuild.sources import DownloadProgress, request, stream_response
 from ocebuild.sources.binary import get_binary_ext, wrap_binary
 from ocebuild.sources.github import github_file_url
 
@@ -27,7 +27,8 @@ from third_party.cpython.pathlib import Path
 @contextmanager
 def extract_iasl_binary(url: Optional[str]=None,
                         cache: bool=True,
-                        persist: bool=False
+                        persist: bool=False,
+                        progress: Optional[DownloadProgress]=None
                         ) -> Generator[Callable[[List[str]], str], any, None]:
   """Extracts an iasl binary and yields a subprocess wrapper.
 
@@ -36,6 +37,7 @@ def extract_iasl_binary(url: Optional[str]=None,
         automatically retrieved based on the current platform.
     cache: Whether to cache the extracted iasl binary for subsequent calls.
     persist: Whether to persist the binary wrapper outside the current context.
+    progress: A callback receiving the download progress. (Optional)
 
   Yields:
     A subprocess wrapper for the extracted iasl binary.
@@ -57,11 +59,17 @@ def extract_iasl_binary(url: Optional[str]=None,
       # Fetch the iasl binary appropriate for the current platform
       if not url:
         url = github_file_url('Qonfused/iASL', path=binary, raw=True)
-      # Fetch and extract the iasl binary to a temporary file
+      # Stream the iasl binary to a temporary file
       with request(url) as response:
         file.seek(0)
-        file.write(response.read())
-        file.close()
+        try:
+          stream_response(response, file, progress)
+        except BaseException:
+          # Discard partial downloads so they aren't reused as a cached binary
+          file.truncate(0)
+          raise
+        finally:
+          file.close()
     # Yield a wrapper over the iasl binary
     yield partial(wrap_binary, binary_path=file.name)
   finally:
@@ -195,12 +203,24 @@ def sort_ssdt_symbols(filepaths: List[Union[str, Path]]) -> OrderedDict:
 
   return sorted_dependencies
 
-def extract_ssdts(directory: Union[str, Path], persist: bool=False) -> dict:
-  """Extracts the metadata of all SSDTs in a directory."""
+def extract_ssdts(directory: Union[str, Path],
+                  persist: bool=False,
+                  view: Optional[ArchiveView]=None
+                  ) -> dict:
+  """Extracts the metadata of all SSDTs in a directory.
+
+  SSDTs in nested zip archives are found and extracted without unpacking the
+  rest of the archive. SSDTs are looked up in the index of an existing view of
+  the directory if given.
+  """
+  directory = Path(directory)
   ssdts = {}
-  ssdt_paths = glob(directory, '**/*.aml', include='**/*.dsl')
+  with nullcontext(view) if view else ArchiveView(directory) as view:
+    # Sort paths so that SSDTs are extracted in a deterministic order
+    ssdt_paths = [view.extract(p) for p in sorted({*view.find('.aml'),
+                                                   *view.find('.dsl')})]
   with translate_ssdts(ssdt_paths, UNPACK_DIR, persist=True) as translated_ssdts:
-    for ssdt_path in filter(lambda p: p.suffix == '.aml', translated_ssdts):
+    for ssdt_path in sorted(p for p in translated_ssdts if p.suffix == '.aml'):
       name = ssdt_path.stem
       source_path = next(filter(lambda p: p.stem == name, ssdt_paths))
       relative = f'.{source_path.as_posix().split(directory.as_posix())[1]}'
@@ -6,14 +6,56 @@
 
 from __future__ import annotations
 
-from io import TextIOWrapper
-from json import load as json_load
+import asyncio
+import logging
+from concurrent.futures import Future, wait
+from email.parser import Parser
+from hashlib import sha256
+from http.client import (
+  HTTPConnection,
+  HTTPException,
+  HTTPMessage,
+  IncompleteRead,
+  HTTPResponse,
+  HTTPSConnection
+)
+from io import BytesIO, TextIOWrapper
+from json import dumps as json_dumps, load as json_load, loads as json_loads
+from os import getpid, replace, scandir, unlink, utime
+from select import select
 from ssl import _create_unverified_context as skip_ssl_verify
-from urllib.error import HTTPError
-from urllib.request import Request, urlopen
+from threading import get_ident, Lock
+from time import perf_counter, sleep, time
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+from urllib.request import getproxies, Request, urlopen
+from weakref import WeakKeyDictionary
 
-from typing import Union
+from typing import (
+  BinaryIO,
+  Callable,
+  Dict,
+  Generator,
+  List,
+  Optional,
+  Tuple,
+  TypeVar,
+  Union
+)
 
+from ocebuild.constants import ENV
+from ocebuild.version import __version__
+
+from third_party.cpython.pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+"""Logger for network requests and response cache events."""
+
+T = TypeVar('T')
+"""Internal type alias for the return value of a request generator.
+@internal
+"""
 
 class RequestWrapper():
   """Wrapper for urllib.request.Request to provide a nicer interface."""
@@ -25,7 +67,8 @@ class RequestWrapper():
     return self
 
   def __exit__(self, *args: object) -> None:
-    return None
+    # Closing the response releases its connection back to the transport.
+    self._wrapped_response.close()
 
   def __getattr__(self, attr):
     return getattr(self._wrapped_response, attr)
@@ -38,31 +81,961 @@ class RequestWrapper():
     """Return the response as text."""
     return TextIOWrapper(self._wrapped_response, *args, **kargs)
 
-def request(url: Union[str, Request], *args, **kwargs) -> any:
-  """Simple wrapper over urlopen for skipping SSL verification.
+################################################################################
+#                               Transport Classes                              #
+################################################################################
+
+class BaseTransport():
+  """Base transport class used by `request()` to open urls.
+
+  Subclasses implement `open()` to return a file-like response object with
+  `status`, `headers` and `url` attributes (as returned by `urlopen`).
+  """
+
+  def open(self,
+           req: Request,
+           data: Optional[bytes]=None,
+           timeout: Optional[float]=None
+           ) -> any:
+    """Opens a request and returns the response."""
+    raise NotImplementedError
+
+  def close(self) -> None:
+    """Closes any connections held by the transport."""
+
+class UrllibTransport(BaseTransport):
+  """Transport that opens a new connection for every request with `urlopen`.
+
+  This transport honors proxy environment variables and is used as a fallback
+  when a proxy is configured.
+  """
+
+  def __init__(self):
+    self.context = skip_ssl_verify()
+
+  def open(self,
+           req: Request,
+           data: Optional[bytes]=None,
+           timeout: Optional[float]=None
+           ) -> any:
+    kwargs = { 'timeout': timeout } if timeout is not None else {}
+    #pylint: disable=consider-using-with
+    return urlopen(req, data, context=self.context, **kwargs)
+
+_IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE',
+                                 'TRACE'))
+"""HTTP methods that can be safely re-sent after a failed exchange.
+@internal
+"""
+
+def _is_dropped(conn: HTTPConnection) -> bool:
+  """Checks whether an idle connection was closed by the remote end.
+
+  An idle keep-alive connection should never be readable, so a readable socket
+  means the server has closed it (or sent unsolicited data).
+  @internal
+  """
+  if (sock := conn.sock) is None: return True
+  try:
+    readable, *_ = select([sock], [], [], 0)
+  except (OSError, ValueError):
+    return True
+  return bool(readable)
+
+class _PooledResponse(HTTPResponse):
+  """HTTP response that releases its connection once the body is consumed.
+  @internal
+  """
+
+  _release = None
+  _closing = False
+
+  def close(self) -> None:
+    self._closing = True
+    super().close()
+
+  def _close_conn(self) -> None:
+    super()._close_conn()
+    if (release := self._release) is not None:
+      self._release = None
+      # Connections can only be reused once the body has been fully read.
+      release(reusable=not (self._closing or self.will_close))
+
+class PooledTransport(BaseTransport):
+  """Transport that keeps per-host keep-alive connections for reuse.
+
+  Connections are pooled by (scheme, host, port) and share a single SSL
+  context. A connection is returned to the pool once its response body has
+  been fully read, so sequential requests to the same host (e.g. GitHub API
+  calls) share a single TCP + TLS handshake. This class is thread-safe.
+
+  Args:
+    max_idle: Maximum number of idle connections kept per host.
+    max_redirects: Maximum number of redirects to follow for a request.
+  """
+
+  def __init__(self, max_idle: int=8, max_redirects: int=10):
+    self.context = skip_ssl_verify()
+    self.max_idle = max_idle
+    self.max_redirects = max_redirects
+    self.connections_opened = 0
+    self._idle: Dict[Tuple[str, str, int], List[HTTPConnection]] = {}
+    self._lock = Lock()
+
+  def _connect(self, key: Tuple[str, str, int], timeout: Optional[float]
+               ) -> HTTPConnection:
+    """Creates a new connection for a (scheme, host, port) key."""
+    scheme, host, port = key
+    kwargs = { 'timeout': timeout } if timeout is not None else {}
+    if scheme == 'https':
+      conn = HTTPSConnection(host, port, context=self.context, **kwargs)
+    else:
+      conn = HTTPConnection(host, port, **kwargs)
+    conn.response_class = _PooledResponse
+    with self._lock:
+      self.connections_opened += 1
+    return conn
+
+  def _acquire(self, key: Tuple[str, str, int], timeout: Optional[float]
+               ) -> Tuple[HTTPConnection, bool]:
+    """Returns an idle connection for a key, or a new connection."""
+    while True:
+      with self._lock:
+        if not (idle := self._idle.get(key)): break
+        conn = idle.pop()
+      # Discard connections closed by the server while idle
+      if _is_dropped(conn):
+        conn.close()
+        continue
+      if timeout is not None: conn.timeout = timeout
+      return conn, True
+    return self._connect(key, timeout), False
+
+  def _release(self, key: Tuple[str, str, int], conn: HTTPConnection,
+               reusable: bool=True) -> None:
+    """Returns a connection to the pool (or closes it)."""
+    if reusable:
+      with self._lock:
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_idle:
+          idle.append(conn)
+          return
+    conn.close()
+
+  def _send(self, url: str, method: str, data: Optional[bytes],
+            headers: Dict[str, str], timeout: Optional[float]
+            ) -> _PooledResponse:
+    """Sends a single request, retrying once if a reused connection is stale.
+
+    Non-idempotent requests (e.g. POST) are only retried if the request could
+    not be written, as the server may otherwise have already processed it.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+      raise URLError(f'unknown url type: {scheme}')
+    port = parts.port or (443 if scheme == 'https' else 80)
+    key = (scheme, parts.hostname, port)
+    selector = parts.path or '/'
+    if parts.query: selector += f'?{parts.query}'
+
+    while True:
+      conn, reused = self._acquire(key, timeout)
+      sent = False
+      try:
+        conn.request(method, selector, body=data, headers=headers)
+        sent = True
+        response = conn.getresponse()
+      except (HTTPException, OSError) as e:
+        conn.close()
+        # The server may have closed an idle keep-alive connection.
+        if reused and (not sent or method in _IDEMPOTENT_METHODS): continue
+        raise URLError(e) from e
+      response.url = url
+      response._release = \
+        lambda reusable: self._release(key, conn, reusable=reusable)
+      if response.length == 0:
+        # Consume bodyless responses (e.g. HEAD or 304) to release the
+        # connection immediately.
+        response.read()
+      return response
+
+  def open(self,
+           req: Request,
+           data: Optional[bytes]=None,
+           timeout: Optional[float]=None
+           ) -> any:
+    if isinstance(req, str): req = Request(req)
+    if data is not None: req.data = data
+    url, method, body = req.full_url, req.get_method(), req.data
+    headers = { 'User-Agent': f'ocebuild/{__version__}',
+                **dict(req.header_items()) }
+
+    for _ in range(self.max_redirects + 1):
+      response = self._send(url, method, body, headers, timeout)
+      status = response.status
+      location = response.getheader('Location')
+      if status in (301, 302, 303, 307, 308) and location:
+        # Drain the redirect body so the connection can be reused.
+        response.read()
+        response.close()
+        redirect_url = urljoin(url, location)
+        if status == 303 or (status in (301, 302) and method == 'POST'):
+          method, body = 'GET', None
+          headers = { k:v for k,v in headers.items()
+                      if k.lower() not in ('content-length', 'content-type') }
+        # Don't forward credentials to a different host.
+        if urlsplit(redirect_url).netloc != urlsplit(url).netloc:
+          headers = { k:v for k,v in headers.items()
+                      if k.lower() != 'authorization' }
+        url = redirect_url
+        continue
+      if not 200 <= status < 300:
+        raise HTTPError(url, status, response.reason, response.headers,
+                        response)
+      return response
+
+    raise HTTPError(url, status, 'Too many redirects.', response.headers, None)
+
+  def close(self) -> None:
+    with self._lock:
+      connections = [c for idle in self._idle.values() for c in idle]
+      self._idle.clear()
+    for conn in connections:
+      conn.close()
+
+class AsyncTransport():
+  """Asyncio transport that keeps per-host keep-alive connections for reuse.
+
+  Requests are multiplexed over a bounded number of connections per host using
+  asyncio streams, so many outstanding requests don't require a thread each.
+  Response bodies are read in full and returned as `CachedResponse` objects.
+  A transport instance is bound to the event loop that first uses it.
+
+  Args:
+    max_connections: Maximum number of concurrent connections per host.
+    max_redirects: Maximum number of redirects to follow for a request.
+  """
+
+  def __init__(self, max_connections: int=32, max_redirects: int=10):
+    self.context = skip_ssl_verify()
+    self.max_connections = max_connections
+    self.max_redirects = max_redirects
+    self.connections_opened = 0
+    self._idle: Dict[Tuple[str, str, int], list] = {}
+    self._limits: Dict[Tuple[str, str, int], asyncio.Semaphore] = {}
+
+  async def _connect(self, key: Tuple[str, str, int]) -> tuple:
+    """Opens a new stream connection for a (scheme, host, port) key."""
+    scheme, host, port = key
+    ssl = self.context if scheme == 'https' else None
+    self.connections_opened += 1
+    return await asyncio.open_connection(host, port, ssl=ssl)
+
+  @staticmethod
+  async def _read_body(reader: asyncio.StreamReader,
+                       headers: HTTPMessage
+                       ) -> Tuple[bytes, bool]:
+    """Reads a response body, returning the body and whether it hit EOF."""
+    if headers.get('Transfer-Encoding', '').lower() == 'chunked':
+      chunks = []
+      while (size := int((await reader.readline()).split(b';')[0], 16)):
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+      # Discard trailers
+      while (await reader.readline()) not in (b'\r\n', b'\n', b''): pass
+      return b''.join(chunks), False
+    if (length := headers.get('Content-Length')) is not None:
+      return await reader.readexactly(int(length)), False
+    return await reader.read(), True
+
+  @staticmethod
+  async def _write_request(conn: tuple, method: str, selector: str, host: str,
+                           data: Optional[bytes], headers: Dict[str, str]
+                           ) -> None:
+    """Writes a request to a connection."""
+    _, writer = conn
+    lines = [f'{method} {selector} HTTP/1.1', f'Host: {host}']
+    lines += [f'{k}: {v}' for k,v in headers.items() if k.lower() != 'host']
+    if data is not None: lines.append(f'Content-Length: {len(data)}')
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    if data is not None: writer.write(data)
+    await writer.drain()
+
+  async def _read_response(self, conn: tuple, method: str
+                           ) -> Tuple[int, str, HTTPMessage, bytes, bool]:
+    """Reads the full response to a request from a connection."""
+    reader, _ = conn
+    status_line = (await reader.readline()).decode('latin-1')
+    if not status_line:
+      raise ConnectionResetError('Remote end closed connection.')
+    _, status, *reason = status_line.strip().split(' ', 2)
+    status, reason = int(status), (reason or [''])[0]
+    header_lines = []
+    while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+      header_lines.append(line)
+    response_headers = Parser(_class=HTTPMessage).parsestr(
+      b''.join(header_lines).decode('latin-1'))
+    if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+      body, eof = b'', False
+    else:
+      body, eof = await self._read_body(reader, response_headers)
+    reusable = not eof and \
+      response_headers.get('Connection', '').lower() != 'close'
+    return status, reason, response_headers, body, reusable
+
+  async def _send(self, url: str, method: str, data: Optional[bytes],
+                  headers: Dict[str, str]
+                  ) -> Tuple[int, str, HTTPMessage, bytes]:
+    """Sends a single request, retrying once if a reused connection is stale.
+
+    Non-idempotent requests (e.g. POST) are only retried if the request could
+    not be written, as the server may otherwise have already processed it.
+    Retried requests are always sent over a new connection.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ('http', 'https'):
+      raise URLError(f'unknown url type: {scheme}')
+    port = parts.port or (443 if scheme == 'https' else 80)
+    key = (scheme, parts.hostname, port)
+    selector = parts.path or '/'
+    if parts.query: selector += f'?{parts.query}'
+
+    # Exclude any userinfo (e.g. credentials) from the Host header
+    host = f'[{parts.hostname}]' if ':' in parts.hostname else parts.hostname
+    if parts.port: host += f':{parts.port}'
+
+    if (limit := self._limits.get(key)) is None:
+      limit = self._limits[key] = asyncio.Semaphore(self.max_connections)
+    async with limit:
+      retried = False
+      while True:
+        idle = self._idle.get(key) if not retried else None
+        reused = bool(idle)
+        conn = idle.pop() if reused else await self._connect(key)
+        reusable = sent = False
+        try:
+          await self._write_request(conn, method, selector, host, data,
+                                    headers)
+          sent = True
+          status, reason, response_headers, body, reusable = \
+            await self._read_response(conn, method)
+        except (asyncio.IncompleteReadError, OSError, ValueError) as e:
+          # The server may have closed an idle keep-alive connection.
+          if reused and (not sent or method in _IDEMPOTENT_METHODS):
+            retried = True
+            continue
+          raise URLError(e) from e
+        finally:
+          # Connections interrupted mid-exchange (e.g. by a timeout or
+          # cancellation) are closed rather than returned to the pool.
+          if reusable:
+            self._idle.setdefault(key, []).append(conn)
+          else:
+            conn[1].close()
+        return status, reason, response_headers, body
+
+  async def open(self,
+                 req: Union[str, Request],
+                 data: Optional[bytes]=None,
+                 timeout: Optional[float]=None
+                 ) -> CachedResponse:
+    """Opens a request and returns the buffered response."""
+    if isinstance(req, str): req = Request(req)
+    if data is not None: req.data = data
+    url, method, body = req.full_url, req.get_method(), req.data
+    headers = { 'User-Agent': f'ocebuild/{__version__}',
+                **dict(req.header_items()) }
+
+    for _ in range(self.max_redirects + 1):
+      status, reason, response_headers, content = \
+        await asyncio.wait_for(self._send(url, method, body, headers), timeout)
+      location = response_headers.get('Location')
+      if status in (301, 302, 303, 307, 308) and location:
+        redirect_url = urljoin(url, location)
+        if status == 303 or (status in (301, 302) and method == 'POST'):
+          method, body = 'GET', None
+        # Don't forward credentials to a different host.
+        if urlsplit(redirect_url).netloc != urlsplit(url).netloc:
+          headers = { k:v for k,v in headers.items()
+                      if k.lower() != 'authorization' }
+        url = redirect_url
+        continue
+      response = CachedResponse(content, url, response_headers,
+                                status=status, reason=reason)
+      if not 200 <= status < 300:
+        raise HTTPError(url, status, reason, response_headers, response)
+      return response
+
+    raise HTTPError(url, status, 'Too many redirects.', response_headers, None)
+
+  async def close(self) -> None:
+    """Closes any connections held by the transport."""
+    connections = [c for idle in self._idle.values() for c in idle]
+    self._idle.clear()
+    for _, writer in connections:
+      writer.close()
+
+_TRANSPORT: Union[BaseTransport, None] = None
+"""The active transport used by `request()`.
+@internal
+"""
+
+_TRANSPORT_LOCK = Lock()
+"""Lock guarding initialization of the active transport.
+@internal
+"""
+
+def get_transport() -> BaseTransport:
+  """Returns the active transport, creating a default transport if unset.
+
+  A `PooledTransport` is used by default, falling back to a `UrllibTransport`
+  when proxy environment variables are configured.
+  """
+  global _TRANSPORT
+  with _TRANSPORT_LOCK:
+    if _TRANSPORT is None:
+      _TRANSPORT = PooledTransport() if not getproxies() else UrllibTransport()
+    return _TRANSPORT
+
+def set_transport(transport: Optional[BaseTransport]) -> None:
+  """Sets the transport used by `request()`.
+
+  Args:
+    transport: The transport instance, or None to restore the default.
+  """
+  global _TRANSPORT
+  with _TRANSPORT_LOCK:
+    if _TRANSPORT is not None and _TRANSPORT is not transport:
+      _TRANSPORT.close()
+    _TRANSPORT = transport
+
+_ASYNC_TRANSPORTS: WeakKeyDictionary = WeakKeyDictionary()
+"""Async transports used by `request_async()`, keyed by event loop.
+@internal
+"""
+
+def get_async_transport() -> AsyncTransport:
+  """Returns the async transport for the running event loop."""
+  loop = asyncio.get_running_loop()
+  if (transport := _ASYNC_TRANSPORTS.get(loop)) is None:
+    transport = _ASYNC_TRANSPORTS[loop] = AsyncTransport()
+  return transport
+
+def set_async_transport(transport: AsyncTransport) -> None:
+  """Sets the async transport used by `request_async()` in the running loop.
+
+  Args:
+    transport: The async transport instance.
+  """
+  _ASYNC_TRANSPORTS[asyncio.get_running_loop()] = transport
+
+################################################################################
+#                                Response Cache                                #
+################################################################################
+
+class CachedResponse(BytesIO):
+  """In-memory response replayed from (or stored to) the response cache."""
+
+  def __init__(self,
+               body: bytes,
+               url: str,
+               headers: HTTPMessage,
+               status: int=200,
+               reason: str='OK',
+               cached: bool=False):
+    super().__init__(body)
+    self.url = url
+    self.headers = headers
+    self.status = status
+    self.reason = reason
+    self.cached = cached
+    """Whether the response was replayed from the cache without a request."""
+
+  def getheader(self, name: str, default: Optional[str]=None) -> str:
+    """Returns the value of a response header."""
+    return self.headers.get(name, default)
+
+RESPONSE_CACHE_SIZE = 64 << 20
+"""The default maximum size of the response cache (in bytes)."""
+
+class ResponseCache():
+  """Persistent on-disk cache for GET responses using HTTP validators.
+
+  Responses are keyed by url and auth identity (a hash of the Authorization
+  header), and are revalidated with `If-None-Match` and `If-Modified-Since`
+  headers. A `304 Not Modified` response replays the cached body; GitHub does
+  not count these responses against the API rate limit.
+
+  Each entry is stored as a single file (the JSON metadata on the first line,
+  followed by the body), so that a body is never paired with the validators of
+  another response. Once the cache exceeds `max_size`, the least recently used
+  entries are evicted.
+
+  Args:
+    directory: The directory to store cached responses in.
+    ttl: Seconds a cached response is considered fresh without revalidation.
+    max_size: Maximum size of the cache in bytes. (Optional)
+  """
+
+  def __init__(self,
+               directory: Union[str, Path],
+               ttl: float=0,
+               max_size: int=RESPONSE_CACHE_SIZE):
+    self.directory = Path(directory)
+    self.ttl = ttl
+    self.max_size = max_size
+    self._evicted = False
+
+  @staticmethod
+  def _key(req: Request) -> str:
+    """Returns a cache key for a request's url and auth identity."""
+    auth = req.get_header('Authorization') or ''
+    identity = sha256(auth.encode()).hexdigest() if auth else ''
+    return sha256(f'{identity}\0{req.full_url}'.encode()).hexdigest()
+
+  def _path(self, key: str) -> Path:
+    return self.directory.joinpath(f'{key}.cache')
+
+  def _read(self, key: str) -> Union[dict, None]:
+    """Reads a cache entry, or None if it does not exist."""
+    path = self._path(key)
+    try:
+      with open(path, 'rb') as f:
+        entry = json_loads(f.readline())
+        entry['body'] = f.read()
+    except (OSError, ValueError):
+      return None
+    # Track recently used entries for eviction
+    try:
+      utime(path)
+    except OSError: pass
+    return entry
+
+  def _write(self, key: str, entry: dict, body: bytes) -> None:
+    """Atomically writes a cache entry to disk."""
+    self.directory.mkdir(parents=True, exist_ok=True)
+    path = self._path(key)
+    tmp_path = path.with_name(f'{path.name}.{getpid()}-{get_ident()}.tmp')
+    meta = json_dumps({ k:v for k,v in entry.items() if k != 'body' })
+    with open(tmp_path, 'wb') as f:
+      f.write(meta.encode('utf-8') + b'\n')
+      f.write(body)
+    replace(tmp_path, path)
+    if not self._evicted:
+      self._evicted = True
+      self.evict()
+
+  def evict(self) -> None:
+    """Evicts the least recently used entries exceeding the cache size."""
+    entries = []
+    try:
+      with scandir(self.directory) as it:
+        for e in it:
+          if e.name.endswith('.cache') and e.is_file():
+            stat = e.stat()
+            entries.append((stat.st_mtime, stat.st_size, e.path))
+    except OSError:
+      return
+    size = sum(s for _, s, _ in entries)
+    for _, entry_size, entry_path in sorted(entries):
+      if size <= self.max_size: break
+      try:
+        unlink(entry_path)
+      except OSError: pass
+      size -= entry_size
+
+  @staticmethod
+  def _replay(entry: dict, cached: bool=False) -> CachedResponse:
+    headers = HTTPMessage()
+    for k,v in entry['headers']:
+      headers[k] = v
+    return CachedResponse(entry['body'], entry['url'], headers, cached=cached)
+
+  def fresh(self, req: Union[str, Request]) -> Union[CachedResponse, None]:
+    """Returns a cached response that is fresh within the TTL (if available).
+
+    This does not send a request, so it can be used to skip work (e.g. rate
+    limit pacing) that is only needed for requests sent over the network.
+    """
+    if isinstance(req, str): req = Request(req)
+    if not self.ttl or req.data is not None or req.get_method() != 'GET':
+      return None
+    if (entry := self._read(self._key(req))) is None: return None
+    if time() - entry['stored_at'] >= self.ttl: return None
+    logger.debug('Response cache hit (fresh): %s', req.full_url)
+    return self._replay(entry, cached=True)
+
+  def _prepare(self, req: Request
+               ) -> Tuple[str, Union[dict, None], Request,
+                          Union[CachedResponse, None]]:
+    """Looks up a request in the cache and adds conditional request headers.
+
+    Returns:
+      A tuple containing:
+        - The cache key for the request.
+        - The cache entry (or None).
+        - The (conditional) request to send.
+        - A fresh cached response if no request is needed (or None).
+    """
+    key = self._key(req)
+    url = req.full_url
+    if (entry := self._read(key)) is not None:
+      if self.ttl and time() - entry['stored_at'] < self.ttl:
+        logger.debug('Response cache hit (fresh): %s', url)
+        return key, entry, req, self._replay(entry, cached=True)
+      # Revalidate the cached response with conditional request headers
+      req = Request(url, headers=dict(req.header_items()))
+      if (etag := entry.get('etag')):
+        req.add_header('If-None-Match', etag)
+      if (last_modified := entry.get('last_modified')):
+        req.add_header('If-Modified-Since', last_modified)
+    return key, entry, req, None
+
+  def _not_modified(self, key: str, entry: dict, error: HTTPError
+                    ) -> CachedResponse:
+    """Replays a cache entry after a `304 Not Modified` response."""
+    if error.code != 304 or entry is None: raise error
+    error.close()
+    logger.debug('Response cache hit (not modified): %s', entry['url'])
+    # Update the stored headers with those of the 304 response
+    excluded = {'content-length', 'transfer-encoding', 'connection'}
+    updated = { k.lower() for k in error.headers.keys() }
+    entry['headers'] = [
+      *((k,v) for k,v in entry['headers'] if k.lower() not in updated),
+      *((k,v) for k,v in error.headers.items() if k.lower() not in excluded)
+    ]
+    entry['stored_at'] = time()
+    self._write(key, entry, entry['body'])
+    return self._replay(entry)
+
+  def _store(self, key: str, response: any, body: bytes) -> CachedResponse:
+    """Stores a response body with its validators in the cache."""
+    logger.debug('Response cache miss: %s', response.url)
+    headers = response.headers
+    etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+    if etag or last_modified or self.ttl:
+      self._write(key, {
+        'url': response.url,
+        'etag': etag,
+        'last_modified': last_modified,
+        'stored_at': time(),
+        'headers': list(headers.items())
+      }, body=body)
+    return CachedResponse(body, response.url, headers,
+                          status=response.status,
+                          reason=response.reason)
+
+  def open(self,
+           transport: BaseTransport,
+           req: Union[str, Request],
+           data: Optional[bytes]=None,
+           timeout: Optional[float]=None
+           ) -> any:
+    """Opens a request through a transport, replaying cached responses."""
+    if isinstance(req, str): req = Request(req)
+    if data is not None or req.get_method() != 'GET':
+      return transport.open(req, data, timeout)
+
+    key, entry, req, fresh = self._prepare(req)
+    if fresh is not None: return fresh
+    try:
+      response = transport.open(req, None, timeout)
+    except HTTPError as e:
+      return self._not_modified(key, entry, e)
+    with response:
+      body = response.read()
+    return self._store(key, response, body)
+
+  async def open_async(self,
+                       transport: AsyncTransport,
+                       req: Union[str, Request],
+                       data: Optional[bytes]=None,
+                       timeout: Optional[float]=None
+                       ) -> CachedResponse:
+    """Opens a request through an async transport, replaying cached responses."""
+    if isinstance(req, str): req = Request(req)
+    if data is not None or req.get_method() != 'GET':
+      return await transport.open(req, data, timeout)
+
+    key, entry, req, fresh = self._prepare(req)
+    if fresh is not None: return fresh
+    try:
+      response = await transport.open(req, None, timeout)
+    except HTTPError as e:
+      return self._not_modified(key, entry, e)
+    return self._store(key, response, response.getvalue())
+
+_RESPONSE_CACHE: Union[ResponseCache, None] = None
+"""The active response cache used by `request(..., cache=True)`.
+@internal
+"""
+
+def get_response_cache() -> Union[ResponseCache, None]:
+  """Returns the active response cache, creating a default cache if unset.
+
+  The default cache is stored in the global cache directory, and uses the
+  `OCEBUILD_CACHE_TTL` environment variable as its freshness TTL.
+  """
+  global _RESPONSE_CACHE
+  with _TRANSPORT_LOCK:
+    if _RESPONSE_CACHE is None:
+      #pylint: disable=import-outside-toplevel
+      from ocebuild.filesystem.cache import CACHE_DIR
+      ttl = float(ENV.OCEBUILD_CACHE_TTL or 0)
+      _RESPONSE_CACHE = ResponseCache(CACHE_DIR.joinpath('http'), ttl=ttl)
+    return _RESPONSE_CACHE
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+  """Sets the response cache used by `request(..., cache=True)`.
+
+  Args:
+    cache: The response cache instance, or None to restore the default.
+  """
+  global _RESPONSE_CACHE
+  with _TRANSPORT_LOCK:
+    _RESPONSE_CACHE = cache
+
+def request(url: Union[str, Request],
+            *args,
+            cache: bool=False,
+            **kwargs
+            ) -> any:
+  """Opens a url using the active transport.
+
+  By default, connections are pooled per host and SSL verification is skipped.
 
   Args:
     url: The url to open.
-    *args: Additional arguments to pass to urlopen.
-    **kwargs: Additional keyword arguments to pass to urlopen.
+    *args: Additional arguments to pass to the transport (`data`, `timeout`).
+    cache: Whether to use the persistent response cache for GET requests.
+    **kwargs: Additional keyword arguments to pass to the transport.
 
   Raises:
     HTTPError: If the url could not be retrieved.
 
   Returns:
-    The response from urlopen wrapped in a RequestWrapper class.
+    The response from the transport wrapped in a RequestWrapper class.
   """
   try:
-    #pylint: disable=consider-using-with
-    response = urlopen(url, context=skip_ssl_verify(), *args, **kwargs)
+    if cache:
+      response = get_response_cache().open(get_transport(), url, *args, **kwargs)
+    else:
+      response = get_transport().open(url, *args, **kwargs)
     return RequestWrapper(response)
   except HTTPError as e:
     print(f'Could not retrieve url: {e.url}')
     raise e
 
+async def request_async(url: Union[str, Request],
+                        data: Optional[bytes]=None,
+                        timeout: Optional[float]=None,
+                        cache: bool=False
+                        ) -> RequestWrapper:
+  """Opens a url using the async transport of the running event loop.
+
+  Args:
+    url: The url to open.
+    data: The request body. (Optional)
+    timeout: The request timeout in seconds. (Optional)
+    cache: Whether to use the persistent response cache for GET requests.
+
+  Raises:
+    HTTPError: If the url could not be retrieved.
+
+  Returns:
+    The buffered response wrapped in a RequestWrapper class.
+  """
+  transport = get_async_transport()
+  try:
+    if cache:
+      response = await get_response_cache().open_async(transport, url, data,
+                                                       timeout)
+    else:
+      response = await transport.open(url, data, timeout)
+    return RequestWrapper(response)
+  except HTTPError as e:
+    print(f'Could not retrieve url: {e.url}')
+    raise e
+
+################################################################################
+#                              Streaming Downloads                             #
+################################################################################
+
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+"""The size of the chunks a response body is streamed to disk in."""
+
+DownloadProgress = Callable[[int, Union[int, None], float], None]
+"""Type alias for download progress callbacks.
+
+Progress callbacks receive the number of bytes downloaded, the total number of
+bytes (if known) and the average throughput in bytes per second.
+"""
+
+def stream_response(response: any,
+                    file: BinaryIO,
+                    progress: Optional[DownloadProgress]=None,
+                    chunk_size: int=DOWNLOAD_CHUNK_SIZE,
+                    digest: Optional[any]=None,
+                    offset: int=0
+                    ) -> str:
+  """Streams a response body to a file in bounded chunks.
+
+  The SHA-256 digest of the body is computed in the same pass, so memory usage
+  stays flat regardless of the size of the response.
+
+  Args:
+    response: The response to read from.
+    file: The binary file object to write to.
+    progress: A callback receiving the download progress. (Optional)
+    chunk_size: The size of each chunk in bytes. (Optional)
+    digest: A hash object to continue (e.g. when resuming a download). (Optional)
+    offset: The number of bytes already downloaded (e.g. when resuming a
+      download from a range request). (Optional)
+
+  Raises:
+    IncompleteRead: If the connection was closed before the body was complete.
+
+  Returns:
+    The SHA-256 hex digest of the response body (including any prior bytes
+    hashed by `digest`).
+  """
+  if digest is None: digest = sha256()
+  buffer = memoryview(bytearray(chunk_size))
+  total = (getattr(response, 'headers', None) or {}).get('Content-Length')
+  total = offset + int(total) if total and total.isdigit() else None
+  downloaded, start = offset, perf_counter()
+  while (size := response.readinto(buffer)):
+    chunk = buffer[:size]
+    file.write(chunk)
+    digest.update(chunk)
+    downloaded += size
+    if progress is not None:
+      elapsed = perf_counter() - start
+      throughput = (downloaded - offset) / elapsed if elapsed else 0.0
+      progress(downloaded, total, throughput)
+  # Responses don't raise on a dropped connection when read into a buffer
+  if total is not None and downloaded < total:
+    raise IncompleteRead(bytes(), total - downloaded)
+  return digest.hexdigest()
+
+################################################################################
+#                           Request Generator Drivers                          #
+################################################################################
+
+RequestGenerator = Generator[Union[Tuple[Request, bool], float, Future],
+                             Union[RequestWrapper, None], any]
+"""Type alias for generators yielding `(request, cache)` tuples.
+
+Source functions implement their request logic once as a request generator,
+which is then driven by either `run_sync()` or `run_async()`. A generator may
+also yield a number of seconds to wait before continuing (e.g. for pacing), or
+a `concurrent.futures.Future` to wait on (e.g. for a coalesced request).
+"""
+
+def run_sync(requests: Generator[Union[Tuple[Request, bool], float, Future],
+                                  Union[RequestWrapper, None], T]
+             ) -> T:
+  """Runs a request generator to completion using `request()`.
+
+  Request generators yield `(request, cache)` tuples and are sent the response
+  for each request (or have its exception thrown into them). This allows the
+  same source logic to be driven synchronously or with `run_async()`.
+
+  Args:
+    requests: The request generator to run.
+
+  Returns:
+    The return value of the request generator.
+  """
+  try:
+    step = next(requests)
+    while True:
+      if isinstance(step, (int, float)):
+        sleep(step)
+        step = requests.send(None)
+        continue
+      elif isinstance(step, Future):
+        wait([step])
+        step = requests.send(None)
+        continue
+      req, cache = step
+      try:
+        response = request(req, cache=cache)
+      except Exception as e: #pylint: disable=broad-exception-caught
+        step = requests.throw(e)
+      else:
+        step = requests.send(response)
+  except StopIteration as e:
+    return e.value
+  finally:
+    # Interrupted generators release any state they hold (e.g. coalesced
+    # lookups waited on by other generators).
+    requests.close()
+
+async def run_async(requests: Generator[
+                      Union[Tuple[Request, bool], float, Future],
+                      Union[RequestWrapper, None], T]
+                    ) -> T:
+  """Runs a request generator to completion using `request_async()`.
+
+  Args:
+    requests: The request generator to run.
+
+  Returns:
+    The return value of the request generator.
+  """
+  try:
+    step = next(requests)
+    while True:
+      if isinstance(step, (int, float)):
+        await asyncio.sleep(step)
+        step = requests.send(None)
+        continue
+      elif isinstance(step, Future):
+        await asyncio.wait([asyncio.wrap_future(step)])
+        step = requests.send(None)
+        continue
+      req, cache = step
+      try:
+        response = await request_async(req, cache=cache)
+      except Exception as e: #pylint: disable=broad-exception-caught
+        step = requests.throw(e)
+      else:
+        step = requests.send(response)
+  except StopIteration as e:
+    return e.value
+  finally:
+    # Cancelled generators release any state they hold (e.g. coalesced
+    # lookups waited on by other generators).
+    requests.close()
+
 __all__ = [
-  # Functions (1)
+  # Constants (2)
+  "DOWNLOAD_CHUNK_SIZE",
+  "RESPONSE_CACHE_SIZE",
+  # Variables (2)
+  "DownloadProgress",
+  "RequestGenerator",
+  # Functions (11)
+  "get_transport",
+  "set_transport",
+  "get_async_transport",
+  "set_async_transport",
+  "get_response_cache",
+  "set_response_cache",
   "request",
-  # Classes (1)
-  "RequestWrapper"
+  "request_async",
+  "stream_response",
+  "run_sync",
+  "run_async",
+  # Classes (7)
+  "RequestWrapper",
+  "BaseTransport",
+  "UrllibTransport",
+  "PooledTransport",
+  "AsyncTransport",
+  "CachedResponse",
+  "ResponseCache"
 ]
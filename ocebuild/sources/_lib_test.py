@@ -0,0 +1,291 @@
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+
+import asyncio
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from os import utime
+from time import sleep
+from urllib.error import HTTPError, URLError
+from urllib.request import Request
+
+import pytest
+
+from ._lib import *
+
+
+def test_pooled_transport_reuses_connections(http_server):
+  http_server.routes['/a'] = b'{"foo": "bar"}'
+  transport = PooledTransport()
+  for _ in range(5):
+    with RequestWrapper(transport.open(http_server.url('/a'))) as response:
+      assert response.json() == {'foo': 'bar'}
+  assert transport.connections_opened == 1
+  assert http_server.connections == 1
+  transport.close()
+
+def test_pooled_transport_follows_redirects(http_server):
+  http_server.routes['/old'] = lambda h: h.respond(status=302, headers={
+    'Location': '/new'
+  })
+  http_server.routes['/new'] = b'moved'
+  transport = PooledTransport()
+  response = transport.open(http_server.url('/old'))
+  assert response.read() == b'moved'
+  assert response.url == http_server.url('/new')
+  assert http_server.connections == 1
+  transport.close()
+
+def test_pooled_transport_raises_http_errors(http_server):
+  transport = PooledTransport()
+  with pytest.raises(HTTPError) as e:
+    transport.open(http_server.url('/missing'))
+  assert e.value.code == 404
+  transport.close()
+
+def test_pooled_transport_thread_safety(https_server):
+  https_server.routes['/a'] = b'ok'
+  transport = PooledTransport(max_idle=4)
+  def fetch(_):
+    with RequestWrapper(transport.open(https_server.url('/a'))) as response:
+      return response.read()
+  with ThreadPoolExecutor(max_workers=4) as executor:
+    assert set(executor.map(fetch, range(40))) == {b'ok'}
+  # Connections are only opened for concurrent requests, and are reused
+  assert https_server.connections == transport.connections_opened <= 4
+  assert sum(len(idle) for idle in transport._idle.values()) <= 4
+  transport.close()
+
+def test_set_transport(http_server):
+  http_server.routes['/a'] = b'ok'
+  transport = PooledTransport()
+  set_transport(transport)
+  try:
+    assert get_transport() is transport
+    assert request(http_server.url('/a')).read() == b'ok'
+  finally:
+    set_transport(None)
+  assert get_transport() is not transport
+
+def test_pooled_transport_retries_stale_connections(http_server):
+  def close(h):
+    h.respond(b'ok')
+    h.close_connection = True
+  http_server.routes['/close'] = close
+  http_server.routes['/drop'] = lambda h: setattr(h, 'close_connection', True)
+  transport = PooledTransport()
+  # Idle connections closed by the server are discarded before reuse
+  for _ in range(2):
+    assert transport.open(http_server.url('/close')).read() == b'ok'
+  assert transport.connections_opened == 2
+  # Idempotent requests are re-sent on a new connection
+  http_server.routes['/a'] = b'ok'
+  assert transport.open(http_server.url('/a')).read() == b'ok'
+  with pytest.raises(URLError):
+    transport.open(http_server.url('/drop'))
+  assert http_server.requests[-2:] == [('GET', '/drop')] * 2
+  # Non-idempotent requests are not re-sent once written
+  assert transport.open(http_server.url('/a')).read() == b'ok'
+  with pytest.raises(URLError):
+    transport.open(Request(http_server.url('/drop'), data=b'{}'))
+  assert http_server.requests[-2:] == [('GET', '/a'), ('POST', '/drop')]
+  transport.close()
+
+def test_response_cache_revalidates_with_etag(http_server, tmp_path):
+  def handler(h):
+    if h.headers.get('If-None-Match') == '"v1"':
+      return h.respond(status=304, headers={'ETag': '"v1"'})
+    h.respond(b'{"tag": "1.0.0"}', headers={'ETag': '"v1"'})
+  http_server.routes['/tags'] = handler
+  cache = ResponseCache(tmp_path)
+  transport = PooledTransport()
+  for _ in range(3):
+    response = RequestWrapper(cache.open(transport, http_server.url('/tags')))
+    assert response.json() == {'tag': '1.0.0'}
+  revalidated = [r for r in http_server.requests if r[1] == '/tags']
+  assert len(revalidated) == 3
+  # Only the first response is stored; later requests are 304s.
+  assert len(list(tmp_path.glob('*.cache'))) == 1
+  transport.close()
+
+def test_response_cache_ttl_skips_network(http_server, tmp_path):
+  http_server.routes['/tags'] = lambda h: h.respond(b'[]', headers={
+    'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'
+  })
+  cache = ResponseCache(tmp_path, ttl=60)
+  transport = PooledTransport()
+  for _ in range(3):
+    assert cache.open(transport, http_server.url('/tags')).read() == b'[]'
+  assert len(http_server.requests) == 1
+  transport.close()
+
+def test_response_cache_keys_by_auth_identity(http_server, tmp_path):
+  http_server.routes['/user'] = lambda h: h.respond(
+    h.headers.get('Authorization', 'anonymous').encode(),
+    headers={'ETag': '"v1"'})
+  cache = ResponseCache(tmp_path, ttl=60)
+  transport = PooledTransport()
+  def fetch(token=None):
+    headers = {'Authorization': f'token {token}'} if token else {}
+    req = Request(http_server.url('/user'), headers=headers)
+    return cache.open(transport, req).read()
+  assert fetch() == b'anonymous'
+  assert fetch('foo') == b'token foo'
+  assert fetch('bar') == b'token bar'
+  assert fetch('foo') == b'token foo'
+  assert len(http_server.requests) == 3
+  # Tokens are never written to disk.
+  assert not any(b'token foo' in p.read_bytes().split(b'\n', 1)[0]
+                 for p in tmp_path.glob('*.cache'))
+  transport.close()
+
+def test_response_cache_evicts_least_recently_used(http_server, tmp_path):
+  http_server.routes['/a'] = http_server.routes['/b'] = \
+    lambda h: h.respond(bytes(1024), headers={'ETag': '"v1"'})
+  cache = ResponseCache(tmp_path, ttl=60, max_size=2048)
+  transport = PooledTransport()
+  for path in ('/b', '/a'):
+    cache.open(transport, http_server.url(path)).read()
+  entries = { path: cache._path(cache._key(Request(http_server.url(path))))
+              for path in ('/a', '/b') }
+  utime(entries['/a'], (0, 0))
+  # Reading an entry marks it as recently used
+  cache.open(transport, http_server.url('/a')).read()
+  cache.evict()
+  assert entries['/a'].exists() and not entries['/b'].exists()
+  transport.close()
+
+def test_async_transport_reuses_connections(http_server):
+  http_server.routes['/a'] = b'{"foo": "bar"}'
+  async def run():
+    transport = AsyncTransport(max_connections=4)
+    responses = await asyncio.gather(*[transport.open(http_server.url('/a'))
+                                       for _ in range(20)])
+    await transport.close()
+    return transport, responses
+  transport, responses = asyncio.run(run())
+  assert all(RequestWrapper(r).json() == {'foo': 'bar'} for r in responses)
+  assert transport.connections_opened <= 4
+  assert http_server.connections == transport.connections_opened
+
+def test_async_transport_reads_chunked_responses(http_server):
+  def handler(h):
+    h.send_response(200)
+    h.send_header('Transfer-Encoding', 'chunked')
+    h.end_headers()
+    for chunk in (b'foo', b'bar', b''):
+      h.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+  http_server.routes['/chunked'] = handler
+  http_server.routes['/old'] = lambda h: h.respond(status=301, headers={
+    'Location': '/chunked'
+  })
+  async def run():
+    transport = AsyncTransport()
+    first = await transport.open(http_server.url('/old'))
+    second = await transport.open(http_server.url('/chunked'))
+    await transport.close()
+    return first, second
+  first, second = asyncio.run(run())
+  assert first.read() == second.read() == b'foobar'
+  assert first.url == http_server.url('/chunked')
+  assert http_server.connections == 1
+
+def test_async_transport_raises_http_errors(http_server):
+  async def run():
+    transport = AsyncTransport()
+    try:
+      await transport.open(http_server.url('/missing'))
+    finally:
+      await transport.close()
+  with pytest.raises(HTTPError) as e:
+    asyncio.run(run())
+  assert e.value.code == 404
+
+def test_request_generator_drivers(http_server):
+  http_server.routes['/a'] = b'{"next": "/b"}'
+  http_server.routes['/b'] = b'{"value": 1}'
+  def requests():
+    response = yield Request(http_server.url('/a')), False
+    try:
+      yield Request(http_server.url('/missing')), False
+    except HTTPError as e:
+      assert e.code == 404
+    response = yield Request(http_server.url(response.json()['next'])), False
+    return response.json()['value']
+  assert run_sync(requests()) == 1
+  assert asyncio.run(run_async(requests())) == 1
+
+def test_async_transport_host_header(http_server):
+  http_server.routes['/host'] = lambda h: h.respond(h.headers['Host'].encode())
+  host, port = http_server.server_address[:2]
+  async def run():
+    transport = AsyncTransport()
+    response = await transport.open(f'http://user:pass@{host}:{port}/host')
+    await transport.close()
+    return response
+  assert asyncio.run(run()).read() == f'{host}:{port}'.encode()
+
+def test_async_transport_closes_interrupted_connections(http_server):
+  def handler(h):
+    sleep(0.2)
+    h.respond(b'ok')
+  http_server.routes['/slow'] = handler
+  http_server.routes['/a'] = b'ok'
+  async def run():
+    transport, connect, opened = AsyncTransport(), AsyncTransport._connect, []
+    async def _connect(key):
+      opened.append(conn := await connect(transport, key))
+      return conn
+    transport._connect = _connect
+    with pytest.raises(asyncio.TimeoutError):
+      await transport.open(http_server.url('/slow'), timeout=0.05)
+    assert opened[0][1].is_closing() and not transport._idle
+    response = await transport.open(http_server.url('/a'))
+    await transport.close()
+    return transport, response
+  transport, response = asyncio.run(run())
+  assert response.read() == b'ok'
+  assert transport.connections_opened == 2
+
+def test_async_transport_retries_stale_connections(http_server):
+  http_server.routes['/a'] = b'ok'
+  http_server.routes['/drop'] = lambda h: setattr(h, 'close_connection', True)
+  async def run():
+    transport = AsyncTransport()
+    # Idempotent requests are re-sent once on a new connection
+    await asyncio.gather(*[transport.open(http_server.url('/a'))
+                           for _ in range(2)])
+    assert len(transport._idle[next(iter(transport._idle))]) == 2
+    with pytest.raises(URLError):
+      await transport.open(http_server.url('/drop'))
+    assert http_server.requests[-2:] == [('GET', '/drop')] * 2
+    assert http_server.requests[-3] == ('GET', '/a')
+    # Non-idempotent requests are not re-sent once written
+    await transport.open(http_server.url('/a'))
+    with pytest.raises(URLError):
+      await transport.open(Request(http_server.url('/drop'), data=b'{}'))
+    assert http_server.requests[-2:] == [('GET', '/a'), ('POST', '/drop')]
+    await transport.close()
+  asyncio.run(run())
+
+def test_stream_response(http_server, tmp_path):
+  body = bytes(range(256)) * (1 << 14) # 4 MiB
+  http_server.routes['/archive.zip'] = body
+  updates = []
+  tracemalloc.start()
+  with request(http_server.url('/archive.zip')) as response, \
+       open(tmp_path / 'archive.zip', 'wb') as f:
+    digest = stream_response(response, f, progress=lambda *a: updates.append(a))
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  assert digest == sha256(body).hexdigest()
+  assert (tmp_path / 'archive.zip').read_bytes() == body
+  # Progress is reported per chunk with the total size and throughput
+  assert len(updates) == len(body) // DOWNLOAD_CHUNK_SIZE
+  assert updates[-1][:2] == (len(body), len(body))
+  assert all(throughput >= 0 for *_, throughput in updates)
+  # Only a single chunk of the body is held in memory at a time
+  assert peak < 4 * DOWNLOAD_CHUNK_SIZE
@@ -0,0 +1,95 @@
+## @file
+# Copyright (c) 2023, The OCE Build Authors. All rights reserved.
+# SPDX-License-Identifier: BSD-3-Clause
+##
+"""Local stand-in servers for remote hosts (used by tests and benchmarks)."""
+
+import ssl
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+from typing import Callable, Dict, Optional, Union
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+  """Request handler that dispatches to the server's registered routes."""
+
+  protocol_version = 'HTTP/1.1'
+  disable_nagle_algorithm = True
+
+  def do_GET(self): #pylint: disable=invalid-name
+    with self.server.lock:
+      self.server.requests.append((self.command, self.path))
+    route = self.server.routes.get(self.path.split('?', 1)[0])
+    if route is None:
+      return self.respond(b'Not Found', status=404)
+    if callable(route):
+      return route(self)
+    return self.respond(route)
+
+  do_HEAD = do_GET
+  do_POST = do_GET
+
+  def respond(self,
+              body: bytes=b'',
+              status: int=200,
+              headers: Optional[Dict[str, str]]=None
+              ) -> None:
+    """Sends a complete response with a Content-Length header."""
+    self.send_response(status)
+    for k,v in (headers or {}).items():
+      self.send_header(k, v)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    if self.command != 'HEAD':
+      self.wfile.write(body)
+
+  def log_message(self, *args): #pylint: disable=arguments-differ
+    pass
+
+class StandInServer(ThreadingHTTPServer):
+  """A local HTTP(S) server standing in for remote hosts in tests.
+
+  Routes map a request path to either a response body or a callable receiving
+  the request handler. The server tracks accepted connections and requests.
+  """
+
+  daemon_threads = True
+  request_queue_size = 64
+
+  def __init__(self, context: Optional[ssl.SSLContext]=None):
+    super().__init__(('127.0.0.1', 0), StandInHandler)
+    self.routes: Dict[str, Union[bytes, Callable]] = {}
+    self.requests = []
+    self.connections = 0
+    self.lock = Lock()
+    self.scheme = 'http'
+    if context is not None:
+      self.socket = context.wrap_socket(self.socket, server_side=True)
+      self.scheme = 'https'
+
+  def get_request(self):
+    request = super().get_request()
+    with self.lock:
+      self.connections += 1
+    return request
+
+  def url(self, path: str='/') -> str:
+    """Returns the absolute url for a path on this server."""
+    host, port = self.server_address[:2]
+    return f'{self.scheme}://{host}:{port}{path}'
+
+  def __enter__(self):
+    Thread(target=self.serve_forever, daemon=True).start()
+    return self
+
+  def __exit__(self, *args):
+    self.shutdown()
+    self.server_close()
+
+
+__all__ = [
+  # Classes (2)
+  "StandInHandler",
+  "StandInServer"
+]
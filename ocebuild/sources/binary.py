@@ -9,11 +9,17 @@
 #pylint: disable=redefined-builtin
 
 import subprocess
+from atexit import register
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from hashlib import sha256
-from os import chmod
+from json import dump, load
+from os import chmod, cpu_count, getpid, replace, stat
 from platform import system
+from threading import RLock, get_ident
+from time import time_ns
 
-from typing import List, Literal
+from typing import Dict, Iterator, List, Literal, Optional, Tuple, Union
 
 from ocebuild.errors._lib import disable_exception_traceback
 
@@ -30,50 +36,204 @@ def get_binary_ext(platform: Literal['Windows', 'Darwin', 'Linux']=system()
   elif platform == 'Linux':
     return '.linux'
 
+_READ_BLOCK_SIZE = 1 << 20
+"""The size of the buffer used to read files and streams for hashing.
+@internal
+"""
+
+_DIGEST_WORKERS = min(32, (cpu_count() or 1) + 4)
+"""The number of threads hashing the files of a directory concurrently.
+@internal
+"""
+
+_DIGEST_CACHE_SIZE = 1 << 16
+"""The maximum number of file digests kept in the digest cache.
+@internal
+"""
+
+_RACY_WINDOW_NS = 2 * 10**9
+"""The window (in ns) after a change in which file timestamps are not trusted.
+@internal
+"""
+
+_digest_cache: Optional[Dict[str, str]] = None
+"""The file digests in the digest cache, keyed by stat fingerprint (from least
+to most recently used).
+@internal
+"""
+
+_digest_cache_dirty = False
+"""Whether the digest cache has unsaved changes (saved once at exit).
+@internal
+"""
+
+_digest_cache_lock = RLock()
+"""Guards reads and writes of the digest cache.
+@internal
+"""
+
+def _digest_cache_path() -> Path:
+  """Returns the path of the digest cache.
+  @internal
+  """
+  #pylint: disable=import-outside-toplevel
+  from ocebuild.filesystem.cache import CACHE_DIR
+  return CACHE_DIR.joinpath('digests.json')
+
+def _load_digest_cache() -> Dict[str, str]:
+  """Loads the digest cache from disk (once per process).
+  @internal
+  """
+  global _digest_cache #pylint: disable=global-statement
+  with _digest_cache_lock:
+    if _digest_cache is None:
+      try:
+        with open(_digest_cache_path(), 'r', encoding='UTF-8') as f:
+          _digest_cache = dict(load(f))
+      except (OSError, ValueError, TypeError):
+        _digest_cache = {}
+    return _digest_cache
+
+@register
+def _save_digest_cache() -> None:
+  """Atomically writes the digest cache to disk if it has unsaved changes.
+
+  The digest cache is saved once at exit rather than after each digest.
+  @internal
+  """
+  global _digest_cache_dirty #pylint: disable=global-statement
+  with _digest_cache_lock:
+    if not _digest_cache_dirty: return
+    _digest_cache_dirty = False
+    cache = _load_digest_cache()
+    # Evict the least recently used entries (e.g. of deleted or modified files)
+    for key in list(cache)[:max(0, len(cache) - _DIGEST_CACHE_SIZE)]:
+      del cache[key]
+    path = _digest_cache_path()
+    tmp_path = path.with_name(f'{path.name}.{getpid()}-{get_ident()}')
+    try:
+      with open(tmp_path, 'w', encoding='UTF-8') as f:
+        dump(cache, f)
+      replace(tmp_path, path)
+    except OSError:
+      # The digest cache is only an optimization
+      tmp_path.unlink(missing_ok=True)
+
 def _get_stream_hash(stream, hash) -> str:
   """Gets a digest for a stream."""
   while True:
-    chunk = stream.read(hash.block_size)
+    chunk = stream.read(_READ_BLOCK_SIZE)
     if not chunk: break
     hash.update(chunk)
   return hash
 
-def _get_file_digest(filename, hash) -> str:
-  """Gets a digest for a file."""
-  with open(filename, 'rb') as file:
-    hash = _get_stream_hash(file, hash)
+def _get_file_hash(filename, hash) -> str:
+  """Gets a digest for a file, reading into a reusable buffer."""
+  buffer = bytearray(_READ_BLOCK_SIZE)
+  view = memoryview(buffer)
+  with open(filename, 'rb', buffering=0) as file:
+    while size := file.readinto(buffer):
+      hash.update(view[:size])
   return hash
 
-def _get_dir_digest(directory, hash):
-  """Recursively gets a digest for all files in a directory."""
+def _get_file_digest(filename, algorithm, cache: bool=True) -> bytes:
+  """Gets a digest for a file, memoized by its stat fingerprint.
+
+  Files are only re-read if their device, inode, size, mtime or ctime has
+  changed since they were last hashed. The ctime also changes when a file is
+  replaced with a preserved mtime (e.g. with `copystat()`) on a reused inode.
+  """
+  global _digest_cache_dirty #pylint: disable=global-statement
+  if not cache:
+    return _get_file_hash(filename, algorithm()).digest()
+  file_stat = stat(filename)
+  key = ':'.join(map(str, (algorithm().name, file_stat.st_dev,
+                           file_stat.st_ino, file_stat.st_size,
+                           file_stat.st_mtime_ns, file_stat.st_ctime_ns)))
+  digests = _load_digest_cache()
+  with _digest_cache_lock:
+    if (digest := digests.pop(key, None)) is not None:
+      # Move the entry to the end of the cache to evict it last
+      digests[key] = digest
+      _digest_cache_dirty = True
+      return bytes.fromhex(digest)
+  digest = _get_file_hash(filename, algorithm()).digest()
+  # Files changed within the timestamp resolution may still change unnoticed
+  changed_ns = max(file_stat.st_mtime_ns, file_stat.st_ctime_ns)
+  if time_ns() - changed_ns > _RACY_WINDOW_NS:
+    with _digest_cache_lock:
+      digests[key] = digest.hex()
+      _digest_cache_dirty = True
+  return digest
+
+def _iter_dir_entries(directory) -> Iterator[Tuple[str, Union[str, None]]]:
+  """Recursively iterates over the names and files of a directory.
+
+  Yields:
+    The name of each entry and its path (if it is a file), with entries and
+    subdirectories sorted for consistent hashes.
+  """
   for path in sorted(Path(directory).iterdir()):
-    # Ensure subdirectories are sorted for consistent hashes
-    hash.update(path.name.encode())
     if path.is_file():
-      hash = _get_file_digest(path, hash)
-    elif path.is_dir():
-      hash = _get_dir_digest(path, hash)
+      yield path.name, str(path)
+    else:
+      yield path.name, None
+      if path.is_dir(): yield from _iter_dir_entries(path)
+
+def _get_dir_digest(directory, algorithm, workers: int, cache: bool=True):
+  """Recursively gets a digest for all files in a directory.
+
+  The digest is computed over the name of each entry and the digest of each
+  file, which are hashed concurrently.
+  """
+  hash = algorithm()
+  entries = list(_iter_dir_entries(directory))
+  files = [f for _, f in entries if f is not None]
+  file_digest = partial(_get_file_digest, algorithm=algorithm, cache=cache)
+  if workers > 1 and len(files) > 1:
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+      digests = iter(executor.map(file_digest, files))
+      for name, file in entries:
+        hash.update(name.encode())
+        if file is not None: hash.update(next(digests))
+  else:
+    for name, file in entries:
+      hash.update(name.encode())
+      if file is not None: hash.update(file_digest(file))
   return hash
 
-def get_digest(filepath, algorithm=sha256) -> str:
+def get_digest(filepath,
+               algorithm=sha256,
+               workers: Optional[int]=None,
+               cache: bool=True
+               ) -> str:
   """Gets a digest for a file or directory.
 
+  File digests are cached by their stat fingerprint (i.e. the device, inode,
+  size, mtime and ctime of the file), so unchanged files are never re-read.
+  New digests are saved to disk once at exit.
+
   Args:
     filepath: The path to the file or directory.
     algorithm: The hashlib algorithm to use. Defaults to SHA256.
+    workers: The number of threads hashing the files of a directory.
+      (Optional)
+    cache: Whether to look up and record file digests in the digest cache.
+      Should be disabled for short-lived files (e.g. temporary copies).
 
   Returns:
     A hex digest of the file or directory.
   """
-  hash = algorithm()
+  if workers is None: workers = _DIGEST_WORKERS
   if not (path := Path(filepath)).exists():
     raise FileNotFoundError(f'No such file or directory: {filepath}')
   elif path.is_file():
-    _get_file_digest(filepath, hash)
-  elif path.is_dir():
-    _get_dir_digest(filepath, hash)
+    digest = _get_file_digest(filepath, algorithm, cache)
+  else:
+    hash = _get_dir_digest(filepath, algorithm, workers, cache)
+    digest = hash.digest()
 
-  return hash.digest().hex()
+  return digest.hex()
 
 def get_stream_digest(stream, algorithm=sha256) -> str:
   """Gets a digest for a stream.
@@ -3,18 +3,98 @@
 # SPDX-License-Identifier: BSD-3-Clause
 ##
 
+from hashlib import sha256
+from os import stat, utime
+
 import pytest
 
+from . import binary as binary_module
 from .binary import *
 from .github import github_archive_url
 
+from ocebuild.filesystem import cache as cache_module
 from ocebuild.filesystem.archives import extract_archive
 
+from third_party.cpython.pathlib import Path
+
+
 
 def test_get_binary_ext():
   ext = get_binary_ext()
   assert f'iasl{ext}' in ('iasl', 'iasl.exe', 'iasl.linux')
 
+@pytest.fixture
+def digest_cache(tmp_path, monkeypatch):
+  monkeypatch.setattr(cache_module, 'CACHE_DIR', Path(tmp_path, 'cache'))
+  monkeypatch.setattr(binary_module, '_digest_cache', None)
+  monkeypatch.setattr(binary_module, '_digest_cache_dirty', False)
+  Path(tmp_path, 'cache').mkdir()
+  return Path(tmp_path, 'cache', 'digests.json')
+
+def test_get_digest(digest_cache, tmp_path, monkeypatch):
+  kext = Path(tmp_path, 'Lilu.kext')
+  kext.joinpath('Contents', 'MacOS').mkdir(parents=True)
+  plist = kext.joinpath('Contents', 'Info.plist')
+  plist.write_text('<plist/>')
+  kext.joinpath('Contents', 'MacOS', 'Lilu').write_bytes(b'\xca\xfe' * 2**20)
+  # Allow caching files changed within the timestamp resolution
+  monkeypatch.setattr(binary_module, '_RACY_WINDOW_NS', -10**10)
+
+  assert get_digest(plist) == sha256(b'<plist/>').hexdigest()
+  digest = get_digest(kext)
+  assert get_digest(kext, workers=1) == digest
+  # New digests are only saved once
+  assert not digest_cache.exists()
+  binary_module._save_digest_cache()
+  assert digest_cache.exists()
+
+  # Unchanged files are not re-read
+  binary_module._digest_cache = None
+  with monkeypatch.context() as m:
+    m.setattr(binary_module, '_get_file_hash', None)
+    assert get_digest(kext) == digest
+  # Files rewritten with a preserved mtime are re-hashed
+  mtime_ns = stat(plist).st_mtime_ns
+  plist.write_text('<array/>')
+  utime(plist, ns=(mtime_ns, mtime_ns))
+  assert get_digest(kext) != digest
+  # Modified files are re-hashed
+  plist.write_text('<plist></plist>')
+  assert get_digest(plist) == sha256(b'<plist></plist>').hexdigest()
+  # Short-lived files are not cached
+  num_digests = len(binary_module._digest_cache)
+  assert get_digest(kext, cache=False) == get_digest(kext)
+  tmp_file = Path(tmp_path, 'tmp')
+  tmp_file.write_text('tmp')
+  get_digest(tmp_file, cache=False)
+  assert len(binary_module._digest_cache) == num_digests
+
+  with pytest.raises(FileNotFoundError):
+    get_digest(tmp_path.joinpath('Missing.kext'))
+
+def test_digest_cache_evicts_least_recently_used(digest_cache, tmp_path,
+                                                  monkeypatch):
+  monkeypatch.setattr(binary_module, '_RACY_WINDOW_NS', -10**10)
+  monkeypatch.setattr(binary_module, '_DIGEST_CACHE_SIZE', 2)
+  files = []
+  for name in ('a', 'b', 'c'):
+    files.append(file := Path(tmp_path, name))
+    file.write_text(name)
+  get_digest(files[0])
+  get_digest(files[1])
+  # Digests read from the cache are marked as recently used
+  binary_module._save_digest_cache()
+  binary_module._digest_cache = None
+  get_digest(files[0])
+  get_digest(files[2])
+  binary_module._save_digest_cache()
+  binary_module._digest_cache = None
+  with monkeypatch.context() as m:
+    m.setattr(binary_module, '_get_file_hash', None)
+    get_digest(files[0])
+    get_digest(files[2])
+  assert len(binary_module._digest_cache) == 2
+
 def test_wrap_binary():
   iasl_url = github_archive_url(repository='Qonfused/iASL')
   with extract_archive(iasl_url) as tmpdir:
@@ -4,75 +4,261 @@
 ##
 """Methods for formatting and retrieving Dortania source URLs."""
 
+from concurrent.futures import Future
 from datetime import datetime, timedelta, timezone
+from json import dump, load
+from os import getpid, replace
+from threading import get_ident, Lock
+from time import time
+from urllib.request import Request
 
-from typing import Optional
+from typing import Dict, Optional, Union
 
-from ._lib import request
-from .github import github_file_url, github_release_url
+from ._lib import RequestGenerator, run_async, run_sync
+from .github import _github_release_url, github_file_url
 
+from ocebuild.constants import ENV
 from ocebuild.parsers.dict import nested_get
 
+from third_party.cpython.pathlib import Path
+
 
 DORTANIA_LAST_UPDATED: datetime=None
 """The last time the Dortania build catalog was updated."""
 
-DORTANIA_LATEST_BUILDS: dict={}
-"""The latest Dortania build catalog."""
+DORTANIA_LATEST_BUILDS: Dict[str, dict]={}
+"""A compact index of the latest Dortania builds.
+
+Each plugin maps to the `commit` sha, `version` and asset `links` (by build
+type) of its latest build.
+"""
 
 DORTANIA_LISTED_BUILDS: set={}
 """Available plugins in the Dortania build catalog."""
 
+DORTANIA_REVALIDATE_INTERVAL = timedelta(minutes=30)
+"""The interval between revalidations of the build catalog in a process."""
+
+_CATALOG_LOCK = Lock()
+"""Lock guarding the in-flight revalidation of the build catalog.
+@internal
+"""
+
+_CATALOG_REVALIDATION: Union[Future, None] = None
+"""The in-flight revalidation of the build catalog (if any).
+@internal
+"""
+
+_CATALOG_CHECKED_AT: float=0
+"""The time the build catalog was last revalidated in this process.
+@internal
+"""
+
+################################################################################
+#                                Catalog Index                                 #
+################################################################################
+
+def _catalog_index_path() -> Path:
+  """Returns the path of the on-disk build catalog index.
+  @internal
+  """
+  #pylint: disable=import-outside-toplevel
+  from ocebuild.filesystem.cache import CACHE_DIR
+  return CACHE_DIR.joinpath('dortania', 'index.json')
+
+def _index_latest_builds(latest_builds: dict) -> Dict[str, dict]:
+  """Reduces the `latest.json` build catalog to a compact index.
+  @internal
+  """
+  index = {}
+  for plugin, entry in latest_builds.items():
+    build = nested_get(entry, ['versions', 0], default={})
+    index[plugin] = {
+      'commit': nested_get(build, ['commit', 'sha']),
+      'version': build.get('version'),
+      'links': { k.upper(): v for k,v in (build.get('links') or {}).items() }
+    }
+  return index
+
+def _read_catalog_index() -> Union[float, None]:
+  """Loads the on-disk build catalog index into the module globals.
+
+  Returns:
+    The time the on-disk index was last revalidated, or None if unavailable.
+  @internal
+  """
+  global DORTANIA_LAST_UPDATED, DORTANIA_LATEST_BUILDS, DORTANIA_LISTED_BUILDS
+  try:
+    with open(_catalog_index_path(), 'r', encoding='UTF-8') as f:
+      index = load(f)
+    last_updated = datetime.fromisoformat(index['last_updated'])
+    latest_builds, listed_builds = index['latest'], set(index['listed'])
+  except (OSError, ValueError, KeyError, TypeError):
+    return None
+  DORTANIA_LAST_UPDATED = last_updated
+  DORTANIA_LATEST_BUILDS = latest_builds
+  DORTANIA_LISTED_BUILDS = listed_builds
+  return index.get('checked_at', 0)
+
+def _write_catalog_index(checked_at: float) -> None:
+  """Atomically writes the build catalog index to disk.
+  @internal
+  """
+  index_path = _catalog_index_path()
+  try:
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    suffix = f'.{getpid()}-{get_ident()}.tmp'
+    tmp_path = index_path.with_name(index_path.name + suffix)
+    with open(tmp_path, 'w', encoding='UTF-8') as f:
+      dump({ 'last_updated': DORTANIA_LAST_UPDATED.isoformat(),
+             'checked_at': checked_at,
+             'listed': sorted(DORTANIA_LISTED_BUILDS),
+             'latest': DORTANIA_LATEST_BUILDS }, f)
+    replace(tmp_path, index_path)
+  except OSError: pass
+
 ################################################################################
 #                               API Request Guards                             #
 ################################################################################
 
-def is_latest_build() -> bool:
-  """Checks if the cached build catalog is latest."""
-  global DORTANIA_LAST_UPDATED
+def _is_latest_build() -> RequestGenerator:
+  """Yields requests for `is_latest_build()`.
+  @internal
+  """
+  global DORTANIA_LAST_UPDATED, DORTANIA_LISTED_BUILDS, _CATALOG_CHECKED_AT
+
+  checked_at = time()
+  # Load the on-disk catalog index from a previous run
+  if not DORTANIA_LAST_UPDATED:
+    index_checked_at = _read_catalog_index()
+    ttl = float(ENV.OCEBUILD_CACHE_TTL or 0)
+    if index_checked_at is not None and checked_at - index_checked_at < ttl:
+      _CATALOG_CHECKED_AT = index_checked_at
+      return True
 
   timestamp = datetime.now(tz=timezone.utc)
+  interval = DORTANIA_REVALIDATE_INTERVAL.total_seconds()
   if not DORTANIA_LAST_UPDATED:
     pass #de-op
   # Only re-validate 30 minutes after the last update
   elif (timestamp - DORTANIA_LAST_UPDATED) <= timedelta(minutes=30):
     return True
+  # Only re-validate once per interval in a process
+  elif checked_at - _CATALOG_CHECKED_AT < interval:
+    return True
 
   # Revalidate build catalog timestamp
+  response = yield Request(dortania_file_url('last_updated.txt')), False
   latest_timestamp = datetime.fromisoformat(
-      request(dortania_file_url('last_updated.txt')).text(encoding='utf-8').read())
+      response.text(encoding='utf-8').read())
+  _CATALOG_CHECKED_AT = checked_at
   if not DORTANIA_LAST_UPDATED or latest_timestamp > DORTANIA_LAST_UPDATED:
     DORTANIA_LAST_UPDATED = latest_timestamp
+    # Invalidate the build catalog index
+    DORTANIA_LISTED_BUILDS = set()
     return False
 
+  _write_catalog_index(checked_at)
   return True
 
-def has_build(plugin: str) -> bool:
-  """Checks if a plugin has a build."""
-  global DORTANIA_LISTED_BUILDS
+def is_latest_build() -> bool:
+  """Checks if the cached build catalog is latest."""
+  return run_sync(_is_latest_build())
+
+def _update_catalog() -> RequestGenerator:
+  """Yields requests to update the build catalog index if outdated.
+  @internal
+  """
+  global DORTANIA_LATEST_BUILDS, DORTANIA_LISTED_BUILDS
+  latest = yield from _is_latest_build()
+  if not latest or not DORTANIA_LISTED_BUILDS or not DORTANIA_LATEST_BUILDS:
+    response = yield Request(dortania_file_url('plugins.json')), False
+    DORTANIA_LISTED_BUILDS = set(response.json()['plugins'])
+    response = yield Request(dortania_file_url('latest.json')), False
+    DORTANIA_LATEST_BUILDS = _index_latest_builds(response.json())
+    _write_catalog_index(_CATALOG_CHECKED_AT)
+
+def _revalidate_catalog() -> RequestGenerator:
+  """Yields requests to revalidate the build catalog index.
+
+  Concurrent revalidations (from threads or coroutines) are coalesced: only the
+  first runs its requests, while the others wait on its result.
+  @internal
+  """
+  global _CATALOG_REVALIDATION
+  while True:
+    with _CATALOG_LOCK:
+      future = _CATALOG_REVALIDATION
+      if is_owner := future is None:
+        future = _CATALOG_REVALIDATION = Future()
+    if is_owner: break
+    # Wait on the in-flight revalidation, retrying if it was cancelled
+    if not future.done(): yield future
+    if not future.cancelled(): return future.result()
+  try:
+    yield from _update_catalog()
+  except BaseException as e:
+    if isinstance(e, Exception): future.set_exception(e)
+    else: future.cancel()
+    raise
+  finally:
+    with _CATALOG_LOCK: _CATALOG_REVALIDATION = None
+  future.set_result(None)
+
+def _has_build(plugin: str) -> RequestGenerator:
+  """Yields requests for `has_build()`.
+  @internal
+  """
   # Revalidates build catalog cache
-  if not is_latest_build():
-    # print('Revalidating build catalog cache...')
-    catalog = request(dortania_file_url('plugins.json')).json()
-    DORTANIA_LISTED_BUILDS = set(catalog['plugins'])
+  yield from _revalidate_catalog()
   # Check if plugin is in the build catalog
   return plugin in DORTANIA_LISTED_BUILDS
 
+def has_build(plugin: str) -> bool:
+  """Checks if a plugin has a build."""
+  return run_sync(_has_build(plugin))
+
+async def has_build_async(plugin: str) -> bool:
+  """Checks if a plugin has a build (async)."""
+  return await run_async(_has_build(plugin))
+
 ################################################################################
 #                     Parameter formatting/retrival functions                  #
 ################################################################################
 
+def _get_latest_build(plugin: str) -> RequestGenerator:
+  """Yields requests for `get_latest_build()`.
+  @internal
+  """
+  if not (yield from _has_build(plugin)):
+    raise ValueError(f'Plugin {plugin} not in Dortania build catalog.')
+  return DORTANIA_LATEST_BUILDS.get(plugin, {})
+
+def get_latest_build(plugin: str) -> dict:
+  """Gets the latest build index entry for a plugin.
+
+  Args:
+    plugin: The plugin to get the latest build for.
+
+  Returns:
+    A dictionary with the `commit` sha, `version` and asset `links` (keyed by
+    build type, e.g. 'RELEASE' or 'DEBUG') of the latest build.
+  """
+  return run_sync(_get_latest_build(plugin))
+
+def _get_latest_sha(plugin: str) -> RequestGenerator:
+  """Yields requests for `get_latest_sha()`.
+  @internal
+  """
+  return (yield from _get_latest_build(plugin)).get('commit')
+
 def get_latest_sha(plugin: str) -> str:
   """Gets the latest build sha for a plugin."""
-  global DORTANIA_LATEST_BUILDS
-  if not has_build(plugin):
-    raise ValueError(f'Plugin {plugin} not in Dortania build catalog.')
-  # Revalidates build catalog cache
-  if not DORTANIA_LATEST_BUILDS or not is_latest_build():
-    DORTANIA_LATEST_BUILDS = request(dortania_file_url('latest.json')).json()
-  # Returns the latest build sha
-  return nested_get(DORTANIA_LATEST_BUILDS,
-                    keys=[plugin, 'versions', 0, 'commit', 'sha'])
+  return run_sync(_get_latest_sha(plugin))
+
+async def get_latest_sha_async(plugin: str) -> str:
+  """Gets the latest build sha for a plugin (async)."""
+  return await run_async(_get_latest_sha(plugin))
 
 ################################################################################
 #                        URL formatting/retrieval functions                    #
@@ -92,6 +278,18 @@ def dortania_file_url(filepath: str) -> str:
                          path=filepath,
                          raw=True)
 
+def _dortania_release_url(plugin: str,
+                          commit: Optional[str]=None) -> RequestGenerator:
+  """Yields requests for `dortania_release_url()`.
+  @internal
+  """
+  if not (yield from _has_build(plugin)):
+    raise ValueError(f'Plugin {plugin} not in Dortania build catalog.')
+  # Returns the latest build release (default) or by commit
+  if not commit: commit = yield from _get_latest_sha(plugin)
+  return (yield from _github_release_url(repository='dortania/build-repo',
+                                         tag=f'{plugin}-{commit[:7]}'))
+
 def dortania_release_url(plugin: str,
                          commit: Optional[str]=None) -> str:
   """Formats a Dortania build release URL.
@@ -103,19 +301,19 @@ def dortania_release_url(plugin: str,
   Returns:
     The formatted Dortania build release URL.
   """
-  if not has_build(plugin):
-    raise ValueError(f'Plugin {plugin} not in Dortania build catalog.')
-  # Returns the latest build release (default) or by commit
-  if not commit: commit = get_latest_sha(plugin)
-  return github_release_url(repository='dortania/build-repo',
-                            tag=f'{plugin}-{commit[:7]}')
+  return run_sync(_dortania_release_url(plugin, commit))
 
 
 __all__ = [
-  # Functions (5)
+  # Constants (1)
+  "DORTANIA_REVALIDATE_INTERVAL",
+  # Functions (8)
   "is_latest_build",
   "has_build",
+  "has_build_async",
+  "get_latest_build",
   "get_latest_sha",
+  "get_latest_sha_async",
   "dortania_file_url",
   "dortania_release_url"
 ]
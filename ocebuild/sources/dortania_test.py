@@ -3,7 +3,93 @@
 # SPDX-License-Identifier: BSD-3-Clause
 ##
 
+import asyncio
+
 import pytest
 
+from . import dortania as dortania_module
+from ._lib import set_async_transport
 from .dortania import *
 
+
+CATALOG_URL = 'https://raw.githubusercontent.com/dortania/build-repo/builds/'
+
+def _reset_catalog(monkeypatch):
+  """Resets the in-memory build catalog (e.g. as in a new process)."""
+  monkeypatch.setattr(dortania_module, 'DORTANIA_LAST_UPDATED', None)
+  monkeypatch.setattr(dortania_module, 'DORTANIA_LATEST_BUILDS', {})
+  monkeypatch.setattr(dortania_module, 'DORTANIA_LISTED_BUILDS', set())
+  monkeypatch.setattr(dortania_module, '_CATALOG_CHECKED_AT', 0)
+
+@pytest.fixture
+def catalog_transport(stub_transport, monkeypatch, tmp_path):
+  monkeypatch.setattr(dortania_module, '_catalog_index_path',
+                      lambda: tmp_path.joinpath('index.json'))
+  _reset_catalog(monkeypatch)
+  stub_transport.routes[CATALOG_URL + 'last_updated.txt'] = \
+    b'2023-01-01T00:00:00.000000+00:00'
+  stub_transport.routes[CATALOG_URL + 'plugins.json'] = \
+    { 'plugins': ['AppleALC', 'Lilu'] }
+  stub_transport.routes[CATALOG_URL + 'latest.json'] = {
+    plugin: { 'versions': [{
+      'commit': { 'sha': f'{plugin}-sha', 'message': '...' },
+      'version': '1.0.0',
+      'links': { 'release': f'https://foo/{plugin}-RELEASE.zip',
+                 'debug': f'https://foo/{plugin}-DEBUG.zip' },
+      'hashes': {}
+    }] } for plugin in ('AppleALC', 'Lilu')
+  }
+  return stub_transport
+
+def test_catalog_index(catalog_transport, monkeypatch, tmp_path):
+  assert has_build('AppleALC') and not has_build('Foo')
+  assert get_latest_sha('Lilu') == 'Lilu-sha'
+  assert get_latest_build('Lilu')['links']['DEBUG'] == \
+    'https://foo/Lilu-DEBUG.zip'
+  assert len(catalog_transport.requests) == 3
+  assert 'versions' not in tmp_path.joinpath('index.json').read_text()
+
+  # A new process revalidates the on-disk index with `last_updated.txt`
+  _reset_catalog(monkeypatch)
+  assert has_build('Lilu') and get_latest_sha('AppleALC') == 'AppleALC-sha'
+  assert len(catalog_transport.requests) == 4
+
+def test_catalog_index_ttl(catalog_transport, monkeypatch):
+  assert has_build('Lilu')
+  _reset_catalog(monkeypatch)
+  monkeypatch.setenv('OCEBUILD_CACHE_TTL', '60')
+  assert has_build('Lilu') and get_latest_sha('Lilu') == 'Lilu-sha'
+  assert len(catalog_transport.requests) == 3
+
+def test_catalog_index_revalidates_updates(catalog_transport, monkeypatch):
+  assert get_latest_sha('Lilu') == 'Lilu-sha'
+  _reset_catalog(monkeypatch)
+  catalog_transport.routes[CATALOG_URL + 'last_updated.txt'] = \
+    b'2023-02-01T00:00:00.000000+00:00'
+  catalog_transport.routes[CATALOG_URL + 'plugins.json'] = { 'plugins': ['Lilu'] }
+  assert not has_build('AppleALC')
+  assert len(catalog_transport.requests) == 6
+
+def test_catalog_revalidation_is_coalesced(catalog_transport, monkeypatch):
+  class AsyncStubTransport():
+    async def open(self, req, data=None, timeout=None):
+      await asyncio.sleep(0.01) # Keep revalidations in-flight to overlap
+      return catalog_transport.open(req, data, timeout)
+  async def run():
+    set_async_transport(AsyncStubTransport())
+    return await asyncio.gather(*[has_build_async('Lilu') for _ in range(8)])
+  assert asyncio.run(run()) == [True] * 8
+  assert len(catalog_transport.requests) == 3
+
+  # Cancelled revalidations don't block later revalidations
+  _reset_catalog(monkeypatch)
+  async def cancel():
+    set_async_transport(AsyncStubTransport())
+    task = asyncio.ensure_future(has_build_async('Lilu'))
+    await asyncio.sleep(0.005)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await task
+  asyncio.run(cancel())
+  assert dortania_module._CATALOG_REVALIDATION is None
+  assert has_build('Lilu')
@@ -4,43 +4,306 @@
 ##
 """Methods for formatting and retrieving GitHub source URLs."""
 
-#pylint: disable=consider-using-f-string,bare-except
+#pylint: disable=consider-using-f-string
 
+import logging
 from datetime import datetime, timedelta
 from functools import partial
+from json import dump, dumps, load
+from os import getpid, replace
+from threading import get_ident, Lock
+from time import time
+from urllib.error import HTTPError
+from urllib.parse import urlencode
 from urllib.request import Request
 
-from typing import List, Optional, Tuple, Union
+from typing import Dict, Generator, Iterable, List, Optional, Tuple, Union
 
-from ._lib import request
+from ._lib import (
+  RequestGenerator,
+  RequestWrapper,
+  get_response_cache,
+  run_async,
+  run_sync
+)
 
 from ocebuild.constants import ENV
 from ocebuild.errors import disable_exception_traceback, GitHubRateLimit
 from ocebuild.parsers.dict import nested_get
+from ocebuild.versioning.semver import get_version, resolve_version_specifier
 
+from third_party.cpython.pathlib import Path
+
+
+logger = logging.getLogger(__name__)
+
+
+def _github_api_request(endpoint: Optional[str]=None,
+                        url: Optional[str]=None,
+                        cache: bool=True,
+                        kind: Optional[str]='core'
+                        ) -> RequestGenerator:
+  """Yields a GitHub API request and returns its response.
+
+  Requests are paced by the rate limit tracker for the given resource `kind`
+  (or are not metered if None), which is updated from each response.
+  @internal
+  """
+  req = Request(f'https://api.github.com{endpoint}' if not url else url)
+  if ENV.has('GITHUB_TOKEN'):
+    req.add_header('Authorization', f'token {ENV.GITHUB_TOKEN}')
+  response = yield from _metered_request(req, cache, kind)
+  return response
 
 def github_api_request(endpoint: Optional[str]=None,
-                       url: Optional[str]=None
+                       url: Optional[str]=None,
+                       cache: bool=True
                        ) -> any:
   """Gets a GitHub API request.
 
   This method will automatically add the GitHub token from the environment.
+  Responses are stored in the persistent response cache and revalidated with
+  conditional requests.
 
   Args:
     endpoint: GitHub API endpoint.
+    url: GitHub API url (overrides the endpoint).
+    cache: Whether to use the persistent response cache.
 
   Returns:
     API response.
   """
-  req = Request(f'https://api.github.com{endpoint}' if not url else url)
-  if ENV.has('GITHUB_TOKEN'):
-    req.add_header('Authorization', f'token {ENV.GITHUB_TOKEN}')
-  return request(req)
+  return run_sync(_github_api_request(endpoint, url, cache))
+
+async def github_api_request_async(endpoint: Optional[str]=None,
+                                   url: Optional[str]=None,
+                                   cache: bool=True
+                                   ) -> any:
+  """Gets a GitHub API request using the running event loop.
+
+  See `github_api_request()` for details.
+  """
+  return await run_async(_github_api_request(endpoint, url, cache))
 
 ################################################################################
 #                               API Request Guards                             #
 ################################################################################
 
+GITHUB_RATE_LIMIT_PACING = 0.05
+"""Fraction of the rate limit below which outgoing requests are paced."""
+
+GITHUB_RATE_LIMIT_MAX_WAIT = 60
+"""Maximum seconds a request is queued for the rate limit before failing."""
+
+def _format_rate_limit(kind: str, reset: float, prefix: Optional[str]=None
+                       ) -> str:
+  """Formats a rate limit message with a friendly time until the reset.
+  @internal
+  """
+  current_time = datetime.now()
+  reset_time = datetime.fromtimestamp(reset)
+  if prefix is None: prefix = f'{kind.capitalize()} requests exceeded.'
+  msg = partial(f'{prefix} Try again in {{}} {{}}.'.format)
+  if (mins := round((reset_time - current_time) / timedelta(minutes=1))):
+    return msg(mins, 'minutes' if mins != 1 else 'minute')
+  secs = max(round((reset_time - current_time) / timedelta(seconds=1)), 0)
+  return msg(secs, 'seconds' if secs != 1 else 'second')
+
+class RateLimitTracker():
+  """Tracks the GitHub API rate limit budget from response headers.
+
+  The budget of each resource (e.g. 'core' or 'graphql') is read from the
+  `X-RateLimit-*` headers of API responses. Each request reserves from the
+  budget before it is sent. Once the remaining budget falls below the pacing
+  threshold, requests are spaced evenly over the rest of the rate limit window,
+  and once it is exhausted, requests are queued until the window resets.
+
+  Args:
+    pacing: Fraction of the rate limit below which requests are paced.
+    max_wait: Maximum seconds a request is queued before failing.
+  """
+
+  def __init__(self,
+               pacing: float=GITHUB_RATE_LIMIT_PACING,
+               max_wait: float=GITHUB_RATE_LIMIT_MAX_WAIT):
+    self.pacing = pacing
+    self.max_wait = max_wait
+    self._budgets: Dict[str, dict] = {}
+    self._lock = Lock()
+
+  def set_budget(self,
+                 kind: str,
+                 limit: int,
+                 remaining: int,
+                 reset: float,
+                 **kwargs
+                 ) -> None:
+    """Sets the budget of a resource (e.g. from the rate limit endpoint)."""
+    with self._lock:
+      next_at = (self._budgets.get(kind) or {}).get('next_at', 0)
+      self._budgets[kind] = { 'limit': int(limit),
+                              'remaining': int(remaining),
+                              'reset': float(reset),
+                              'next_at': next_at }
+
+  def update(self, headers: any, kind: str='core') -> None:
+    """Updates the budget of a resource from `X-RateLimit-*` response headers."""
+    if not headers or headers.get('X-RateLimit-Remaining') is None: return
+    try:
+      self.set_budget(headers.get('X-RateLimit-Resource', kind),
+                      limit=headers.get('X-RateLimit-Limit', 0),
+                      remaining=headers.get('X-RateLimit-Remaining'),
+                      reset=headers.get('X-RateLimit-Reset', 0))
+    except ValueError: pass
+
+  def budget(self, kind: str='core') -> Union[dict, None]:
+    """Returns the last known budget of a resource (if the window is current).
+
+    Returns:
+      A dictionary with the `limit`, `remaining` and `reset` time of the
+      resource, or None if unknown.
+    """
+    with self._lock:
+      budget = self._budgets.get(kind)
+      if budget is None or time() >= budget['reset']: return None
+      return { k: budget[k] for k in ('limit', 'remaining', 'reset') }
+
+  def acquire(self, kind: str='core') -> float:
+    """Reserves a request from the budget of a resource.
+
+    Returns:
+      The number of seconds to wait before sending the request.
+
+    Raises:
+      GitHubRateLimit: If the request would be queued longer than `max_wait`.
+    """
+    with self._lock:
+      now = time()
+      budget = self._budgets.get(kind)
+      if budget is None or now >= budget['reset']: return 0
+      remaining, window = budget['remaining'], budget['reset'] - now
+      delay = 0
+      if remaining <= 0:
+        # Queue requests until the rate limit window resets
+        delay = window
+      elif remaining <= budget['limit'] * self.pacing:
+        # Space out requests evenly over the rest of the window
+        start = max(now, budget['next_at'])
+        budget['next_at'] = start + window / remaining
+        delay = start - now
+      if delay > self.max_wait:
+        rate_limit = { k: budget[k] for k in ('limit', 'remaining', 'reset') }
+        # Raise error without stacktrace
+        with disable_exception_traceback():
+          raise GitHubRateLimit(_format_rate_limit(kind, budget['reset']),
+                                { 'resources': { kind: rate_limit } })
+      budget['remaining'] = max(remaining - 1, 0)
+      return delay
+
+  def raise_if_exceeded(self, kind: str='core') -> None:
+    """Raises an exception if the budget of a resource has been exhausted.
+
+    Raises:
+      GitHubRateLimit: If the rate limit has been exceeded.
+    """
+    if (budget := self.budget(kind)) and budget['remaining'] <= 0:
+      # Raise error without stacktrace
+      with disable_exception_traceback():
+        raise GitHubRateLimit(_format_rate_limit(kind, budget['reset']),
+                              { 'resources': { kind: budget } })
+
+RATE_LIMITS = RateLimitTracker()
+"""The shared rate limit tracker for GitHub API requests."""
+
+def _metered_request(req: Request,
+                     cache: bool,
+                     kind: Optional[str]='core'
+                     ) -> RequestGenerator:
+  """Yields a request paced by (and updating) the rate limit tracker.
+
+  Responses that are fresh in the response cache are replayed without a request
+  and don't reserve from the rate limit budget.
+  @internal
+  """
+  if cache and (fresh := get_response_cache().fresh(req)) is not None:
+    return RequestWrapper(fresh)
+  if kind and (delay := RATE_LIMITS.acquire(kind)):
+    logger.debug('Pacing GitHub API request by %.2fs: %s', delay, req.full_url)
+    yield delay
+  try:
+    response = yield req, cache
+  except HTTPError as e:
+    RATE_LIMITS.update(e.headers, kind=kind or 'core')
+    raise
+  # Responses replayed from the cache carry outdated rate limit headers.
+  if not getattr(response, 'cached', False):
+    RATE_LIMITS.update(response.headers, kind=kind or 'core')
+  return response
+
+def _check_rate_limit(planned: int, kind: str='core') -> RequestGenerator:
+  """Yields requests for `check_rate_limit()`.
+  @internal
+  """
+  if planned <= 0: return True
+  if (budget := RATE_LIMITS.budget(kind)) is None:
+    try:
+      yield from _github_rate_limit(kind)
+    except Exception as e: #pylint: disable=broad-exception-caught
+      logger.debug('Could not retrieve the GitHub API rate limit: %s', e)
+    if (budget := RATE_LIMITS.budget(kind)) is None: return True
+  if planned <= budget['remaining']: return True
+  hint = '' if ENV.has('GITHUB_TOKEN') else \
+    ' Set a GITHUB_TOKEN to increase the rate limit.'
+  logger.warning(_format_rate_limit(
+    kind, budget['reset'],
+    prefix=f"About {planned} GitHub API requests are needed, but only "
+           f"{budget['remaining']} of {budget['limit']} {kind} requests remain."
+  ) + hint)
+  return False
+
+def check_rate_limit(planned: int, kind: str='core') -> bool:
+  """Checks whether a number of planned requests fit in the rate limit budget.
+
+  The budget is read from the rate limit tracker, or from the GitHub API rate
+  limit endpoint (which does not count against the rate limit) if unknown.
+  A warning is logged if the planned requests do not fit in the budget.
+
+  Args:
+    planned: The number of planned API requests.
+    kind: The kind of GitHub API request to check.
+
+  Returns:
+    True if the planned requests fit in the remaining budget.
+  """
+  return run_sync(_check_rate_limit(planned, kind))
+
+async def check_rate_limit_async(planned: int, kind: str='core') -> bool:
+  """Checks whether a number of planned requests fit in the budget (async).
+
+  See `check_rate_limit()` for details.
+  """
+  return await run_async(_check_rate_limit(planned, kind))
+
+def _github_rate_limit(kind: str='core', raise_error: float=False
+                       ) -> RequestGenerator:
+  """Yields requests for `github_rate_limit()`.
+  @internal
+  """
+  # Requests to the rate limit endpoint don't count against the rate limit.
+  response = yield from _github_api_request('/rate_limit', cache=False,
+                                            kind=None)
+  rate_limit = response.json()
+  for kind_, budget in nested_get(rate_limit, ['resources'], {}).items():
+    RATE_LIMITS.set_budget(kind_, **budget)
+  if not raise_error:
+    if kind: return nested_get(rate_limit, ['resources', kind])
+    return rate_limit
+  elif nested_get(rate_limit, ['resources', kind, 'remaining']) == 0:
+    reset = nested_get(rate_limit, ['resources', kind, 'reset'])
+    # Raise error without stacktrace
+    with disable_exception_traceback():
+      raise GitHubRateLimit(_format_rate_limit(kind, reset), rate_limit)
+
 def github_rate_limit(kind: str='core', raise_error: float=False) -> int:
   """Gets the GitHub API rate limit.
 
@@ -54,36 +317,235 @@ def github_rate_limit(kind: str='core', raise_error: float=False) -> int:
   Raises:
     Exception: If the rate limit has been exceeded.
   """
-  rate_limit = github_api_request('/rate_limit').json()
-  if not raise_error:
-    if kind: return nested_get(rate_limit, ['resources', kind])
-    return rate_limit
-  elif nested_get(rate_limit, ['resources', kind, 'remaining']) == 0:
-    current_time = datetime.now()
-    reset_time = datetime.fromtimestamp(
-        nested_get(rate_limit, ['resources', kind, 'reset']))
-    # Format remaining time in a friendly way for error message
-    msg = partial('{} requests exceeded. Try again in {} {}.'.format,
-                  kind.capitalize())
-    if (mins := round((reset_time - current_time) / timedelta(minutes=1))):
-      msg = msg(mins, 'minutes' if mins != 1 else 'minute')
-    elif (secs := round((reset_time - current_time) / timedelta(seconds=1))):
-      msg = msg(secs, 'seconds' if secs != 1 else 'second')
-    # Raise error without stacktrace
-    with disable_exception_traceback():
-      raise GitHubRateLimit(msg, rate_limit)
+  return run_sync(_github_rate_limit(kind, raise_error))
+
+def _get_latest_commit(repository: str,
+                       branch: str='main'
+                       ) -> RequestGenerator:
+  """Yields requests for `get_latest_commit()`.
+  @internal
+  """
+  if (sha := (_prefetched(repository, 'branches') or {}).get(branch)):
+    return sha
+  endpoint = f'/repos/{repository}/commits/{branch}'
+  response = yield from _github_api_request(endpoint)
+  if (commit := response.json()):
+    return commit['sha']
 
 def get_latest_commit(repository: str,
                       branch: str='main'):
   """Get the latest commit of a branch in a GitHub repository."""
-  response = github_api_request(f'/repos/{repository}/commits/{branch}')
-  if (commit := response.json()):
-    return commit['sha']
+  return run_sync(_get_latest_commit(repository, branch))
+
+async def get_latest_commit_async(repository: str,
+                                  branch: str='main'):
+  """Get the latest commit of a branch in a GitHub repository (async)."""
+  return await run_async(_get_latest_commit(repository, branch))
+
+################################################################################
+#                              GraphQL Batch Queries                           #
+################################################################################
+
+GRAPHQL_BATCH_SIZE = 20
+"""The maximum number of repositories queried in a single GraphQL request."""
+
+_GRAPHQL_REPOSITORY_FRAGMENT = '''
+  %(alias)s: repository(owner: $%(alias)s_owner, name: $%(alias)s_name) {
+    tags: refs(refPrefix: "refs/tags/", first: 100,
+               orderBy: {field: TAG_COMMIT_DATE, direction: DESC}) {
+      nodes { name target { oid ... on Tag { target { oid } } } }
+      pageInfo { hasNextPage }
+    }
+    releases(first: 20, orderBy: {field: CREATED_AT, direction: DESC}) {
+      nodes {
+        tagName
+        releaseAssets(first: 50) {
+          nodes { name downloadUrl }
+          pageInfo { hasNextPage }
+        }
+      }
+    }
+    %(branches)s
+  }'''
+"""GraphQL query fragment for a single repository.
+@internal
+"""
+
+_GRAPHQL_STORE: Dict[str, dict] = {}
+"""Repository metadata prefetched by `github_prefetch()`, keyed by repository.
+@internal
+"""
+
+_GRAPHQL_STORE_LOCK = Lock()
+"""Lock guarding updates to the prefetched repository metadata.
+@internal
+"""
+
+def _github_graphql_request(query: str,
+                            variables: Optional[Dict[str, any]]=None
+                            ) -> RequestGenerator:
+  """Yields a GitHub GraphQL API request and returns its response data.
+  @internal
+  """
+  payload = { 'query': query, 'variables': variables or {} }
+  req = Request('https://api.github.com/graphql',
+                data=dumps(payload).encode('utf-8'),
+                headers={ 'Content-Type': 'application/json' })
+  req.add_header('Authorization', f'bearer {ENV.GITHUB_TOKEN}')
+  response = (yield from _metered_request(req, False, 'graphql')).json()
+  for error in response.get('errors') or []:
+    logger.debug('GitHub GraphQL error: %s', error.get('message'))
+  return response.get('data') or {}
+
+def github_graphql_request(query: str,
+                           variables: Optional[Dict[str, any]]=None
+                           ) -> dict:
+  """Runs a GitHub GraphQL API query.
+
+  GraphQL queries require a GitHub token to be set in the environment.
+
+  Args:
+    query: The GraphQL query.
+    variables: The GraphQL query variables. (Optional)
+
+  Returns:
+    The query response data.
+  """
+  return run_sync(_github_graphql_request(query, variables))
+
+def _parse_repository_node(node: dict, branches: List[str]) -> dict:
+  """Converts a GraphQL repository node into REST-shaped metadata.
+  @internal
+  """
+  tags = (node.get('tags') or {}).get('nodes') or []
+  releases = (node.get('releases') or {}).get('nodes') or []
+  branches = { b: nested_get(node, [f'b{k}', 'target', 'oid'])
+               for k,b in enumerate(branches) if node.get(f'b{k}') }
+  tags = [(t['name'], nested_get(t, ['target', 'target', 'oid'],
+                                 default=nested_get(t, ['target', 'oid'])))
+          for t in tags]
+  # Truncated tag lists are left to the REST API, which pages through all tags
+  if nested_get(node, ['tags', 'pageInfo', 'hasNextPage']): tags = None
+  return {
+    'tags': tags,
+    # Releases with truncated assets are left to the REST API
+    'releases': {
+      r['tagName']: {
+        'tag_name': r['tagName'],
+        'assets': [{ 'name': a['name'],
+                     'browser_download_url': a['downloadUrl'] }
+                   for a in (r.get('releaseAssets') or {}).get('nodes') or []]
+      } for r in releases
+      if not nested_get(r, ['releaseAssets', 'pageInfo', 'hasNextPage'])
+    },
+    'branches': branches
+  }
+
+def _github_prefetch(repositories: Dict[str, Iterable[str]]
+                     ) -> RequestGenerator:
+  """Yields requests for `github_prefetch()`.
+  @internal
+  """
+  global _GRAPHQL_STORE
+  store: Dict[str, dict] = {}
+  repositories = list(repositories.items())
+  for i in range(0, len(repositories), GRAPHQL_BATCH_SIZE):
+    fragments, variables, aliases = [], {}, {}
+    batch = repositories[i:i+GRAPHQL_BATCH_SIZE]
+    for j, (repository, branches) in enumerate(batch):
+      alias, branches = f'r{j}', sorted(set(branches))
+      aliases[alias] = repository, branches
+      variables[f'{alias}_owner'], variables[f'{alias}_name'] = \
+        repository.split('/', 1)
+      branch_fields = []
+      for k, branch in enumerate(branches):
+        variables[f'{alias}_b{k}'] = f'refs/heads/{branch}'
+        branch_fields.append(f'b{k}: ref(qualifiedName: ${alias}_b{k}) '
+                             '{ target { oid } }')
+      fragments.append(_GRAPHQL_REPOSITORY_FRAGMENT % {
+        'alias': alias, 'branches': '\n    '.join(branch_fields) })
+    parameters = ', '.join(f'${k}: String!' for k in variables)
+    query = f'query({parameters}) {{{"".join(fragments)}\n}}'
+    data = yield from _github_graphql_request(query, variables)
+    for alias, (repository, branches) in aliases.items():
+      if (node := data.get(alias)) is not None:
+        store[repository.lower()] = _parse_repository_node(node, branches)
+  with _GRAPHQL_STORE_LOCK:
+    _GRAPHQL_STORE = store
+  return len(store)
+
+def github_prefetch(repositories: Dict[str, Iterable[str]]) -> int:
+  """Prefetches tags, releases and branch heads for many repositories.
+
+  Metadata for all repositories is fetched with batched GitHub GraphQL queries
+  and replaces any previously prefetched metadata. Tag, release and commit
+  lookups (e.g. by `GitHubResolver`) use the prefetched metadata when
+  available, falling back to the REST API otherwise (including for releases
+  outside of the prefetched window or with truncated assets).
+
+  This requires a GitHub token; without a token no requests are made.
+
+  Args:
+    repositories: A mapping of repository names to branch names to prefetch.
+
+  Returns:
+    The number of prefetched repositories.
+  """
+  if not ENV.has('GITHUB_TOKEN') or not repositories: return 0
+  try:
+    return run_sync(_github_prefetch(repositories))
+  except Exception as e: #pylint: disable=broad-exception-caught
+    logger.debug('Falling back to the GitHub REST API: %s', e)
+    return 0
+
+async def github_prefetch_async(repositories: Dict[str, Iterable[str]]) -> int:
+  """Prefetches tags, releases and branch heads for many repositories (async).
+
+  See `github_prefetch()` for details.
+  """
+  if not ENV.has('GITHUB_TOKEN') or not repositories: return 0
+  try:
+    return await run_async(_github_prefetch(repositories))
+  except Exception as e: #pylint: disable=broad-exception-caught
+    logger.debug('Falling back to the GitHub REST API: %s', e)
+    return 0
+
+def _prefetched(repository: str, key: str) -> any:
+  """Returns prefetched metadata for a repository (if available).
+  @internal
+  """
+  with _GRAPHQL_STORE_LOCK:
+    return nested_get(_GRAPHQL_STORE, [repository.lower(), key])
 
 ################################################################################
 #                     Parameter formatting/retrieval functions                 #
 ################################################################################
 
+def _github_suite_id(repository: str,
+                     commit: str,
+                     workflow_id: int,
+                     status: Optional[str]='completed'
+                     ) -> RequestGenerator:
+  """Yields requests for `github_suite_id()`.
+  @internal
+  """
+  try:
+    suites_endpoint = f'/repos/{repository}/commits/{commit}/check-suites'
+    suites = (yield from _github_api_request(suites_endpoint)).json()
+    for suite in suites['check_suites']:
+      check_runs_url = suite['check_runs_url']
+      if status and suite['status'] != status: continue
+      # Enumerate suites for matching workflow ids
+      runs = (yield from _github_api_request(url=check_runs_url)).json()
+      for run in runs['check_runs']:
+        if f'/runs/{workflow_id}/job' in run['details_url']:
+          return nested_get(run, ['check_suite', 'id'])
+    # No matching suite found
+    return None
+  except Exception:
+    RATE_LIMITS.raise_if_exceeded()
+    raise
+
 def github_suite_id(repository: str,
                     commit: str,
                     workflow_id: int,
@@ -98,19 +560,76 @@ def github_suite_id(repository: str,
   Returns:
     Check suite ID.
   """
+  return run_sync(_github_suite_id(repository, commit, workflow_id, status))
+
+GITHUB_TAGS_PER_PAGE = 100
+"""The number of tags requested per page of the GitHub tags API."""
+
+_TAG_PAGES: Dict[Tuple[str, int], List[Tuple[str, str]]] = {}
+"""Memoized pages of `(tag, commit)` tuples, keyed by repository and page.
+@internal
+"""
+
+_TAG_PAGES_LOCK = Lock()
+"""Lock guarding the memoized tag pages.
+@internal
+"""
+
+def _github_tag_page(repository: str, page: int) -> RequestGenerator:
+  """Yields requests for a (memoized) page of `(tag, commit)` tuples.
+  @internal
+  """
+  key = (repository.lower(), page)
+  with _TAG_PAGES_LOCK:
+    if key in _TAG_PAGES: return _TAG_PAGES[key]
   try:
-    suites_endpoint = f'/repos/{repository}/commits/{commit}/check-suites'
-    for suite in github_api_request(suites_endpoint).json()['check_suites']:
-      check_runs_url = suite['check_runs_url']
-      if status and suite['status'] != status: continue
-      # Enumerate suites for matching workflow ids
-      for run in github_api_request(url=check_runs_url).json()['check_runs']:
-        if f'/runs/{workflow_id}/job' in run['details_url']:
-          return nested_get(run, ['check_suite', 'id'])
-    # No matching suite found
-    return None
-  except:
-    if not github_rate_limit(raise_error=True): raise
+    endpoint = f'/repos/{repository}/tags' + \
+      f'?per_page={GITHUB_TAGS_PER_PAGE}&page={page}'
+    tags_catalog = (yield from _github_api_request(endpoint)).json()
+  except Exception:
+    RATE_LIMITS.raise_if_exceeded()
+    raise
+  tags = [(tag['name'], nested_get(tag, ['commit', 'sha']))
+          for tag in tags_catalog]
+  with _TAG_PAGES_LOCK:
+    _TAG_PAGES[key] = tags
+  return tags
+
+def github_tag_pages(repository: str
+                     ) -> Generator[List[Tuple[str, str]], None, None]:
+  """Lazily yields pages of repository tags.
+
+  Pages are requested only as they are consumed, and are memoized for the
+  lifetime of the process.
+
+  Args:
+    repository: GitHub repository name.
+
+  Yields:
+    A list of `(tag, commit)` tuples for each page of repository tags.
+  """
+  page = 1
+  while (tags := run_sync(_github_tag_page(repository, page))):
+    yield tags
+    if len(tags) < GITHUB_TAGS_PER_PAGE: break
+    page += 1
+
+def _github_tag_names(repository: str,
+                      get_commits=False
+                      ) -> RequestGenerator:
+  """Yields requests for `github_tag_names()`.
+  @internal
+  """
+  if (tags := _prefetched(repository, 'tags')) is None:
+    tags, page = [], 1
+    while (page_tags := (yield from _github_tag_page(repository, page))):
+      tags += page_tags
+      if len(page_tags) < GITHUB_TAGS_PER_PAGE: break
+      page += 1
+  tag_names = [name for name,_ in tags]
+  if get_commits:
+    return tag_names, [commit for _,commit in tags]
+  return tag_names
 
 def github_tag_names(repository: str,
                      get_commits=False
@@ -124,32 +643,97 @@ def github_tag_names(repository: str,
   Returns:
     List of repository tags.
   """
-  try:
-    tags_endpoint = f"/repos/{repository}/tags"
-    tags_catalog = github_api_request(tags_endpoint).json()
-    tag_names = [tag['name'] for tag in tags_catalog]
-    if get_commits:
-      tag_commits = [nested_get(tag, ['commit', 'sha']) for tag in tags_catalog]
-      return tag_names, tag_commits
-    return tag_names
-  except:
-    if not github_rate_limit(raise_error=True): raise
+  return run_sync(_github_tag_names(repository, get_commits))
 
-def github_release_catalog(url: str) -> dict:
-  """Gets the catalog entry for a given release.
+async def github_tag_names_async(repository: str,
+                                 get_commits=False
+                                 ) -> Union[List[str],
+                                            Tuple[List[str], List[str]]]:
+  """Returns a list of all repository tags (async).
+
+  See `github_tag_names()` for details.
+  """
+  return await run_async(_github_tag_names(repository, get_commits))
+
+def _is_resolved_page(tag_names: List[str],
+                      page_names: List[str],
+                      specifier: str
+                      ) -> Union[str, None]:
+  """Returns the resolved version if no later page can hold a better match.
+
+  Tag pages are ordered from newest to oldest, so a resolved version is final
+  once a page reaches below it (except for the 'oldest' specifier).
+  @internal
+  """
+  if not tag_names or specifier == 'oldest': return None
+  if (resolved := resolve_version_specifier(tag_names, specifier)) is None:
+    return None
+  page_versions = [v for v in map(get_version, page_names) if v is not None]
+  if page_versions and min(page_versions) < get_version(resolved):
+    return resolved
+  return None
+
+def _github_resolve_tag(repository: str,
+                        specifier: str
+                        ) -> RequestGenerator:
+  """Yields requests for `github_resolve_tag()`.
+  @internal
+  """
+  tags: List[Tuple[str, str]] = []
+  # Use prefetched tags (only prefetched if complete)
+  if (prefetched := _prefetched(repository, 'tags')) is not None:
+    tags = list(prefetched)
+  # Otherwise lazily page through tags until the specifier is satisfied
+  if not tags:
+    page = 1
+    while (page_tags := (yield from _github_tag_page(repository, page))):
+      tags += page_tags
+      page_names = [name for name,_ in page_tags]
+      if _is_resolved_page([name for name,_ in tags], page_names, specifier):
+        break
+      if len(page_tags) < GITHUB_TAGS_PER_PAGE: break
+      page += 1
+  tag_names = [name for name,_ in tags]
+  tag_commits = [commit for _,commit in tags]
+  resolved = None
+  if tag_names:
+    resolved = resolve_version_specifier(versions=tag_names, specifier=specifier)
+  return tag_names, tag_commits, resolved
+
+def github_resolve_tag(repository: str,
+                       specifier: str
+                       ) -> Tuple[List[str], List[str], Union[str, None]]:
+  """Resolves a version specifier against the tags of a repository.
+
+  Tags are requested lazily one page at a time, and paging stops as soon as
+  no later page can hold a better match for the specifier.
 
   Args:
-    url: GitHub release catalog URL.
+    repository: GitHub repository name.
+    specifier: The version specifier (e.g. 'latest', '^1.2.0', '=1.0.0').
 
   Returns:
-    Release catalog.
+    A tuple containing:
+      - The list of fetched tag names.
+      - The list of fetched tag commits.
+      - The resolved version (if available).
+  """
+  return run_sync(_github_resolve_tag(repository, specifier))
+
+def _github_release_catalog(url: str) -> RequestGenerator:
+  """Yields requests for `github_release_catalog()`.
+  @internal
   """
+  base_url, tag = url.replace('https://github.com', '/repos').split('/tag/')
+  repository = base_url[len('/repos/'):].rsplit('/releases', 1)[0]
+  if (release_entry := (_prefetched(repository, 'releases') or {}).get(tag)):
+    return release_entry
   page = 1
   page_retries = 5
   while (page_retries > 0):
     try:
-      base_url, tag = url.replace('https://github.com', '/repos').split('/tag/')
-      release_catalog = github_api_request(base_url + f'?per_page=100&page={page}').json()
+      endpoint = base_url + f'?per_page=100&page={page}'
+      release_catalog = (yield from _github_api_request(endpoint)).json()
       release_entry = next(e for e in release_catalog if e['tag_name'] == tag)
       if not release_entry:
         raise ValueError(f'No release catalog entry found for {tag}.')
@@ -160,8 +744,27 @@ def github_release_catalog(url: str) -> dict:
         raise ValueError(f'No release catalog entry found in {url} for {tag}.')
       else:
         page_retries -= 1
-    except:
-      if not github_rate_limit(raise_error=True): raise
+    except Exception:
+      RATE_LIMITS.raise_if_exceeded()
+      raise
+
+def github_release_catalog(url: str) -> dict:
+  """Gets the catalog entry for a given release.
+
+  Args:
+    url: GitHub release catalog URL.
+
+  Returns:
+    Release catalog.
+  """
+  return run_sync(_github_release_catalog(url))
+
+async def github_release_catalog_async(url: str) -> dict:
+  """Gets the catalog entry for a given release (async).
+
+  See `github_release_catalog()` for details.
+  """
+  return await run_async(_github_release_catalog(url))
 
 ################################################################################
 #                        URL formatting/retrieval functions                    #
@@ -239,6 +842,18 @@ def github_archive_url(repository: str,
     return f'https://github.com/{repository}/archive/refs/tags/{tag}.tar.gz'
   return f'https://github.com/{repository}/archive/refs/heads/{branch}.tar.gz'
 
+def _github_release_url(repository: str,
+                        tag: Optional[str]=None
+                        ) -> RequestGenerator:
+  """Yields requests for `github_release_url()`.
+  @internal
+  """
+  # The latest tag follows the ordering of the REST API (which differs from the
+  # commit date ordering of prefetched tags).
+  if not tag:
+    tag = (yield from _github_tag_page(repository, 1))[0][0]
+  return f'https://github.com/{repository}/releases/tag/{tag}'
+
 def github_release_url(repository: str,
                        tag: Optional[str]=None
                        ) -> str:
@@ -257,14 +872,163 @@ def github_release_url(repository: str,
     >>> github_release_url('foo/bar', tag='v1.0.0')
     # -> "https://github.com/foo/bar/releases/tag/v1.0.0"
   """
+  return run_sync(_github_release_url(repository, tag))
+
+GITHUB_RUNS_PER_PAGE = 100
+"""The number of workflow runs (or artifacts) requested per page."""
+
+GITHUB_RUN_SUITES_CACHED = 1000
+"""The number of workflow run check suites cached per repository."""
+
+_RUN_SUITES: Dict[str, Dict[str, List[int]]] = {}
+"""Cached `[check suite id, workflow id]` of workflow runs, keyed by repository
+and run id.
+@internal
+"""
+
+_RUN_SUITES_LOCK = Lock()
+"""Lock guarding the cached workflow run check suites.
+@internal
+"""
+
+_RUN_SUITES_LOADED = False
+"""Whether the on-disk workflow run check suites have been loaded.
+@internal
+"""
+
+_RUN_SUITES_DIRTY = False
+"""Whether the cached workflow run check suites have unsaved changes.
+@internal
+"""
+
+def _run_suites_path() -> Path:
+  """Returns the path of the on-disk workflow run check suites.
+  @internal
+  """
+  #pylint: disable=import-outside-toplevel
+  from ocebuild.filesystem.cache import CACHE_DIR
+  return CACHE_DIR.joinpath('github', 'run_suites.json')
+
+def _run_suite(repository: str, run_id: int) -> Union[List[int], None]:
+  """Returns the cached check suite and workflow id of a workflow run.
+  @internal
+  """
+  global _RUN_SUITES, _RUN_SUITES_LOADED
+  with _RUN_SUITES_LOCK:
+    if not _RUN_SUITES_LOADED:
+      _RUN_SUITES_LOADED = True
+      try:
+        with open(_run_suites_path(), 'r', encoding='UTF-8') as f:
+          _RUN_SUITES = { **load(f), **_RUN_SUITES }
+      except (OSError, ValueError, TypeError): pass
+    return _RUN_SUITES.get(repository.lower(), {}).get(str(run_id))
+
+def _cache_run_suites(repository: str, workflow_runs: List[dict]) -> None:
+  """Caches the check suite and workflow id of workflow runs (in-memory).
+  @internal
+  """
+  global _RUN_SUITES_DIRTY
+  with _RUN_SUITES_LOCK:
+    run_suites = _RUN_SUITES.setdefault(repository.lower(), {})
+    for run in workflow_runs:
+      run_suites[str(run['id'])] = [run['check_suite_id'], run['workflow_id']]
+    _RUN_SUITES_DIRTY = _RUN_SUITES_DIRTY or bool(workflow_runs)
+
+def _save_run_suites() -> None:
+  """Writes the cached workflow run check suites to disk (if updated).
 
+  Only the newest `GITHUB_RUN_SUITES_CACHED` runs of a repository are kept.
+  @internal
+  """
+  global _RUN_SUITES_DIRTY
+  with _RUN_SUITES_LOCK:
+    if not _RUN_SUITES_DIRTY: return
+    _RUN_SUITES_DIRTY = False
+    # Evict the oldest runs (by run id) of each repository
+    for run_suites in _RUN_SUITES.values():
+      for run_id in sorted(run_suites, key=int)[:-GITHUB_RUN_SUITES_CACHED]:
+        del run_suites[run_id]
+    suites_path = _run_suites_path()
+    try:
+      suites_path.parent.mkdir(parents=True, exist_ok=True)
+      suffix = f'.{getpid()}-{get_ident()}.tmp'
+      tmp_path = suites_path.with_name(suites_path.name + suffix)
+      with open(tmp_path, 'w', encoding='UTF-8') as f:
+        dump(_RUN_SUITES, f)
+      replace(tmp_path, suites_path)
+    except OSError: pass
+
+def _github_artifacts_url(repository: str,
+                          branch: Optional[str]=None,
+                          workflow: Optional[str]=None,
+                          commit: Optional[str]=None,
+                          get_commit=False
+                          ) -> RequestGenerator:
+  """Yields requests for `github_artifacts_url()`.
+  @internal
+  """
   try:
-    if not tag:
-      tags_catalog = github_api_request(f'/repos/{repository}/tags').json()
-      tag = tags_catalog[0]['name']
-  except:
-    if not github_rate_limit(raise_error=True): raise
-  return f'https://github.com/{repository}/releases/tag/{tag}'
+    # Get workflow id (if workflow name is provided)
+    workflow_id: int=None
+    if workflow is not None:
+      workflows_endpoint = f'/repos/{repository}/actions/workflows'
+      workflows = (yield from _github_api_request(workflows_endpoint)).json()
+      for w in workflows['workflows']:
+        if workflow in (w['name'], w['path'].rsplit('/', 1)[-1]):
+          workflow_id = w['id']; break
+      else:
+        raise ValueError(f"{repository} - No workflow found for '{workflow}'")
+    # Filter workflow runs on the server by branch, workflow and commit
+    runs_query = { k:v for k,v in (('branch', branch), ('head_sha', commit))
+                   if v }
+    runs_query.update(status='completed', per_page=GITHUB_RUNS_PER_PAGE)
+    runs_endpoint = f'/repos/{repository}/actions' + \
+      (f'/workflows/{workflow_id}' if workflow_id else '') + \
+      f'/runs?{urlencode(runs_query)}'
+    runs_page, runs_min_id, runs_listed = 0, None, False
+    # Page through unexpired artifacts (newest first)
+    artifacts_page = 1
+    while True:
+      artifacts_endpoint = f'/repos/{repository}/actions/artifacts' + \
+        f'?per_page={GITHUB_RUNS_PER_PAGE}&page={artifacts_page}'
+      catalog = (yield from _github_api_request(artifacts_endpoint)).json()
+      for artifact in catalog['artifacts']:
+        # Skip expired artifacts
+        if artifact['expired']: continue
+        # Extract workflow run properties
+        r_id = artifact['id']
+        w_id = nested_get(artifact, ['workflow_run', 'id'])
+        head_branch = nested_get(artifact, ['workflow_run', 'head_branch'])
+        head_sha = nested_get(artifact, ['workflow_run', 'head_sha'])
+        # Filter run by given parameters
+        if branch and branch != head_branch: continue
+        if commit and commit != head_sha: continue
+        # Map the run to its check suite, listing runs only on a cache miss
+        while (run_suite := _run_suite(repository, w_id)) is None:
+          if runs_listed or (runs_min_id is not None and runs_min_id < w_id):
+            break
+          runs_page += 1
+          runs = (yield from _github_api_request(
+            runs_endpoint + f'&page={runs_page}')).json()['workflow_runs']
+          _cache_run_suites(repository, runs)
+          if runs: runs_min_id = min(run['id'] for run in runs)
+          runs_listed = len(runs) < GITHUB_RUNS_PER_PAGE
+        if run_suite is None: continue
+        suite_id, run_workflow_id = run_suite
+        if workflow_id and workflow_id != run_workflow_id: continue
+        # Return the first matching artifact url
+        url = f'https://github.com/{repository}/suites/{suite_id}/artifacts/{r_id}'
+        if get_commit: return url, head_sha
+        return url
+      if len(catalog['artifacts']) < GITHUB_RUNS_PER_PAGE: break
+      artifacts_page += 1
+  except Exception:
+    RATE_LIMITS.raise_if_exceeded()
+    raise
+  finally:
+    # Save listed workflow runs once per lookup
+    _save_run_suites()
+  return None
 
 def github_artifacts_url(repository: str,
                          branch: Optional[str]=None,
@@ -274,58 +1038,57 @@ def github_artifacts_url(repository: str,
                          ) -> Union[str, Tuple[str, str], None]:
   """Formats a GitHub artifacts URL.
 
+  Workflow runs are filtered on the server by branch, workflow and commit, and
+  matched against pages of unexpired artifacts. The check suite of each run is
+  cached across calls (and on-disk), so a lookup costs a few requests no matter
+  the size of the artifact history.
+
   Args:
     repository: GitHub repository name.
     branch: Branch name.
-    tag: Tag name.
+    workflow: Workflow name (or filename).
     commit: Commit hash.
     get_commit: If True, additionally returns the commit hash.
 
   Returns:
     URL of the artifacts archive.
   """
-  try:
-    # Get workflow id (if workflow name is provided)
-    workflow_id: int=None
-    if workflow is not None:
-      workflows_endpoint = f'/repos/{repository}/actions/workflows'
-      for w in github_api_request(workflows_endpoint).json():
-        if workflow == w['name']: workflow_id = w['id']; break
-    # Filter artifact urls
-    artifacts_endpoint = f'/repos/{repository}/actions/artifacts'
-    catalog = github_api_request(artifacts_endpoint).json()
-    for workflow_run in catalog['artifacts']:
-      # Skip expired artifacts
-      if workflow_run['expired']: continue
-      # Extract workflow properties
-      r_id = workflow_run['id']
-      w_id = nested_get(workflow_run, ['workflow_run', 'id'])
-      head_branch = nested_get(workflow_run, ['workflow_run', 'head_branch'])
-      head_sha = nested_get(workflow_run, ['workflow_run', 'head_sha'])
-      # Filter run by given parameters
-      if branch and branch != head_branch: continue
-      if workflow_id and workflow_id != w_id: continue
-      if commit and commit != head_sha: continue
-      # Return the first matching artifact url
-      if (suite_id := github_suite_id(repository, head_sha, w_id)):
-        url = f'https://github.com/{repository}/suites/{suite_id}/artifacts/{r_id}'
-        if get_commit: return url, head_sha
-        return url
-  except:
-    if not github_rate_limit(raise_error=True): raise
-  return None
+  return run_sync(_github_artifacts_url(repository, branch, workflow, commit,
+                                        get_commit))
 
 
 __all__ = [
-  # Functions (10)
+  # Constants (6)
+  "GITHUB_RATE_LIMIT_PACING",
+  "GITHUB_RATE_LIMIT_MAX_WAIT",
+  "GRAPHQL_BATCH_SIZE",
+  "GITHUB_TAGS_PER_PAGE",
+  "GITHUB_RUNS_PER_PAGE",
+  "GITHUB_RUN_SUITES_CACHED",
+  # Variables (1)
+  "RATE_LIMITS",
+  # Functions (21)
   "github_api_request",
+  "github_api_request_async",
   "github_rate_limit",
+  "check_rate_limit",
+  "check_rate_limit_async",
+  "github_graphql_request",
+  "github_prefetch",
+  "github_prefetch_async",
   "get_latest_commit",
+  "get_latest_commit_async",
   "github_suite_id",
+  "github_tag_pages",
   "github_tag_names",
+  "github_tag_names_async",
+  "github_resolve_tag",
   "github_release_catalog",
+  "github_release_catalog_async",
   "github_file_url",
   "github_archive_url",
   "github_release_url",
-  "github_artifacts_url"
+  "github_artifacts_url",
+  # Classes (1)
+  "RateLimitTracker"
 ]
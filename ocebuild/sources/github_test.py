@@ -3,10 +3,91 @@
 # SPDX-License-Identifier: BSD-3-Clause
 ##
 
+from json import dump, loads
+from time import time
+from urllib.parse import parse_qs, urlsplit
+
 import pytest
 
+from . import github as github_module
+from ._lib import ResponseCache, set_response_cache
 from .github import *
 
+from ocebuild.errors import GitHubRateLimit
+
+
+@pytest.fixture
+def graphql_transport(stub_transport, monkeypatch):
+  monkeypatch.setattr(github_module, '_GRAPHQL_STORE', {})
+  monkeypatch.setattr(github_module, '_TAG_PAGES', {})
+  monkeypatch.setenv('GITHUB_TOKEN', 'foo')
+  stub_transport.routes['https://api.github.com/graphql'] = { 'data': {
+    'r0': {
+      'tags': { 'nodes': [
+        { 'name': '1.1.0', 'target': { 'oid': 'b', 'target': { 'oid': 'c' } } },
+        { 'name': '1.0.0', 'target': { 'oid': 'a' } }
+      ] },
+      'releases': { 'nodes': [
+        { 'tagName': '1.1.0', 'releaseAssets': { 'nodes': [
+          { 'name': 'Foo-1.1.0-RELEASE.zip', 'downloadUrl': 'https://foo/r.zip' }
+        ], 'pageInfo': { 'hasNextPage': False } } },
+        { 'tagName': '1.0.0', 'releaseAssets': { 'nodes': [],
+          'pageInfo': { 'hasNextPage': True } } }
+      ] },
+      'b0': { 'target': { 'oid': 'd' } }
+    },
+    'r1': None
+  } }
+  return stub_transport
+
+def test_github_prefetch(graphql_transport):
+  assert github_prefetch({ 'foo/Foo': {'main'}, 'foo/Missing': {'main'} }) == 1
+  assert len(graphql_transport.requests) == 1
+  req = graphql_transport.requests[0]
+  assert req.get_method() == 'POST'
+  assert req.get_header('Authorization') == 'bearer foo'
+  variables = loads(req.data)['variables']
+  assert variables['r0_owner'] == 'foo' and variables['r1_name'] == 'Missing'
+  assert variables['r0_b0'] == 'refs/heads/main'
+
+  # Lookups use prefetched metadata without further requests
+  assert github_tag_names('foo/Foo', get_commits=True) == \
+    (['1.1.0', '1.0.0'], ['c', 'a'])
+  assert get_latest_commit('foo/Foo', branch='main') == 'd'
+  catalog = github_release_catalog(github_release_url('foo/Foo', tag='1.1.0'))
+  assert catalog['assets'][0]['browser_download_url'] == 'https://foo/r.zip'
+  assert len(graphql_transport.requests) == 1
+
+  # The latest tag follows the ordering of the REST API
+  graphql_transport.routes['https://api.github.com/repos/foo/Foo/tags'] = [
+    { 'name': '1.0.1', 'commit': { 'sha': 'e' } },
+    { 'name': '1.1.0', 'commit': { 'sha': 'c' } }
+  ]
+  assert github_release_url('foo/Foo') == \
+    'https://github.com/foo/Foo/releases/tag/1.0.1'
+  # Releases with truncated assets are requested from the REST API
+  graphql_transport.routes['https://api.github.com/repos/foo/Foo/releases'] = [
+    { 'tag_name': '1.0.0', 'assets': [] }
+  ]
+  assert github_release_catalog(github_release_url('foo/Foo', tag='1.0.0'))
+  assert len(graphql_transport.requests) == 3
+
+def test_github_prefetch_truncated_tags(graphql_transport, tags_transport):
+  graphql_transport.routes['https://api.github.com/graphql'] = { 'data': {
+    'r0': { 'tags': { 'nodes': [{ 'name': '1.0.249', 'target': { 'oid': 'a' } }],
+                      'pageInfo': { 'hasNextPage': True } } }
+  } }
+  assert github_prefetch({ 'foo/Foo': set() }) == 1
+  # Truncated tag lists page through all tags with the REST API
+  assert len(github_tag_names('foo/Foo')) == 250
+  assert github_resolve_tag('foo/Foo', 'oldest')[2] == '1.0.0'
+  assert len(graphql_transport.requests) == 4
+
+def test_github_prefetch_requires_token(graphql_transport, monkeypatch):
+  monkeypatch.delenv('GITHUB_TOKEN')
+  assert github_prefetch({ 'foo/Foo': {'main'} }) == 0
+  assert not graphql_transport.requests
+
 
 def test_github_file_url(): pass # Not implemented
 
@@ -14,9 +95,178 @@ def test_github_archive_url(): pass # Not implemented
 
 def test_github_release_url(): pass # Not implemented
 
-def test_github_artifacts_url(): pass # Not implemented
-  # repository='acidanthera/RestrictEvents'
-  # commit='954bd4e21093bf059a15f8692e086586d5cb2dc6'
-  # url = github_artifacts_url(repository,
-  #                            commit=commit)
-  # assert url == 'https://github.com/acidanthera/RestrictEvents/suites/13641781448/artifacts/752936784'
+@pytest.fixture
+def artifacts_transport(stub_transport, monkeypatch, tmp_path):
+  monkeypatch.setattr(github_module, '_RUN_SUITES', {})
+  monkeypatch.setattr(github_module, '_RUN_SUITES_LOADED', False)
+  monkeypatch.setattr(github_module, '_RUN_SUITES_DIRTY', False)
+  monkeypatch.setattr(github_module, '_run_suites_path',
+                      lambda: tmp_path / 'run_suites.json')
+  api = 'https://api.github.com/repos/foo/Foo/actions'
+  stub_transport.routes[f'{api}/workflows'] = { 'workflows': [
+    { 'id': 7, 'name': 'CI', 'path': '.github/workflows/main.yml' }
+  ] }
+  stub_transport.routes[f'{api}/artifacts'] = { 'artifacts': [
+    { 'id': 300 + i, 'expired': i > 40,
+      'workflow_run': { 'id': 100 - i, 'head_branch': 'master',
+                        'head_sha': f'sha{100 - i}' } }
+    for i in range(50)
+  ] }
+  def runs(req):
+    query = parse_qs(urlsplit(req.full_url).query)
+    assert query['branch'] == ['master'] and query['status'] == ['completed']
+    # Only even runs belong to the CI workflow
+    return { 'workflow_runs': [
+      { 'id': i, 'check_suite_id': 1000 + i, 'workflow_id': 7 }
+      for i in range(100, 50, -1) if i % 2 == 0
+    ] }
+  stub_transport.routes[f'{api}/workflows/7/runs'] = runs
+  return stub_transport
+
+def test_github_artifacts_url(artifacts_transport, monkeypatch):
+  url = github_artifacts_url('foo/Foo', branch='master', workflow='main.yml',
+                             get_commit=True)
+  assert url == ('https://github.com/foo/Foo/suites/1100/artifacts/300',
+                 'sha100')
+  # Runs are listed once per page instead of once per artifact
+  assert len(artifacts_transport.requests) == 3
+  # Skips runs of other workflows
+  artifacts_transport.routes[
+    'https://api.github.com/repos/foo/Foo/actions/artifacts'] = {
+      'artifacts': [{ 'id': 301, 'expired': False,
+                      'workflow_run': { 'id': 99, 'head_branch': 'master',
+                                        'head_sha': 'sha99' } }] }
+  assert github_artifacts_url('foo/Foo', branch='master',
+                              workflow='CI') is None
+  # The run to check suite mapping is cached across runs (on-disk)
+  monkeypatch.setattr(github_module, '_RUN_SUITES', {})
+  monkeypatch.setattr(github_module, '_RUN_SUITES_LOADED', False)
+  artifacts_transport.requests.clear()
+  artifacts_transport.routes[
+    'https://api.github.com/repos/foo/Foo/actions/artifacts'] = {
+      'artifacts': [{ 'id': 302, 'expired': False,
+                      'workflow_run': { 'id': 98, 'head_branch': 'master',
+                                        'head_sha': 'sha98' } }] }
+  assert github_artifacts_url('foo/Foo', branch='master', workflow='CI') == \
+    'https://github.com/foo/Foo/suites/1098/artifacts/302'
+  assert len(artifacts_transport.requests) == 2
+
+def test_github_artifacts_url_caches_newest_runs(artifacts_transport,
+                                                 monkeypatch, tmp_path):
+  monkeypatch.setattr(github_module, 'GITHUB_RUN_SUITES_CACHED', 10)
+  artifacts_transport.routes[
+    'https://api.github.com/repos/foo/Foo/actions/artifacts'] = {
+      'artifacts': [{ 'id': 302, 'expired': False,
+                      'workflow_run': { 'id': 60, 'head_branch': 'master',
+                                        'head_sha': 'sha60' } }] }
+  writes = []
+  monkeypatch.setattr(github_module, 'dump',
+                      lambda obj, f: writes.append(obj) or dump(obj, f))
+  assert github_artifacts_url('foo/Foo', branch='master', workflow='CI') == \
+    'https://github.com/foo/Foo/suites/1060/artifacts/302'
+  # Listed runs are saved once per lookup, keeping only the newest runs
+  assert len(writes) == 1
+  run_suites = loads(tmp_path.joinpath('run_suites.json').read_text())
+  assert sorted(map(int, run_suites['foo/foo'])) == list(range(82, 101, 2))
+
+@pytest.fixture
+def tags_transport(stub_transport, monkeypatch):
+  monkeypatch.setattr(github_module, '_TAG_PAGES', {})
+  monkeypatch.setattr(github_module, '_GRAPHQL_STORE', {})
+  # 250 tags ordered from newest to oldest (1.0.249, ..., 1.0.0)
+  tags = [{ 'name': f'1.0.{i}', 'commit': { 'sha': f'sha{i}' } }
+          for i in reversed(range(250))]
+  def handler(req):
+    query = parse_qs(urlsplit(req.full_url).query)
+    per_page, page = int(query['per_page'][0]), int(query['page'][0])
+    return tags[(page - 1) * per_page:page * per_page]
+  stub_transport.routes['https://api.github.com/repos/foo/Foo/tags'] = handler
+  return stub_transport
+
+@pytest.mark.parametrize('specifier,version,pages', [
+  ('latest', '1.0.249', 1),
+  ('^1.0.0', '1.0.249', 1),
+  ('=1.0.120', '1.0.120', 2),
+  ('<1.0.10', '1.0.9', 3),
+  ('oldest', '1.0.0', 3),
+  ('=2.0.0', None, 3),
+])
+def test_github_resolve_tag(tags_transport, specifier, version, pages):
+  tags, commits, resolved = github_resolve_tag('foo/Foo', specifier)
+  assert resolved == version
+  assert len(tags_transport.requests) == pages
+  assert len(tags) == len(commits) == min(pages * GITHUB_TAGS_PER_PAGE, 250)
+  if version is not None:
+    assert commits[tags.index(version)] == f'sha{version.rsplit(".", 1)[-1]}'
+
+def test_github_tag_pages_memoized(tags_transport):
+  assert github_resolve_tag('foo/Foo', '=1.0.120')[2] == '1.0.120'
+  assert len(tags_transport.requests) == 2
+  pages = list(github_tag_pages('foo/Foo'))
+  assert [len(p) for p in pages] == [100, 100, 50]
+  assert len(tags_transport.requests) == 3
+  assert len(github_tag_names('foo/Foo')) == 250
+  assert len(tags_transport.requests) == 3
+
+def test_rate_limit_tracker_updates_from_headers():
+  tracker = RateLimitTracker()
+  assert tracker.budget() is None
+  reset = time() + 600
+  tracker.update({ 'X-RateLimit-Resource': 'graphql',
+                   'X-RateLimit-Limit': '5000',
+                   'X-RateLimit-Remaining': '4999',
+                   'X-RateLimit-Reset': str(int(reset)) })
+  assert tracker.budget() is None
+  assert tracker.budget('graphql')['remaining'] == 4999
+  # Responses without rate limit headers are ignored.
+  tracker.update({})
+  assert tracker.budget('graphql')['remaining'] == 4999
+
+def test_rate_limit_tracker_paces_and_queues_requests():
+  tracker = RateLimitTracker(pacing=0.5, max_wait=120)
+  reset = time() + 100
+  tracker.set_budget('core', limit=100, remaining=60, reset=reset)
+  assert tracker.acquire() == 0
+  # Below the pacing threshold, requests are spaced over the window.
+  tracker.set_budget('core', limit=100, remaining=10, reset=reset)
+  assert tracker.acquire() == pytest.approx(0, abs=0.1)
+  assert tracker.acquire() == pytest.approx(10, abs=0.1)
+  assert tracker.budget()['remaining'] == 8
+  # Once exhausted, requests are queued until the window resets.
+  tracker.set_budget('core', limit=100, remaining=0, reset=reset)
+  assert tracker.acquire() == pytest.approx(100, abs=0.1)
+  with pytest.raises(GitHubRateLimit):
+    tracker.raise_if_exceeded()
+
+def test_rate_limit_tracker_raises_past_max_wait():
+  tracker = RateLimitTracker(max_wait=60)
+  tracker.set_budget('core', limit=60, remaining=0, reset=time() + 3600)
+  with pytest.raises(GitHubRateLimit):
+    tracker.acquire()
+
+def test_metered_request_replays_fresh_responses(stub_transport, monkeypatch,
+                                                 tmp_path):
+  tracker = RateLimitTracker(max_wait=60)
+  monkeypatch.setattr(github_module, 'RATE_LIMITS', tracker)
+  set_response_cache(ResponseCache(tmp_path, ttl=60))
+  try:
+    stub_transport.routes['https://api.github.com/repos/foo/Foo'] = \
+      { 'name': 'Foo' }
+    assert github_api_request('/repos/foo/Foo').json() == { 'name': 'Foo' }
+    # Fresh cached responses don't reserve from an exhausted budget
+    tracker.set_budget('core', limit=60, remaining=0, reset=time() + 3600)
+    assert github_api_request('/repos/foo/Foo').json() == { 'name': 'Foo' }
+    assert len(stub_transport.requests) == 1
+    with pytest.raises(GitHubRateLimit):
+      github_api_request('/repos/foo/Bar')
+  finally:
+    set_response_cache(None)
+
+def test_check_rate_limit(monkeypatch, caplog):
+  tracker = RateLimitTracker()
+  monkeypatch.setattr(github_module, 'RATE_LIMITS', tracker)
+  tracker.set_budget('core', limit=60, remaining=10, reset=time() + 600)
+  assert check_rate_limit(10)
+  with caplog.at_level('WARNING', logger=github_module.__name__):
+    assert not check_rate_limit(30)
+  assert 'About 30 GitHub API requests are needed' in caplog.text
@@ -7,16 +7,37 @@
 #pylint: disable=C0103,R1725,W0401,W0613,W0614,W0622,W1113,E0602
 
 import re
+from concurrent.futures import Future
 from difflib import get_close_matches
 from hashlib import sha256
 from re import split
-
-from typing import Generator, List, Literal, Optional, Tuple, TypeVar, Union
-
+from threading import Lock
+
+from typing import (
+  Dict,
+  Generator,
+  Iterator,
+  List,
+  Literal,
+  Optional,
+  Tuple,
+  TypeVar,
+  Union
+)
+
+from ._lib import RequestGenerator, run_async, run_sync
 from .dortania import *
+from .dortania import _dortania_release_url, _get_latest_build, _get_latest_sha
 from .github import *
+from .github import (
+  _get_latest_commit,
+  _github_artifacts_url,
+  _github_release_catalog,
+  _github_release_url,
+  _github_resolve_tag
+)
 
-from ocebuild.versioning.semver import get_version, resolve_version_specifier
+from ocebuild.versioning.semver import get_version
 
 from third_party.cpython.pathlib import Path
 
@@ -38,6 +59,67 @@ TPathResolver = TypeVar("TPathResolver", bound="PathResolver")
 @internal
 """
 
+class ResolutionMemo():
+  """A run-scoped memo of source lookups.
+
+  Lookups are keyed by their kind, repository and reference (e.g. a tag, branch
+  or commit), so that each is only resolved once per run no matter how many
+  entries share it. Concurrent identical lookups are coalesced: only the first
+  runs its requests, while the others wait on (and share) its result.
+
+  A memo is created for each resolution run and passed to the resolvers of that
+  run, so that concurrent runs (and later runs in the same process) don't share
+  lookups.
+  """
+
+  def __init__(self):
+    self._results: Dict[tuple, Future] = {}
+    self._lock = Lock()
+
+  def __len__(self) -> int:
+    return len(self._results)
+
+  def memoize(self, key: tuple, requests: RequestGenerator) -> RequestGenerator:
+    """Yields requests for a lookup, or waits on its memoized result.
+
+    Args:
+      key: The lookup key.
+      requests: The request generator resolving the lookup if not memoized.
+
+    Returns:
+      The (shared) result of the lookup.
+    """
+    while True:
+      with self._lock:
+        future = self._results.get(key)
+        if is_owner := future is None:
+          future = self._results[key] = Future()
+      if is_owner: break
+      # Wait on the in-flight lookup, retrying if it was cancelled
+      if not future.done(): yield future
+      if not future.cancelled(): return future.result()
+    try:
+      result = yield from requests
+    except BaseException as e:
+      # Failed lookups are not memoized, but are shared with waiting lookups
+      with self._lock: self._results.pop(key, None)
+      if isinstance(e, Exception): future.set_exception(e)
+      else: future.cancel()
+      raise
+    future.set_result(result)
+    return result
+
+def _memoized(memo: Union[ResolutionMemo, None],
+              key: tuple,
+              requests: RequestGenerator
+              ) -> RequestGenerator:
+  """Yields requests for a lookup, memoized in a resolution memo (if any).
+  @internal
+  """
+  if memo is None:
+    return (yield from requests)
+  return (yield from memo.memoize(key, requests))
+
 class BaseResolver():
   """Base resolver class implementing overrides.
 
@@ -113,11 +195,37 @@ class GitHubResolver(BaseResolver):
     """Extracts the closest matching asset from a GitHub release url."""
     if '/releases/' not in url:
       raise ValueError('URL must resolve to a GitHub release.')
+    release_catalog = github_release_catalog(url)
+    return GitHubResolver._match_asset(resolver, name, release_catalog, build)
+
+  @staticmethod
+  def _extract_asset(resolver: Union[TGitHubResolver, TDortaniaResolver],
+                     name: str,
+                     url: str,
+                     build: Optional[Literal['RELEASE', 'DEBUG']]=None,
+                     memo: Optional[ResolutionMemo]=None
+                     ) -> RequestGenerator:
+    """Yields requests for `extract_asset()`.
+    @internal
+    """
+    if '/releases/' not in url:
+      raise ValueError('URL must resolve to a GitHub release.')
+    release_catalog = yield from _memoized(memo, ('catalog', url),
+                                           _github_release_catalog(url))
+    return GitHubResolver._match_asset(resolver, name, release_catalog, build)
+
+  @staticmethod
+  def _match_asset(resolver: Union[TGitHubResolver, TDortaniaResolver],
+                   name: str,
+                   release_catalog: dict,
+                   build: Optional[Literal['RELEASE', 'DEBUG']]=None
+                   ) -> str:
+    """Matches the closest asset in a release catalog entry.
+    @internal
+    """
     if build is None: build = 'RELEASE'
     resolver.build = build
 
-    release_catalog = github_release_catalog(url)
-
     # Get the release assets for a given release url
     assets = release_catalog['assets']
     exclusion_list = {'debug-symbols'}
@@ -192,10 +300,16 @@ class GitHubResolver(BaseResolver):
 
     return asset
 
-  def resolve(self: TGitHubResolver,
-              build: Optional[Literal['RELEASE', 'DEBUG']]=None
-              ) -> str:
-    """Returns a URL based on the class parameters."""
+  def _resolve(self: TGitHubResolver,
+               build: Optional[Literal['RELEASE', 'DEBUG']]=None,
+               memo: Optional[ResolutionMemo]=None
+               ) -> RequestGenerator:
+    """Yields requests for `resolve()`.
+
+    Shared repository lookups are memoized in the resolution memo of the run
+    (if provided).
+    @internal
+    """
     params = dict(self)
     repo = params['repository']
 
@@ -205,13 +319,15 @@ class GitHubResolver(BaseResolver):
       if not self.has_any('commit'):
         # Resolve the latest commit for the given branch
         _args = { k:v for k,v in params.items() if k in ('repository', 'branch') }
-        _commit = get_latest_commit(**_args)
+        _commit = yield from _memoized(
+          memo, ('commit', repo, params.get('branch', 'main')),
+          _get_latest_commit(**_args))
         self.commit = _commit
         params['commit'] = _commit
 
     # Return archive url
     if params.get('tarball'):
-      _clamp_commit()
+      yield from _clamp_commit()
       _args = { k:v for k,v in params.items() if k not in ('tarball') }
       return github_archive_url(**_args)
     else:
@@ -219,16 +335,14 @@ class GitHubResolver(BaseResolver):
 
     # Return raw file url
     if self.has_any('path'):
-      _clamp_commit()
+      yield from _clamp_commit()
       return github_file_url(**params, raw=True)
 
     # Resolve version tag
     if self.has_any('tag'):
       input_tag = params['tag']
-      tags, commits = github_tag_names(repository=params['repository'],
-                                       get_commits=True)
-      params['tag'] = resolve_version_specifier(versions=tags,
-                                                specifier=input_tag)
+      tags, commits, params['tag'] = yield from _memoized(
+        memo, ('tag', repo, input_tag), _github_resolve_tag(repo, input_tag))
       if params['tag'] is None:
         raise ValueError(f"{repo} - Could not resolve a tag for '{input_tag}'")
       # Handle non-standard semver tags
@@ -243,19 +357,36 @@ class GitHubResolver(BaseResolver):
                          self.commit)
     # Resolve artifact from latest workflow run
     elif self.has_any('branch', 'workflow', 'commit'):
-      url, commit = github_artifacts_url(**params, get_commit=True)
+      url, commit = yield from _memoized(
+        memo, ('artifacts', *sorted(params.items())),
+        _github_artifacts_url(**params, get_commit=True))
       if not self.has_any('commit'):
         self.commit = commit
       return url
 
     # Return the latest release (default) or by tag
-    release_url = github_release_url(**params)
+    release_url = yield from _memoized(memo,
+                                       ('release', repo, params.get('tag')),
+                                       _github_release_url(**params))
     if (name := self.__name__):
       # Return release asset url if name is provided
-      return self.extract_asset(self, name, url=release_url, build=build)
+      return (yield from self._extract_asset(self, name, release_url, build,
+                                             memo))
 
     return release_url
 
+  def resolve(self: TGitHubResolver,
+              build: Optional[Literal['RELEASE', 'DEBUG']]=None
+              ) -> str:
+    """Returns a URL based on the class parameters."""
+    return run_sync(self._resolve(build=build))
+
+  async def resolve_async(self: TGitHubResolver,
+                          build: Optional[Literal['RELEASE', 'DEBUG']]=None
+                          ) -> str:
+    """Returns a URL based on the class parameters (async)."""
+    return await run_async(self._resolve(build=build))
+
 class DortaniaResolver(BaseResolver):
   """Resolves a Dortania build URL based on the class parameters."""
 
@@ -275,10 +406,16 @@ class DortaniaResolver(BaseResolver):
   def has_build(plugin: str):
     return has_build(plugin=plugin)
 
-  def resolve(self: TDortaniaResolver,
-              build: Optional[Literal['RELEASE', 'DEBUG']]=None
-              ) -> str:
-    """Returns a URL based on the class parameters."""
+  def _resolve(self: TDortaniaResolver,
+               build: Optional[Literal['RELEASE', 'DEBUG']]=None,
+               memo: Optional[ResolutionMemo]=None
+               ) -> RequestGenerator:
+    """Yields requests for `resolve()`.
+
+    Shared build lookups are memoized in the resolution memo of the run (if
+    provided).
+    @internal
+    """
     if not build: build = self.build
     plugin = self.__name__
     params = dict(self)
@@ -288,20 +425,44 @@ class DortaniaResolver(BaseResolver):
     if self.has_any('commit'):
       commit_sha = params['commit']
     else:
-      commit_sha = get_latest_sha(plugin)
+      commit_sha = yield from _get_latest_sha(plugin)
       self.commit = commit_sha
 
+    # Return the indexed asset url of the latest build (if available)
+    latest_build = yield from _get_latest_build(plugin)
+    if build is not None and latest_build.get('commit') == commit_sha:
+      if (url := latest_build['links'].get(build.upper())):
+        self.build = build
+        if (version := get_version(latest_build.get('version') or '')):
+          self.version = ".".join(map(str, version.release))
+        return url
+
     # Return the latest build (default) or by commit sha
-    release_url = dortania_release_url(plugin, commit=commit_sha)
+    release_url = yield from _memoized(
+      memo, ('dortania', plugin, commit_sha),
+      _dortania_release_url(plugin, commit=commit_sha))
     if build is not None:
       # Return release asset url if name is provided
-      return GitHubResolver.extract_asset(self,
-                                          name=plugin,
-                                          url=release_url,
-                                          build=build)
+      return (yield from GitHubResolver._extract_asset(self,
+                                                       name=plugin,
+                                                       url=release_url,
+                                                       build=build,
+                                                       memo=memo))
 
     return release_url
 
+  def resolve(self: TDortaniaResolver,
+              build: Optional[Literal['RELEASE', 'DEBUG']]=None
+              ) -> str:
+    """Returns a URL based on the class parameters."""
+    return run_sync(self._resolve(build=build))
+
+  async def resolve_async(self: TDortaniaResolver,
+                          build: Optional[Literal['RELEASE', 'DEBUG']]=None
+                          ) -> str:
+    """Returns a URL based on the class parameters (async)."""
+    return await run_async(self._resolve(build=build))
+
 class PathResolver(BaseResolver, Path):
   """Resolves a filepath based on the class parameters."""
 
@@ -369,7 +530,8 @@ ResolverType = Union[GitHubResolver, DortaniaResolver, PathResolver]
 __all__ = [
   # Variables (1)
   "ResolverType",
-  # Classes (3)
+  # Classes (4)
+  "ResolutionMemo",
   "GitHubResolver",
   "DortaniaResolver",
   "PathResolver"
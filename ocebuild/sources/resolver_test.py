@@ -3,11 +3,16 @@
 # SPDX-License-Identifier: BSD-3-Clause
 ##
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from time import sleep
 from unittest.mock import patch, MagicMock
+from urllib.request import Request
 
 import pytest
 
+from ._lib import run_async, run_sync
 from .resolver import *
 
 
@@ -110,6 +115,40 @@ def test_extract_asset_name_match_no_build_indicator():
     assert 'MyKext-1.0.0.zip' in url
 
 
+def test_resolution_memo(http_server):
+  def handler(h):
+    sleep(0.05) # Keep lookups in-flight long enough to overlap
+    h.respond(b'{"tag_name": "1.0.0"}')
+  http_server.routes['/foo'] = handler
+  def lookup():
+    response = yield Request(http_server.url('/foo')), False
+    return response.json()['tag_name']
+
+  memo = ResolutionMemo()
+  # Concurrent identical lookups share a single in-flight request
+  with ThreadPoolExecutor(max_workers=8) as executor:
+    results = executor.map(lambda _: run_sync(memo.memoize(('foo',), lookup())),
+                           range(8))
+  assert list(results) == ['1.0.0'] * 8
+  async def run():
+    return await asyncio.gather(*[run_async(memo.memoize(('bar',), lookup()))
+                                  for _ in range(8)])
+  assert asyncio.run(run()) == ['1.0.0'] * 8
+  assert len(http_server.requests) == 2
+  # Memoized lookups are reused without any requests
+  assert run_sync(memo.memoize(('foo',), lookup())) == '1.0.0'
+  assert len(http_server.requests) == 2
+
+def test_resolution_memo_does_not_memoize_errors(stub_transport):
+  def lookup():
+    yield Request('https://api.github.com/missing'), False
+  memo = ResolutionMemo()
+  for _ in range(2):
+    with pytest.raises(Exception):
+      run_sync(memo.memoize(('missing',), lookup()))
+  assert len(stub_transport.requests) == 2
+  assert len(memo) == 0
+
 def test_DortaniaResolver(): pass # Not implemented
 
 def test_PathResolver():
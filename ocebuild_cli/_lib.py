@@ -14,6 +14,9 @@ import click
 CONTEXT_SETTINGS = { "help_option_names": ['-h', '--help'] }
 """Shared context settings for the CLI."""
 
+DEFAULT_JOBS = 8
+"""Default number of concurrent workers for network-bound CLI stages."""
+
 VERBOSE = False
 """Global verbose flag for the CLI.
 @internal - This is a mutable constant that cannot be imported directly.
@@ -47,6 +50,8 @@ class CLIEnv:
       #pylint: disable=import-outside-toplevel
       import ocebuild_cli.console as Console
       Console.CONSOLE = Console.console_wrapper(log_path=value)
+      from ocebuild_cli.logging import capture_library_logs
+      capture_library_logs(enable=value)
     super().__setattr__(name, value)
 
 def cli_command(name: Optional[str]=None):
@@ -101,8 +106,9 @@ def cli_command(name: Optional[str]=None):
 
 
 __all__ = [
-  # Constants (1)
+  # Constants (2)
   "CONTEXT_SETTINGS",
+  "DEFAULT_JOBS",
   # Functions (1)
   "cli_command",
   # Classes (1)
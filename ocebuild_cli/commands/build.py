@@ -8,32 +8,37 @@
 
 from os import getcwd, makedirs
 
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
 import click
 
-from ocebuild.filesystem import copy, glob, remove
+from ocebuild.errors import IntegrityError
+from ocebuild.filesystem import ArchiveView, clone, glob, GLOB_PRUNE, remove
 from ocebuild.filesystem.cache import clear_cache, UNPACK_DIR
 from ocebuild.parsers.dict import merge_dict, nested_del, nested_get
 from ocebuild.parsers.plist import write_plist
 from ocebuild.pipeline.build import *
 from ocebuild.pipeline.config import update_entries
+from ocebuild.pipeline.lock import find_unrecorded_checksums, write_lockfile
 from ocebuild.pipeline.packages import *
 from ocebuild.pipeline.packages import _iterate_extract_packages
 
-from ocebuild_cli._lib import cli_command
+from ocebuild_cli._lib import cli_command, DEFAULT_JOBS
 from ocebuild_cli.interactive import Progress, progress_bar
 from ocebuild_cli.logging import *
 
 from third_party.cpython.pathlib import Path
 
 
-def get_build_file(cwd: Union[str, Path]
+def get_build_file(cwd: Union[str, Path],
+                   out_dir: Optional[Union[str, Path]]=None
                    ) -> Tuple[dict, dict, List[str], Path, Path]:
   """Reads the build file configuration.
 
   Args:
     cwd: The current working directory.
+    out_dir: The build directory to skip when searching for the build file.
+      (Optional)
 
   Returns:
     A tuple containing:
@@ -43,7 +48,10 @@ def get_build_file(cwd: Union[str, Path]
       - The build file path.
       - The project directory.
   """
-  BUILD_FILE = glob(cwd, '**/build.yml', include='**/build.yaml', first=True)
+  prune = GLOB_PRUNE
+  if out_dir is not None: prune = (*GLOB_PRUNE, Path(out_dir).absolute())
+  BUILD_FILE = glob(cwd, '**/build.yml', include='**/build.yaml', first=True,
+                    prune=prune)
   try:
     if BUILD_FILE:
       info(f"Found build configuration at '{BUILD_FILE.relative(cwd)}'.")
@@ -65,15 +73,38 @@ def get_build_file(cwd: Union[str, Path]
 
   return build_config, build_vars, flags, BUILD_FILE, PROJECT_DIR
 
-def unpack_packages(resolvers: List[dict], project_dir: Path) -> dict:
+def unpack_packages(resolvers: List[dict],
+                    project_dir: Path,
+                    jobs: int=DEFAULT_JOBS,
+                    build_vars: Optional[dict]=None,
+                    build_config: Optional[dict]=None,
+                    link: bool=False
+                    ) -> dict:
   """Unpacks packages to a temporary directory."""
   debug(f"Unpacking packages to {UNPACK_DIR}")
   with Progress() as progress:
     bar = progress_bar('Unpacking packages', wrap=progress)
-    unpacked_entries = unpack_build_entries(resolvers,
-                                            project_dir=project_dir,
-                                            # Interactive arguments
-                                            __wrapper=bar)
+    # Display the aggregate download progress of all packages
+    download_task = progress.add_task('Downloading packages', total=None)
+    def on_download(downloaded: int, total: int, throughput: float):
+      progress.update(download_task, completed=downloaded, total=total,
+                      description='Downloading packages '
+                                  f'({throughput / 1e6:.1f} MB/s)')
+    try:
+      unpacked_entries = unpack_build_entries(resolvers,
+                                              project_dir=project_dir,
+                                              jobs=jobs,
+                                              progress=on_download,
+                                              build_vars=build_vars,
+                                              build_config=build_config,
+                                              link=link,
+                                              # Interactive arguments
+                                              __wrapper=bar)
+    except IntegrityError as e:
+      abort(msg=f'Failed to verify a downloaded package: {e}',
+            hint='Try running `ocebuild lock --force` if the package was '
+                 'intentionally replaced upstream.',
+            traceback=False)
   num_unpacked = len([k for e in unpacked_entries.values() for k in e.keys()])
   if num_unpacked:
     success(f'Unpacked {num_unpacked} packages from lockfile.')
@@ -129,7 +160,8 @@ def extract_packages(build_vars: dict,
 
 def extract_build_directory(opencore_pkg: Union[str, Path],
                             extracted_entries: dict,
-                            build_dir: Path
+                            build_dir: Path,
+                            link: bool=False
                             ) -> None:
   """Extracts all package-extracted build entries to the build directory."""
 
@@ -147,7 +179,7 @@ def extract_build_directory(opencore_pkg: Union[str, Path],
           remaining_categories.remove(category)
           progress.update(bar1, advance=1)
         return exclusions
-      copy(opencore_pkg, build_dir, ignore=ignore_extracted, dirs_exist_ok=True)
+      clone(opencore_pkg, build_dir, link=link, ignore=ignore_extracted)
 
     # Move build entries to the build directory
     bar2 = progress_bar('Moving build entries', wrap=progress)
@@ -155,9 +187,8 @@ def extract_build_directory(opencore_pkg: Union[str, Path],
     for category, name, entry in iterator:
       dest = entry['__dest']
       src = entry['__extracted']
-      # Move and overrite existing files
-      if dest.exists(): remove(dest)
-      copy(src, dest)
+      # Replace existing files (skipping unchanged files)
+      clone(src, dest, link=link, prune=True)
       # Remove the entry if it failed to copy
       if not dest.exists():
         nested_del(extracted_entries, [category, name])
@@ -169,7 +200,8 @@ def extract_build_directory(opencore_pkg: Union[str, Path],
 
 def update_config_entries(build_dir: Union[str, Path],
                           build_config: dict,
-                          clean: bool=False
+                          clean: bool=False,
+                          view: Optional[ArchiveView]=None
                           ) -> Path:
   """Updates the build entries in the config.plist."""
   try:
@@ -178,10 +210,11 @@ def update_config_entries(build_dir: Union[str, Path],
       # Copy sample config.plist if it does not exist
       BUILD_DIR = Path(build_dir).resolve()
       if not (config_plist := BUILD_DIR.joinpath('EFI/OC/config.plist')).exists():
-        copy(BUILD_DIR.joinpath('Docs/Sample.plist'), config_plist)
+        clone(BUILD_DIR.joinpath('Docs/Sample.plist'), config_plist)
         clean = True
       # Update config.plist
-      updated_config = update_entries(config_plist, build_config, clean=clean)
+      updated_config = update_entries(config_plist, build_config, clean=clean,
+                                      view=view)
       config_plist.write_text(write_plist(updated_config))
   except Exception as e:
     error(f"Failed to update config.plist: {e}", traceback=True)
@@ -215,7 +248,15 @@ def update_config_entries(build_dir: Union[str, Path],
 @click.option("--force",
               is_flag=True,
               help="Force the build even if the lockfile is up to date.")
-def cli(env, cwd, out, patches, clean, update, force):
+@click.option("-j", "--jobs",
+              type=click.IntRange(min=1),
+              default=DEFAULT_JOBS,
+              show_default=True,
+              help="Number of entries to resolve and unpack concurrently.")
+@click.option("--link",
+              is_flag=True,
+              help="Hardlink files from the extraction cache (read-only).")
+def cli(env, cwd, out, patches, clean, update, force, jobs, link):
   """Builds the project's OpenCore EFI directory."""
 
   if not cwd: cwd = getcwd()
@@ -240,7 +281,8 @@ def cli(env, cwd, out, patches, clean, update, force):
         success(f"Cleaned the output directory at '{BUILD_DIR}'.")
 
   # Read the build configuration
-  build_config, build_vars, flags, *_, PROJECT_DIR = get_build_file(cwd)
+  build_config, build_vars, flags, *_, PROJECT_DIR = \
+    get_build_file(cwd, out_dir=BUILD_DIR)
 
   # Read the lockfile
   from .lock import resolve_lockfile #pylint: disable=import-outside-toplevel
@@ -248,7 +290,8 @@ def cli(env, cwd, out, patches, clean, update, force):
                                          update=update,
                                          force=force,
                                          build_config=build_config,
-                                         project_dir=PROJECT_DIR)
+                                         project_dir=PROJECT_DIR,
+                                         jobs=jobs)
   # Prepend build directory to resolver paths
   for e in resolvers:
     e['__filepath'] = BUILD_DIR.joinpath(e['__filepath']).resolve()
@@ -262,27 +305,40 @@ def cli(env, cwd, out, patches, clean, update, force):
     exit(0)
 
   # Extract all build entries to a temporary directory
-  packages = unpack_packages(resolvers, project_dir=PROJECT_DIR)
+  packages = unpack_packages(resolvers, project_dir=PROJECT_DIR, jobs=jobs,
+                             build_vars=build_vars, build_config=build_config,
+                             link=link)
+  # Record the checksums of newly downloaded archives in the lockfile
+  if (recorded := find_unrecorded_checksums(lockfile, resolvers)):
+    from .lock import get_lockfile #pylint: disable=import-outside-toplevel
+    _, metadata, LOCKFILE = get_lockfile(cwd, project_dir=PROJECT_DIR)
+    lockfile = write_lockfile(LOCKFILE, lockfile, recorded, metadata)
+    debug(f"Recorded {len(recorded)} archive checksums in '{LOCKFILE.name}'.")
   opencore_pkg, extracted = extract_packages(build_vars, build_config,
                                              lockfile, resolvers,
                                              packages=packages,
                                              build_dir=BUILD_DIR)
   # Move build entries to the build directory
-  extract_build_directory(opencore_pkg, extracted, build_dir=BUILD_DIR)
+  extract_build_directory(opencore_pkg, extracted, build_dir=BUILD_DIR,
+                          link=link)
   OC_DIR = glob(BUILD_DIR, '**/OC/OpenCore.efi', first=True).parent
   if extracted:
     num_extracted = len([k for e in extracted.values() for k in e.keys()])
     extracted_dir = OC_DIR.relative(cwd)
     success(f"Extracted {num_extracted} build entries to '{extracted_dir}'.")
 
-  # Validate build entries
-  missing_entries = validate_build_directory(build_config, out_dir=BUILD_DIR)
-  if missing_entries:
-    num_missing = sum(len(e) for e in missing_entries.values())
-    abort(f"Could not extract {num_missing} build entries.", traceback=False)
-
-  # Update build entries in config.plist
-  config_plist = update_config_entries(BUILD_DIR, build_config, clean=clean)
+  # Index the build directory once for validating and updating build entries
+  with ArchiveView(BUILD_DIR, archives=False) as build_view:
+    # Validate build entries
+    missing_entries = validate_build_directory(build_config, out_dir=BUILD_DIR,
+                                               view=build_view)
+    if missing_entries:
+      num_missing = sum(len(e) for e in missing_entries.values())
+      abort(f"Could not extract {num_missing} build entries.", traceback=False)
+
+    # Update build entries in config.plist
+    config_plist = update_config_entries(BUILD_DIR, build_config, clean=clean,
+                                         view=build_view)
 
   # Apply patches to config.plist
   from .patch import apply_patches #pylint: disable=import-outside-toplevel
@@ -20,7 +20,7 @@ from ocebuild.pipeline.lock import *
 from ocebuild.sources.resolver import ResolverType
 
 import ocebuild_cli._lib as lib
-from ocebuild_cli._lib import cli_command
+from ocebuild_cli._lib import cli_command, DEFAULT_JOBS
 from ocebuild_cli.interactive import Progress, progress_bar
 from ocebuild_cli.logging import *
 
@@ -166,7 +166,8 @@ def resolve_lockfile(cwd: Union[str, Path],
                      update: bool=False,
                      force: bool=False,
                      build_config: Optional[dict]=None,
-                     project_dir: Optional[Path]=None
+                     project_dir: Optional[Path]=None,
+                     jobs: int=DEFAULT_JOBS
                      ) -> Tuple[dict, List[dict], Path]:
   """Resolves the project's lockfile.
 
@@ -178,6 +179,7 @@ def resolve_lockfile(cwd: Union[str, Path],
     force: Whether to force the lockfile update.
     build_config: The build configuration. (Optional)
     project_dir: The project directory. (Optional)
+    jobs: The number of entries to resolve concurrently. (Optional)
 
   Returns:
     A tuple containing:
@@ -203,6 +205,7 @@ def resolve_lockfile(cwd: Union[str, Path],
                                      base_path=project_dir,
                                      update=update,
                                      force=force,
+                                     jobs=jobs,
                                      # Interactive arguments
                                      __wrapper=bar)
   except Exception as e: #pylint: disable=broad-exception-caught
@@ -269,14 +272,19 @@ def resolve_lockfile(cwd: Union[str, Path],
 @click.option("--force",
               is_flag=True,
               help="Force refresh even if the lockfile is up to date.")
-def cli(env, cwd, check, update, force):
+@click.option("-j", "--jobs",
+              type=click.IntRange(min=1),
+              default=DEFAULT_JOBS,
+              show_default=True,
+              help="Number of entries to resolve concurrently.")
+def cli(env, cwd, check, update, force, jobs):
   """Updates the project's lockfile."""
 
   if not cwd: cwd = getcwd()
   else: debug(msg=f"(--cwd) Using '{cwd}' as the working directory.")
 
   # Process the lockfile
-  resolve_lockfile(cwd, check, update, force)
+  resolve_lockfile(cwd, check, update, force, jobs=jobs)
   # lockfile, resolvers = resolve_lockfile(cwd, check, update, force)
 
 
@@ -12,7 +12,7 @@ from typing import List, Optional, Tuple, Union
 
 import click
 
-from ocebuild.filesystem import glob
+from ocebuild.filesystem import glob, GLOB_PRUNE
 from ocebuild.parsers.dict import nested_get
 from ocebuild.parsers.plist import write_plist
 from ocebuild.parsers.regex import re_search
@@ -98,9 +98,13 @@ def apply_patches(cwd: Union[str, Path]='.',
   if not config_plist:
     config_plist = glob(out, '**/OC/config.plist', first=True)
 
+  # Skip the output directory when searching the project
+  prune = (*GLOB_PRUNE, Path(out).absolute())
+
   if not project_root:
     # Locate the project root relative to the build configuration
-    build_file = glob(cwd, '**/build.yml', include='**/build.yaml', first=True)
+    build_file = glob(cwd, '**/build.yml', include='**/build.yaml', first=True,
+                      prune=prune)
     if build_file:
       project_root = build_file.parent
     # Fall back to the current working directory
@@ -111,15 +115,18 @@ def apply_patches(cwd: Union[str, Path]='.',
 
   # Extract configuration patches
   if not patches:
-    patches = set(glob(project_root, '**/config*.yml', include='**/config*.yaml'))
-    patches |= set(glob(project_root, '**/patch*.yml', include='**/patch*.yaml'))
-    patches |= set(glob(project_root, '**/patch*.plist'))
+    patches = set(glob(project_root, '**/config*.yml',
+                       include=['**/config*.yaml',
+                                '**/patch*.yml',
+                                '**/patch*.yaml',
+                                '**/patch*.plist'],
+                       prune=prune))
     debug(f"Found {len(patches)} patch files")
   elif cwd:
     patches = set(Path(cwd, patch).resolve(strict=True) for patch in patches)
 
   # Append serial data patches to the list of applicable patches
-  patches |= set(glob(project_root, '**/.serialdata'))
+  patches |= set(glob(project_root, '**/.serialdata', prune=prune))
 
   # Apply patches and schema fallbacks to the config.plist
   try:
@@ -23,6 +23,7 @@ START_TIME = datetime.now()
 LOGGING_THEME = {
   "logging.level.debug":    "dim",
   "logging.level.info":     "blue",
+  "logging.level.warning":  "yellow",
   "logging.level.success":  "green",
   "logging.level.error":    "red",
 }
@@ -8,10 +8,13 @@
 # @see https://rich.readthedocs.io/en/stable/logging.html
 
 import inspect
+import logging
 from functools import partial
 
 from typing import List, Optional
 
+from rich.markup import escape
+
 from ocebuild.parsers.dict import nested_get
 
 import ocebuild_cli._lib as lib
@@ -78,6 +81,34 @@ def info(msg: str, *args, **kwargs):
   if lib.VERBOSE:
     echo(_format_label(msg, 'INFO'), *args, log=True, **kwargs)
 
+def warning(msg: str, hint: Optional[str]=None, **kwargs):
+  """Prints a warning message."""
+  echo(_format_label(msg, 'WARNING', hint=hint), log=True, **kwargs)
+
+class _LibraryHandler(logging.Handler):
+  """Forwards library log records to the CLI `warning()` or `debug()` output."""
+
+  def emit(self, record: logging.LogRecord) -> None:
+    if record.levelno >= logging.WARNING:
+      warning(escape(self.format(record)))
+    else:
+      debug(escape(self.format(record)))
+
+def capture_library_logs(enable: bool=True) -> None:
+  """Forwards logs from the `ocebuild` library to the CLI.
+
+  Warnings are always forwarded, while debug logs are only forwarded if
+  enabled.
+
+  Args:
+    enable: Whether to enable or disable forwarding of library debug logs.
+  """
+  logger = logging.getLogger('ocebuild')
+  for handler in list(logger.handlers):
+    if isinstance(handler, _LibraryHandler): logger.removeHandler(handler)
+  logger.addHandler(_LibraryHandler())
+  logger.setLevel(logging.DEBUG if enable else logging.WARNING)
+
 def success(msg: str, *args, **kwargs):
   """Prints a success message."""
   echo(_format_label(msg, 'SUCCESS'), *args, log=True, **kwargs)
@@ -137,10 +168,12 @@ def abort(msg: str,
 
 
 __all__ = [
-  # Functions (6)
+  # Functions (8)
   "echo",
   "debug",
   "info",
+  "warning",
+  "capture_library_logs",
   "success",
   "error",
   "abort"
@@ -18,7 +18,7 @@ from os import getcwd
 from pathlib import Path
 
 import click
-from ocebuild.filesystem import extract_archive
+from ocebuild.filesystem import extract_member
 from ocebuild.parsers.yaml import write_yaml
 from ocebuild.pipeline.config import read_config
 
@@ -51,7 +51,7 @@ def main(cwd, cpu, hyperv, out):
   cwd = Path(cwd).resolve()
   out = cwd / out
 
-  with extract_archive(AMD_PATCH_ARCHIVE) as tmp_dir:
+  with extract_member(AMD_PATCH_ARCHIVE, '**/patches.plist') as tmp_dir:
     plist_file = next(tmp_dir.glob('**/patches.plist'))
     amd_patches = write_yaml(read_config(plist_file), schema='annotated')
     amd_patches = "\n".join(amd_patches)\
@@ -62,7 +62,7 @@ def main(cwd, cpu, hyperv, out):
 
   wmsr_patch = ''
   if hyperv:
-    with extract_archive(WMSR_PATCH_ARCHIVE) as tmp_dir:
+    with extract_member(WMSR_PATCH_ARCHIVE, 'patch.plist') as tmp_dir:
       plist_file = tmp_dir / 'patch.plist'
       wmsr_patch = write_yaml(read_config(plist_file), schema='annotated')
       wmsr_patch = "\n".join(wmsr_patch)